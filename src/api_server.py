@@ -0,0 +1,313 @@
+"""
+FitScience Coach - HTTP API Server
+Headless JSON API over FitScienceRAG for the mobile client and other non-Streamlit callers
+
+    python src/api_server.py --port 8000 --workers 8
+    curl -s localhost:8000/health
+    curl -s localhost:8000/query -d '{"question": "How much protein should I eat?"}'
+
+Endpoints
+    GET  /health          liveness + readiness (warm-up state, primary LLM)
+    GET  /ready           200 once the shared index is built, else 503
+    GET  /metrics         Prometheus text (same registry as the Streamlit endpoint)
+    POST /query           {"question", "session_id"?, "priority"?: "interactive"|"background"} → query() result
+    POST /query/batch     {"questions": [...], ...} → {"results": [...]} in input order
+    POST /query/stream    same body as /query → NDJSON events: start, sources, answer (chunks), done
+    POST /bmr             {"weight_kg", "height_cm", "age", "gender", "activity_level"?} → {"bmr", "tdee"?}
+
+Connections are served by lightweight HTTP/1.1 keep-alive threads; pipeline work runs on a
+bounded worker pool (--workers, queue limit --max-queue → 503 when exceeded). One shared
+FitScienceRAG serves every request: the index comes from the background warm-up and LLM clients
+are the process-wide pooled backends.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from metrics import REGISTRY
+from pipeline_logging import configure_logging, get_logger
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from warmup import start_warmup, readiness
+
+log = get_logger("api")
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH = 50
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "background": PRIORITY_BACKGROUND}
+# Metric labels: anything else is "unknown", so client-chosen paths can't grow label cardinality
+ENDPOINTS = frozenset({"/health", "/ready", "/metrics", "/query", "/query/batch", "/query/stream", "/bmr"})
+
+API_REQUESTS = REGISTRY.counter("fitscience_api_requests_total", "HTTP API requests by endpoint and status")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FitScienceAPI:
+    """The shared pipeline plus the bounded worker pool every request runs on"""
+
+    def __init__(self, workers: int, max_queue: int, llm_backends: List[str] = None):
+        from rag_pipeline import FitScienceRAG
+        self.rag = FitScienceRAG(llm_backends=llm_backends)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fitscience-api")
+        self.max_pending = workers + max_queue
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self.initialized = threading.Event()
+        self.init_error = None
+
+    def start(self):
+        """Warm up in the background so /health answers immediately after boot"""
+        start_warmup()
+        threading.Thread(target=self._initialize, name="fitscience-api-init", daemon=True).start()
+
+    def _initialize(self):
+        if not self.rag.initialize_system():
+            self.init_error = "initialize_system() failed"
+        self.initialized.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.initialized.is_set() and self.init_error is None
+
+    def submit(self, fn, *args) -> Future:
+        """Queue fn on the worker pool; 503 instead of queueing without bound"""
+        if not self._pending.acquire(blocking=False):
+            raise ApiError(503, "server busy, retry shortly")
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def require_ready(self):
+        if not self.ready:
+            raise ApiError(503, self.init_error or "warming up, retry shortly")
+
+    def _query_args(self, body: Dict[str, Any], question: Any) -> Tuple[str, str, int]:
+        if not isinstance(question, str) or not question.strip():
+            raise ApiError(400, "'question' must be a non-empty string")
+        priority = body.get("priority", "interactive")
+        priority = PRIORITIES.get(priority) if isinstance(priority, str) else None
+        if priority is None:
+            raise ApiError(400, f"'priority' must be one of {list(PRIORITIES)}")
+        return question.strip(), body.get("session_id"), priority
+
+    def submit_query(self, body: Dict[str, Any]) -> Future:
+        """Validate and queue one query; every ApiError is raised before any work starts"""
+        args = self._query_args(body, body.get("question"))
+        self.require_ready()
+        return self.submit(self.rag.query, *args)
+
+    def query(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self.submit_query(body).result()
+
+    def batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        questions = body.get("questions")
+        if not isinstance(questions, list) or not questions:
+            raise ApiError(400, "'questions' must be a non-empty list")
+        if len(questions) > MAX_BATCH:
+            raise ApiError(400, f"at most {MAX_BATCH} questions per batch")
+        args = [self._query_args(body, q) for q in questions]
+        self.require_ready()
+        # Each question takes its own worker slot, so one batch can't monopolize the pool
+        jobs = []
+        for question_args in args:
+            try:
+                jobs.append(self.submit(self.rag.query, *question_args))
+            except ApiError as e:
+                jobs.append(e)
+        results = [{"error": str(job)} if isinstance(job, ApiError) else job.result() for job in jobs]
+        return {"results": results}
+
+    def bmr(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            bmr = self.rag.calculate_bmr(float(body["weight_kg"]), float(body["height_cm"]),
+                                         int(body["age"]), str(body["gender"]))
+            result = {"bmr": bmr}
+            if body.get("activity_level"):
+                result["tdee"] = self.rag.calculate_tdee(bmr, str(body["activity_level"]))
+            return result
+        except KeyError as e:
+            raise ApiError(400, f"missing field {e}")
+        except (TypeError, ValueError) as e:
+            raise ApiError(400, str(e))
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "ready": self.ready,
+            "warmup": readiness(),
+            "llm": self.rag.llm,
+            "error": self.init_error,
+        }
+
+
+def _answer_chunks(answer: str) -> List[str]:
+    """Sentence-sized pieces for the streaming endpoint"""
+    return [piece for piece in re.split(r"(?<=[.!?\n])\s+", answer) if piece]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection for many requests
+    api: FitScienceAPI = None
+
+    def log_message(self, format, *args):
+        log.debug("http", client=self.client_address[0], line=format % args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        path = self.path.split("?")[0]
+        API_REQUESTS.inc(endpoint=path if path in ENDPOINTS else "unknown", status=str(status))
+
+    def _read_json(self) -> Dict[str, Any]:
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            length = -1
+        if length < 0:
+            self.close_connection = True  # without a length the body can't be skipped on keep-alive
+            raise ApiError(400, "Content-Length header must be a non-negative integer")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # the unread body would corrupt the next keep-alive request
+            raise ApiError(413, "request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            raise ApiError(400, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return body
+
+    def _send_result(self, result: Dict[str, Any]):
+        if "error" in result:
+            self._send_json(500, result)
+        elif "retry_after" in result:
+            self._send_json(200, result, {"Retry-After": str(int(result["retry_after"]) + 1)})
+        else:
+            self._send_json(200, result)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(200, self.api.health())
+        elif path == "/ready":
+            self._send_json(200 if self.api.ready else 503, {"ready": self.api.ready})
+        elif path == "/metrics":
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        try:
+            body = self._read_json()
+            if path == "/query":
+                self._send_result(self.api.query(body))
+            elif path == "/query/batch":
+                self._send_json(200, self.api.batch(body))
+            elif path == "/query/stream":
+                self._stream(body)
+            elif path == "/bmr":
+                self._send_json(200, self.api.bmr(body))
+            else:
+                self._send_json(404, {"error": f"unknown endpoint {path}"})
+        except ApiError as e:
+            headers = {"Retry-After": "5"} if e.status == 503 else None
+            self._send_json(e.status, {"error": str(e)}, headers)
+        except Exception as e:
+            log.exception("request failed", path=path)
+            self._send_json(500, {"error": f"internal error: {type(e).__name__}"})
+
+    def _stream(self, body: Dict[str, Any]):
+        """NDJSON over chunked transfer encoding
+
+        LLM backends return whole completions, so the answer is streamed in sentence-sized chunks
+        once generated; the start event goes out immediately so clients can show progress. The
+        query is validated and queued first, so bad requests and 503s still get a plain status.
+        """
+        future = self.api.submit_query(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload: Dict[str, Any]):
+            data = (json.dumps(payload) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        # Headers are sent from here on: failures are reported in-band, never as a second status line
+        try:
+            event({"event": "start"})
+            try:
+                result = future.result()
+            except Exception as e:
+                log.exception("stream query failed")
+                result = {"error": f"internal error: {type(e).__name__}"}
+            if "error" in result:
+                event({"event": "error", "error": result["error"]})
+            else:
+                event({"event": "sources", "sources": result["sources"]})
+                for chunk in _answer_chunks(result["answer"]):
+                    event({"event": "answer", "text": chunk})
+                event({"event": "done", **{k: result.get(k) for k in ("timings", "provider", "usage", "retry_after")}})
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError as e:  # client went away mid-stream
+            log.debug("stream client disconnected", error=str(e))
+            self.close_connection = True
+            API_REQUESTS.inc(endpoint="/query/stream", status="disconnected")
+            return
+        API_REQUESTS.inc(endpoint="/query/stream", status="200")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FitScience Coach HTTP API")
+    parser.add_argument("--host", default=os.getenv("FITSCIENCE_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FITSCIENCE_API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("FITSCIENCE_API_WORKERS", "8")),
+                        help="concurrent pipeline requests")
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("FITSCIENCE_API_MAX_QUEUE", "64")),
+                        help="requests allowed to wait for a worker before answering 503")
+    parser.add_argument("--llm-backends", default=None, help="comma-separated backend order, e.g. groq (stub needs FITSCIENCE_STUB_LLM=1)")
+    args = parser.parse_args()
+
+    configure_logging()
+    backends = [b for b in args.llm_backends.split(",") if b] if args.llm_backends else None
+    api = FitScienceAPI(workers=args.workers, max_queue=args.max_queue, llm_backends=backends)
+    api.start()
+    ApiHandler.api = api
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    server.daemon_threads = True
+    log.info("🌐 API listening", url=f"http://{args.host}:{args.port}", workers=args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        api.pool.shutdown(wait=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+FitScience Coach - Batch Answer
+Answers a JSONL / CSV file of questions with bounded parallelism and writes results as JSONL
+
+    python src/batch_answer.py questions.jsonl -o answers.jsonl --workers 8
+    python src/batch_answer.py faq.csv -o faq_answers.jsonl --llm-backends groq --priority interactive
+    python src/batch_answer.py questions.jsonl -o answers.jsonl            # rerun → resumes
+
+Input rows need a `question` field (JSONL object key or CSV column); an optional `id` field names
+the row, otherwise the id is a hash of the question text. Each output line is the query() result
+plus `id`, `question` and `latency_s`, written as soon as it finishes (completion order). The
+output file is the checkpoint: rows whose id already has a successful line are skipped on rerun,
+and failed rows are removed from it and retried. Input is streamed and at most --workers * 2 questions are in flight,
+so memory stays flat on large files.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, Set
+
+from bench_utils import PROJECT_ROOT, latency_summary
+from perf_history import latency_metrics, pipeline_metrics, record_run
+from pipeline_logging import configure_logging, get_logger
+from profiling import question_hash
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+log = get_logger("batch_answer")
+
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "background": PRIORITY_BACKGROUND}
+
+
+def _jsonl_rows(f) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            log.warning("⚠️ Skipping malformed input line", line=number, error=str(e))
+            continue
+        if not isinstance(row, dict):
+            log.warning("⚠️ Skipping input line that is not a JSON object", line=number)
+            continue
+        yield row
+
+
+def read_questions(path: Path) -> Iterator[Dict[str, str]]:
+    """Yield {"id", "question"} rows one at a time from a .jsonl or .csv file
+
+    Malformed JSONL lines and rows without a non-empty string question are skipped with a warning.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f) if path.suffix.lower() == ".csv" else _jsonl_rows(f)
+        for row in rows:
+            question = row.get("question")
+            if not isinstance(question, str) or not question.strip():
+                log.warning("⚠️ Skipping row without a question", id=row.get("id"))
+                continue
+            question = question.strip()
+            yield {"id": str(row.get("id") or question_hash(question)), "question": question}
+
+
+def _answered_id(line: bytes):
+    """Id of a successful output line, else None (failed, rate-limited or unreadable)"""
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(row, dict) and "id" in row and "error" not in row and "retry_after" not in row:
+        return str(row["id"])
+    return None
+
+
+def load_checkpoint(output: Path) -> Set[str]:
+    """Ids already answered successfully, streaming the output file line by line
+
+    A partial last line left by an interrupted run is truncated away. Failed and rate-limited rows
+    are about to be retried, so when there are any the file is compacted (rewritten through a
+    temporary file) to successful rows only, and every id appears at most once.
+    """
+    if not output.exists():
+        return set()
+    done, stale, complete_bytes = set(), 0, 0
+    with open(output, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partial last line
+            complete_bytes += len(line)
+            answered = _answered_id(line)
+            if answered is None:
+                stale += 1
+            else:
+                done.add(answered)
+    if stale:
+        compacted = output.with_name(output.name + ".compact")
+        with open(output, "rb") as src, open(compacted, "wb") as dst:
+            for line in src:
+                if line.endswith(b"\n") and _answered_id(line) is not None:
+                    dst.write(line)
+        os.replace(compacted, output)
+        log.info("🧹 Dropped rows to retry from checkpoint", rows=stale, kept=len(done))
+    elif complete_bytes < output.stat().st_size:
+        with open(output, "rb+") as f:
+            f.truncate(complete_bytes)
+    return done
+
+
+def answer_file(rag, source: Path, output: Path, workers: int, priority: int, limit: int = None) -> Dict[str, Any]:
+    """Answer every not-yet-done question in source, appending results to output"""
+    done = load_checkpoint(output)
+    skipped = 0
+    counts = {"ok": 0, "error": 0, "rate_limited": 0}
+    latencies = []
+    write_lock = threading.Lock()
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    def answer(row: Dict[str, str], out) -> None:
+        started = time.perf_counter()
+        try:
+            result = rag.query(row["question"], session_id=f"batch-{row['id']}", priority=priority)
+        except Exception as e:
+            result = {"error": str(e)}
+        elapsed = time.perf_counter() - started
+        outcome = "error" if "error" in result else ("rate_limited" if "retry_after" in result else "ok")
+        line = json.dumps({"id": row["id"], "question": row["question"], **result,
+                           "latency_s": round(elapsed, 4)}, ensure_ascii=False)
+        with write_lock:
+            out.write(line + "\n")
+            out.flush()
+            counts[outcome] += 1
+            latencies.append(elapsed)
+            answered = sum(counts.values())
+            if answered % 25 == 0:
+                log.info("📝 Progress", answered=answered, skipped=skipped, errors=counts["error"])
+
+    def collect(finished) -> None:
+        """Count answer() calls that raised (e.g. a failed write) instead of dropping them silently"""
+        for future in finished:
+            error = future.exception()
+            if error is not None:
+                log.error("❌ Batch row failed", error=str(error))
+                with write_lock:
+                    counts["error"] += 1
+
+    started = time.perf_counter()
+    submitted = 0
+    with open(output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-answer") as pool:
+        in_flight = set()
+        for row in read_questions(source):
+            if row["id"] in done:
+                skipped += 1
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            done.add(row["id"])  # duplicate rows in the same file are answered once
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+            in_flight.add(pool.submit(answer, row, out))
+            submitted += 1
+        collect(wait(in_flight).done)
+    elapsed = time.perf_counter() - started
+
+    answered = sum(counts.values())
+    return {
+        "source": str(source),
+        "output": str(output),
+        "answered": answered,
+        "skipped": skipped,
+        **counts,
+        "workers": workers,
+        "elapsed_s": round(elapsed, 2),
+        "questions_per_s": round(answered / elapsed, 3) if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL/CSV file of questions in parallel")
+    parser.add_argument("input", help=".jsonl or .csv file with a 'question' field (and optional 'id')")
+    parser.add_argument("-o", "--output", required=True, help="results JSONL (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=4, help="questions answered concurrently")
+    parser.add_argument("--priority", choices=list(PRIORITIES), default="background",
+                        help="rate-limiter priority (background leaves headroom for live users)")
+    parser.add_argument("--llm-backends", default=None, help="comma-separated backend order, e.g. groq (stub needs FITSCIENCE_STUB_LLM=1)")
+    parser.add_argument("--limit", type=int, default=None, help="answer at most N new questions")
+    args = parser.parse_args()
+
+    source, output = Path(args.input).resolve(), Path(args.output).resolve()
+    configure_logging()
+    os.chdir(PROJECT_ROOT)  # initialize_system() loads data/ relative to the project root
+    from rag_pipeline import FitScienceRAG
+    backends = [b for b in args.llm_backends.split(",") if b] if args.llm_backends else None
+    rag = FitScienceRAG(llm_backends=backends)
+    if not rag.initialize_system():
+        print("❌ RAG system failed to initialize")
+        return 1
+
+    report = answer_file(rag, source, output, args.workers,
+                         PRIORITIES[args.priority], limit=args.limit)
+    lat = report["latency"]
+    print(f"✅ Answered {report['answered']} questions ({report['skipped']} already done) "
+          f"in {report['elapsed_s']} s → {report['questions_per_s']} questions/s")
+    if lat["count"]:
+        print(f"⏱️ p50 {lat['p50_ms']:.0f} ms  p95 {lat['p95_ms']:.0f} ms  "
+              f"errors {report['error']}  rate-limited {report['rate_limited']}")
+    print(f"💾 Results → {report['output']}")
+    if lat["count"]:
+        record_run("batch", {**pipeline_metrics(), **latency_metrics(lat, "query"),
+                             "questions_per_s": report["questions_per_s"],
+                             "error_rate": report["error"] / report["answered"]},
+                   config={"workers": args.workers, "llm_backends": args.llm_backends, "priority": args.priority})
+    return 0 if report["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+FitScience Coach - API Benchmark
+Requests-per-second and latency of the HTTP API (api_server.py) at increasing client concurrency
+
+    python src/bench_api.py --spawn --llm-backends stub                  # start a server, then measure
+    python src/bench_api.py --url http://127.0.0.1:8000 --endpoint bmr --concurrency 1,8,64
+    FITSCIENCE_STUB_LATENCY=0.2 python src/bench_api.py --spawn --llm-backends stub --endpoint query
+
+Each client thread keeps one HTTP/1.1 connection open and sends requests back to back for
+--duration seconds per step. Results go to bench_results/api_<git-revision>.json.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+from bench_utils import BENCH_RESULTS_DIR, PROJECT_ROOT, latency_summary, run_metadata, write_results
+from perf_history import latency_metrics, record_run
+from load_test import ASK_QUESTIONS
+
+SRC_DIR = Path(__file__).resolve().parent
+
+
+def request_for(endpoint: str, rng: random.Random) -> Tuple[str, str, Dict]:
+    """(method, path, body) for one request against the chosen endpoint"""
+    if endpoint == "health":
+        return "GET", "/health", None
+    if endpoint == "bmr":
+        return "POST", "/bmr", {"weight_kg": rng.randint(50, 110), "height_cm": rng.randint(150, 200),
+                                "age": rng.randint(18, 70), "gender": rng.choice(["male", "female"]),
+                                "activity_level": "moderately_active"}
+    return "POST", "/query", {"question": rng.choice(ASK_QUESTIONS), "session_id": f"bench-{rng.random():.6f}"}
+
+
+def run_step(url: str, endpoint: str, clients: int, duration: float) -> Dict:
+    parsed = urlparse(url)
+    samples: List[Tuple[float, int]] = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+        while not stop.is_set():
+            method, path, body = request_for(endpoint, rng)
+            payload = json.dumps(body).encode("utf-8") if body is not None else None
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+            with lock:
+                samples.append((time.perf_counter() - started, status))
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    stop.wait(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    ok = [lat for lat, status in samples if status == 200]
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "concurrency": clients,
+        "requests": len(samples),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "statuses": statuses,
+        "latency": latency_summary(ok),
+    }
+
+
+def spawn_server(port: int, llm_backends: str, workers: int, timeout: float = 300.0) -> subprocess.Popen:
+    """Start api_server.py and wait until /ready says the index is built"""
+    cmd = [sys.executable, str(SRC_DIR / "api_server.py"), "--port", str(port), "--workers", str(workers)]
+    if llm_backends:
+        cmd += ["--llm-backends", llm_backends]
+    env = dict(os.environ, FITSCIENCE_LOG_LEVEL=os.getenv("FITSCIENCE_LOG_LEVEL", "WARNING"))
+    if llm_backends and "stub" in llm_backends.split(","):
+        env["FITSCIENCE_STUB_LLM"] = "1"  # the stub backend is opt-in (see llm_backends.py)
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"api_server.py exited with {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("api_server.py did not become ready in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API requests-per-second benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start api_server.py on the --url port first")
+    parser.add_argument("--llm-backends", default=None, help="backends for the spawned server, e.g. stub")
+    parser.add_argument("--workers", type=int, default=8, help="worker pool size of the spawned server")
+    parser.add_argument("--endpoint", choices=["query", "bmr", "health"], default="query")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency step")
+    parser.add_argument("--output", help="result file (default bench_results/api_<git-revision>.json)")
+    args = parser.parse_args()
+
+    server = spawn_server(urlparse(args.url).port or 8000, args.llm_backends, args.workers) if args.spawn else None
+    try:
+        steps = []
+        print(f"{'clients':>8} {'req':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>6}")
+        for clients in [int(c) for c in args.concurrency.split(",") if c]:
+            step = run_step(args.url, args.endpoint, clients, args.duration)
+            steps.append(step)
+            lat = step["latency"]
+            print(f"{clients:>8} {step['requests']:>7} {step['rps']:>9.1f} {lat.get('p50_ms', float('nan')):>9.1f} "
+                  f"{lat.get('p95_ms', float('nan')):>9.1f} {lat.get('p99_ms', float('nan')):>9.1f} {step['error_rate']:>6.1%}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    payload = {
+        "benchmark": "api",
+        "run": run_metadata(),
+        "config": {"url": args.url, "endpoint": args.endpoint, "duration_s": args.duration,
+                   "spawned": args.spawn, "llm_backends": args.llm_backends, "workers": args.workers},
+        "steps": steps,
+    }
+    output = Path(args.output) if args.output else BENCH_RESULTS_DIR / f"api_{payload['run']['git_revision']}.json"
+    write_results(output, payload)
+    print(f"💾 Saved → {output}")
+    if steps:
+        top = steps[-1]
+        record_run("api", {"max_rps": max(s["rps"] for s in steps), "error_rate": top["error_rate"],
+                           **latency_metrics(top["latency"], f"clients{top['concurrency']}")},
+                   config=payload["config"], run=payload["run"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+FitScience Coach - Retrieval Micro-Benchmark
+Measures how vector-store build and retrieval scale on synthetic corpora in the learning_corpus.csv schema
+
+For each corpus size and retrieval backend it records build time, peak memory, index size on disk and
+p50/p95/p99 query latency, and writes everything to bench_results/retrieval_<git-revision>.json.
+
+    python src/bench_retrieval.py                                  # 1k, 10k, 100k, 1M chunks
+    python src/bench_retrieval.py --sizes 1000,10000 --embedder minilm
+    python src/bench_retrieval.py --backends faiss_flat,faiss_hnsw --queries 500
+
+Each (size, backend) pair is built in a fresh worker process so peak RSS is not polluted by earlier runs.
+Embedding 1M chunks with all-MiniLM-L6-v2 on CPU takes hours, so `--embedder auto` (default) uses the real
+model up to 10k chunks and a fast deterministic hashing embedder (same 384 dimensions) beyond that; the
+embedder used is recorded with every result.
+"""
+
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from bench_utils import (
+    BENCH_RESULTS_DIR, latency_summary, peak_rss_mb, current_rss_mb, dir_size_bytes, run_metadata, write_results
+)
+from embedding_utils import embed_matrix
+from perf_history import latency_metrics, record_run
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+TOP_K = 8            # same k as FitScienceRAG.setup_qa_chain()
+MINILM_MAX_SIZE = 10_000
+
+# ---------------------------------------------------------------------
+# Synthetic corpus (learning_corpus.csv schema: Title, URL, Type, Relevance, Notes)
+# ---------------------------------------------------------------------
+TOPICS = {
+    "protein": ["protein intake", "muscle protein synthesis", "leucine threshold", "protein timing", "whey supplementation"],
+    "training": ["progressive overload", "training volume", "resistance training", "periodization", "workout split"],
+    "metabolism": ["basal metabolic rate", "energy balance", "calorie deficit", "thermic effect of food", "NEAT"],
+    "micronutrients": ["vitamin D status", "iron deficiency", "magnesium intake", "zinc and immunity", "B-vitamin metabolism"],
+    "recovery": ["sleep duration", "deep sleep", "growth hormone release", "active recovery", "overtraining"],
+    "supplements": ["creatine monohydrate", "omega-3 fatty acids", "caffeine ergogenic effects", "probiotics", "beta-alanine"],
+}
+SOURCE_TYPES = ["Academic Paper", "Podcast", "Government Resource"]
+FINDINGS = [
+    "A meta-analysis of {n} trials found that {a} meaningfully changes outcomes when combined with {b}.",
+    "Participants who prioritised {a} improved by {n}% over twelve weeks compared with controls.",
+    "Guidelines recommend monitoring {a} and adjusting {b} every {n} weeks for beginners.",
+    "Evidence for {a} is strongest in trained athletes, while effects of {b} are smaller in novices.",
+    "Researchers observed diminishing returns from {a} beyond {n} units per day, regardless of {b}.",
+    "Practical advice: track {a} consistently and review {b} with a qualified professional.",
+]
+
+
+def synthetic_corpus(n: int, seed: int = 42) -> pd.DataFrame:
+    """n sources in the learning_corpus.csv schema with deterministic, topic-coherent notes"""
+    rng = random.Random(seed)
+    topic_names = list(TOPICS)
+    rows = []
+    for i in range(n):
+        topic = topic_names[i % len(topic_names)]
+        a, b = rng.sample(TOPICS[topic], 2)
+        rows.append({
+            "Title": f"{a.capitalize()} and {b}: study {i}",
+            "URL": f"https://example.org/fitscience/{topic}/{i}",
+            "Type": SOURCE_TYPES[rng.randrange(len(SOURCE_TYPES))],
+            "Relevance": f"{rng.choice(['High', 'Medium'])} - {topic.capitalize()} evidence",
+            "Notes": " ".join(rng.choice(FINDINGS).format(a=rng.choice(TOPICS[topic]), b=b, n=rng.randint(2, 40))
+                              for _ in range(6)),
+        })
+    return pd.DataFrame(rows)
+
+
+def corpus_documents(df: pd.DataFrame):
+    """One Document per row, with the same metadata keys FitScienceRAG.create_synthetic_content() uses"""
+    from langchain.schema import Document
+    return [
+        Document(
+            page_content=f"{row.Title}\n\n{row.Notes}",
+            metadata={"source": row.Title, "url": row.URL, "type": row.Type,
+                      "relevance": row.Relevance, "notes": row.Notes},
+        )
+        for row in df.itertuples(index=False)
+    ]
+
+
+def synthetic_queries(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    phrases = [p for ps in TOPICS.values() for p in ps]
+    templates = ["How does {a} affect {b}?", "What is the evidence on {a}?",
+                 "How much {a} do I need?", "Should beginners focus on {a} or {b}?"]
+    return [rng.choice(templates).format(a=rng.choice(phrases), b=rng.choice(phrases)) for _ in range(n)]
+
+
+# ---------------------------------------------------------------------
+# Embedders
+# ---------------------------------------------------------------------
+class HashingEmbeddings:
+    """Deterministic bag-of-words hashing embedder with MiniLM's dimensionality
+
+    Only for benchmarking index scaling at sizes where the real model is impractically slow.
+    Implements the LangChain Embeddings methods so it can be handed to FAISS.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._token_cache: Dict[str, tuple] = {}
+
+    def _slot(self, token: str):
+        slot = self._token_cache.get(token)
+        if slot is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            slot = self._token_cache[token] = (h % self.dim, 1.0 if (h >> 16) & 1 else -1.0)
+        return slot
+
+    def _embed(self, text: str) -> np.ndarray:
+        slots = [self._slot(t) for t in text.lower().split()]
+        if not slots:
+            return np.zeros(self.dim, dtype=np.float32)
+        idx, signs = zip(*slots)
+        vec = np.bincount(idx, weights=signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+def make_embedder(name: str):
+    if name == "minilm":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"})
+    return HashingEmbeddings()
+
+
+# ---------------------------------------------------------------------
+# Retrieval backends
+# ---------------------------------------------------------------------
+def _wrap_faiss(index, documents, embedder):
+    """Wrap a raw FAISS index in the LangChain vector store FitScienceRAG queries"""
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    ids = [str(i) for i in range(len(documents))]
+    return FAISS(embedder, index, InMemoryDocstore(dict(zip(ids, documents))), dict(enumerate(ids)))
+
+
+class FaissFlatBackend:
+    """Exact L2 search - exactly what FitScienceRAG.build_vectorstore() builds today"""
+    name = "faiss_flat"
+
+    def build(self, vectors, documents, embedder):
+        import faiss
+        # Add the float32 matrix directly: from_embeddings() would go through Python float lists,
+        # which inflates the peak memory this benchmark measures
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        self.store = _wrap_faiss(index, documents, embedder)
+
+    def search(self, query_vector, k):
+        return self.store.similarity_search_by_vector(query_vector.tolist(), k=k)
+
+    def save(self, path: Path):
+        self.store.save_local(str(path))
+
+
+class FaissHNSWBackend(FaissFlatBackend):
+    """Approximate graph index (HNSW, M=32, efSearch=64)"""
+    name = "faiss_hnsw"
+
+    def build(self, vectors, documents, embedder):
+        import faiss
+        index = faiss.IndexHNSWFlat(vectors.shape[1], 32)
+        index.hnsw.efSearch = 64
+        index.add(vectors)
+        self.store = _wrap_faiss(index, documents, embedder)
+
+
+class FaissIVFBackend(FaissFlatBackend):
+    """Inverted-file index (nlist ≈ 4·√n, nprobe=16) - needs a training pass"""
+    name = "faiss_ivf"
+
+    def build(self, vectors, documents, embedder):
+        import faiss
+        n, dim = vectors.shape
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))  # FAISS wants ≥39 training points per list
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        sample = vectors[np.random.default_rng(0).choice(n, size=min(n, nlist * 256), replace=False)]
+        index.train(sample)
+        index.add(vectors)
+        index.nprobe = min(16, nlist)
+        self.quantizer = quantizer  # keep alive alongside the index
+        self.store = _wrap_faiss(index, documents, embedder)
+
+
+class NumpyExactBackend:
+    """Brute-force L2 in NumPy - baseline without FAISS"""
+    name = "numpy_exact"
+
+    def build(self, vectors, documents, embedder):
+        self.vectors = np.ascontiguousarray(vectors)
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.documents = documents
+
+    def search(self, query_vector, k):
+        dists = self.sq_norms - 2.0 * (self.vectors @ query_vector)
+        top = np.argpartition(dists, min(k, len(dists) - 1))[:k]
+        return [self.documents[i] for i in top[np.argsort(dists[top])]]
+
+    def save(self, path: Path):
+        import pickle
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", self.vectors)
+        with open(path / "docs.pkl", "wb") as f:
+            pickle.dump(self.documents, f)
+
+
+BACKENDS = {cls.name: cls for cls in (FaissFlatBackend, FaissHNSWBackend, FaissIVFBackend, NumpyExactBackend)}
+
+
+# ---------------------------------------------------------------------
+# Worker: one (size, backend) measurement in a fresh process
+# ---------------------------------------------------------------------
+def run_worker(size: int, backend_name: str, workdir: Path, embedder_name: str, seed: int) -> Dict:
+    documents = corpus_documents(synthetic_corpus(size, seed))
+    vectors = np.load(workdir / f"corpus_{size}.npy")
+    query_vectors = np.load(workdir / f"queries_{size}.npy")
+    embedder = make_embedder(embedder_name) if backend_name != "numpy_exact" else None
+
+    rss_before = current_rss_mb()
+    backend = BACKENDS[backend_name]()
+    started = time.perf_counter()
+    backend.build(vectors, documents, embedder)
+    build_s = time.perf_counter() - started
+    rss_after = current_rss_mb()
+
+    index_dir = workdir / f"index_{size}_{backend_name}"
+    backend.save(index_dir)
+    index_bytes = dir_size_bytes(index_dir)
+
+    for q in query_vectors[:5]:  # warm caches / lazy initialisation
+        backend.search(q, TOP_K)
+    latencies = []
+    for q in query_vectors:
+        started = time.perf_counter()
+        backend.search(q, TOP_K)
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "build_s": round(build_s, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "index_rss_mb": round(rss_after - rss_before, 1),
+        "index_size_bytes": index_bytes,
+        "search_latency": latency_summary(latencies),
+    }
+
+
+def measure(size: int, backend_name: str, workdir: Path, embedder_name: str, seed: int) -> Dict:
+    cmd = [sys.executable, __file__, "--worker", "--sizes", str(size), "--backends", backend_name,
+           "--workdir", str(workdir), "--embedder", embedder_name, "--seed", str(seed)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(sizes: List[int], backends: List[str], embedder_choice: str, n_queries: int,
+                  seed: int, workdir: Path) -> Dict:
+    results = []
+    queries = synthetic_queries(n_queries)
+    for size in sizes:
+        embedder_name = embedder_choice
+        if embedder_choice == "auto":
+            embedder_name = "minilm" if size <= MINILM_MAX_SIZE else "hash"
+        print(f"\n📦 {size:,} chunks — embedding with {embedder_name}...")
+        embedder = make_embedder(embedder_name)
+        texts = [d.page_content for d in corpus_documents(synthetic_corpus(size, seed))]
+        started = time.perf_counter()
+        vectors = embed_matrix(embedder, texts)
+        embed_s = time.perf_counter() - started
+
+        query_latencies, query_vectors = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            query_vectors.append(np.asarray(embedder.embed_query(q), dtype=np.float32))
+            query_latencies.append(time.perf_counter() - t0)
+        np.save(workdir / f"corpus_{size}.npy", vectors)
+        np.save(workdir / f"queries_{size}.npy", np.vstack(query_vectors))
+        del vectors, texts
+
+        for backend_name in backends:
+            print(f"   🔄 {backend_name}...", end=" ", flush=True)
+            row = measure(size, backend_name, workdir, embedder_name, seed)
+            row.update({"size": size, "backend": backend_name, "embedder": embedder_name,
+                        "embed_s": round(embed_s, 3), "embed_chunks_per_s": round(size / embed_s, 1),
+                        "query_embed_latency": latency_summary(query_latencies)})
+            results.append(row)
+            if "error" in row:
+                print(f"❌ {row['error']}")
+            else:
+                lat = row["search_latency"]
+                print(f"build {row['build_s']:.2f}s | peak {row['peak_rss_mb']:.0f} MB | "
+                      f"disk {row['index_size_bytes'] / 1e6:.1f} MB | "
+                      f"p50 {lat['p50_ms']:.2f} ms p95 {lat['p95_ms']:.2f} ms p99 {lat['p99_ms']:.2f} ms")
+    return {"benchmark": "retrieval", "run": run_metadata(), "top_k": TOP_K,
+            "queries": n_queries, "seed": seed, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval scaling benchmark for FitScience Coach")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--embedder", choices=["auto", "minilm", "hash"], default="auto")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="result file (default bench_results/retrieval_<git-revision>.json)")
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends {sorted(unknown)}; choose from {sorted(BACKENDS)}")
+
+    if args.worker:
+        print(json.dumps(run_worker(sizes[0], backends[0], Path(args.workdir), args.embedder, args.seed)))
+        return
+
+    print("🏁 FitScience Coach retrieval benchmark")
+    with tempfile.TemporaryDirectory(prefix="fitscience_bench_") as tmp:
+        payload = run_benchmark(sizes, backends, args.embedder, args.queries, args.seed, Path(tmp))
+    output = Path(args.output) if args.output else BENCH_RESULTS_DIR / f"retrieval_{payload['run']['git_revision']}.json"
+    write_results(output, payload)
+    print(f"\n💾 Saved → {output}")
+    history = {}
+    for row in payload["results"]:
+        if "error" in row:
+            continue
+        name = f"{row['backend']}_{row['size']}"
+        history.update({f"{name}_build_s": row["build_s"], f"{name}_peak_rss_mb": row["peak_rss_mb"],
+                        **latency_metrics(row["search_latency"], f"{name}_search")})
+    record_run("retrieval", history, config={"sizes": sizes, "embedder": args.embedder, "queries": args.queries},
+               run=payload["run"])
+
+
+if __name__ == "__main__":
+    main()
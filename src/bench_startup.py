@@ -0,0 +1,143 @@
+"""
+FitScience Coach - Startup Benchmark
+Measures `import rag_pipeline` and time-to-ready (FitScienceRAG() + initialize_system()) in fresh
+interpreters, and exits nonzero when either goes over its budget - usable as a CI gate
+
+    python src/bench_startup.py                                   # default budgets
+    python src/bench_startup.py --import-budget-ms 150 --ready-budget-s 20 --repeats 5
+    python src/bench_startup.py --skip-ready                      # import time only (no model download)
+
+Also fails if importing the pipeline pulls in a module listed in --forbid (Streamlit by default)
+or any of the heavy libraries that must load lazily. Results go to bench_results/startup_<git-revision>.json.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from bench_utils import BENCH_RESULTS_DIR, PROJECT_ROOT, run_metadata, write_results
+from perf_history import record_run
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Must not be imported by `import rag_pipeline` itself - they load on first use
+LAZY_MODULES = ["streamlit", "pandas", "langchain", "langchain_community", "langchain_openai",
+                "langchain_groq", "faiss", "sentence_transformers", "torch"]
+
+_IMPORT_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import rag_pipeline
+elapsed = time.perf_counter() - started
+print(json.dumps({"import_s": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+_READY_PROBE = """
+import time, json
+started = time.perf_counter()
+import rag_pipeline
+imported = time.perf_counter()
+rag = rag_pipeline.FitScienceRAG(use_groq=False)
+ok = rag.initialize_system()
+ready = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "ready_s": ready - started, "ok": bool(ok)}))
+"""
+
+
+def _probe(code: str) -> Dict:
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), FITSCIENCE_LOG_LEVEL="WARNING")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(top: int = 10) -> List[Dict]:
+    """Largest cumulative entries from `python -X importtime -c 'import rag_pipeline'`"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import rag_pipeline"], cwd=SRC_DIR,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        if name == "site":  # everything up to here is interpreter startup, not our import
+            rows = []
+            continue
+        rows.append({"module": name, "self_ms": int(self_us) / 1000.0, "cumulative_ms": int(cumulative_us) / 1000.0})
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and time-to-ready budget check")
+    parser.add_argument("--import-budget-ms", type=float,
+                        default=float(os.getenv("FITSCIENCE_IMPORT_BUDGET_MS", "250")))
+    parser.add_argument("--ready-budget-s", type=float,
+                        default=float(os.getenv("FITSCIENCE_READY_BUDGET_S", "30")))
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per measurement (median wins)")
+    parser.add_argument("--forbid", default=",".join(LAZY_MODULES),
+                        help="modules that `import rag_pipeline` must not load")
+    parser.add_argument("--skip-ready", action="store_true", help="only measure the import")
+    parser.add_argument("--output", help="result file (default bench_results/startup_<git-revision>.json)")
+    args = parser.parse_args()
+
+    forbidden = [m for m in args.forbid.split(",") if m]
+    failures = []
+
+    imports = [_probe(_IMPORT_PROBE % (forbidden,)) for _ in range(args.repeats)]
+    import_ms = statistics.median(r["import_s"] for r in imports) * 1000.0
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+    print(f"📦 import rag_pipeline: {import_ms:.1f} ms median of {args.repeats} (budget {args.import_budget_ms:.0f} ms)")
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import took {import_ms:.1f} ms > {args.import_budget_ms:.0f} ms")
+    if loaded:
+        failures.append(f"import loaded lazy/forbidden modules: {', '.join(loaded)}")
+    heaviest = heaviest_imports()
+    for row in heaviest[:5]:
+        print(f"   {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    ready = None
+    if not args.skip_ready:
+        try:
+            runs = [_probe(_READY_PROBE) for _ in range(max(1, args.repeats // 2))]
+            ready_s = statistics.median(r["ready_s"] for r in runs)
+            ready = {"median_s": round(ready_s, 3), "runs_s": [round(r["ready_s"], 3) for r in runs],
+                     "ok": all(r["ok"] for r in runs)}
+            print(f"🚀 time-to-ready: {ready_s:.2f} s median of {len(runs)} (budget {args.ready_budget_s:.0f} s)")
+            if not ready["ok"]:
+                failures.append("initialize_system() returned False")
+            elif ready_s > args.ready_budget_s:
+                failures.append(f"time-to-ready {ready_s:.2f} s > {args.ready_budget_s:.0f} s")
+        except RuntimeError as e:
+            failures.append(f"time-to-ready probe failed: {e}")
+
+    payload = {
+        "benchmark": "startup",
+        "run": run_metadata(),
+        "budgets": {"import_ms": args.import_budget_ms, "ready_s": args.ready_budget_s},
+        "import": {"median_ms": round(import_ms, 2), "runs_ms": [round(r["import_s"] * 1000.0, 2) for r in imports],
+                   "forbidden_loaded": loaded, "heaviest": heaviest},
+        "ready": ready,
+        "failures": failures,
+    }
+    output = Path(args.output) if args.output else BENCH_RESULTS_DIR / f"startup_{payload['run']['git_revision']}.json"
+    write_results(output, payload)
+    print(f"💾 Saved → {output}")
+    record_run("startup", {"import_ms": import_ms, "ready_s": ready["median_s"] if ready else None},
+               config={"repeats": args.repeats}, run=payload["run"])
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        return 1
+    print("✅ Startup within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
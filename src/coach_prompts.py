@@ -0,0 +1,35 @@
+"""
+FitScience Coach - Coach Prompts
+Quick Questions and the Study / Quiz generation prompts sent from the Streamlit tabs
+"""
+
+from typing import List
+
+# Ask Coach tab quick-question buttons
+QUICK_QUESTIONS = [
+    "How much protein should I eat daily?",
+    "What is progressive overload in training?",
+    "What supplements are evidence-based?",
+    "How much sleep do I need for recovery?",
+    "What's the best workout split for beginners?",
+    "How do I calculate my daily calorie needs?"
+]
+
+
+def study_prompt(title: str) -> str:
+    """Courses tab 💡 Study button: study guide for one lesson source"""
+    return f"""Create a comprehensive study guide for: {title}
+Do NOT add inline citations (e.g. "Source: [1]..." or "(Source: Morton et al.)") after each learning point—the user is already studying this specific paper. Present learning points and key takeaways cleanly. You may list sources at the end only."""
+
+
+def quiz_prompts(title: str) -> List[str]:
+    """Courses tab 🧠 Quiz button: JSON prompt first, numbered-format prompt as fallback"""
+    return [
+        f"""Create 3 multiple choice quiz questions about: {title}. Use ONLY the knowledge base. Return ONLY this exact JSON format, no other text:
+[{{"question": "First question?", "options": ["Choice A", "Choice B", "Choice C"], "correct_index": 0}}, {{"question": "Second?", "options": ["A", "B", "C"], "correct_index": 1}}, {{"question": "Third?", "options": ["X", "Y", "Z"], "correct_index": 2}}]
+correct_index is 0 for first option, 1 for second, etc.""",
+        f"""Write 3 quiz questions about {title} in this exact format:
+1. Question one? a) Option A b) Option B c) Option C. Answer: a
+2. Question two? a) X b) Y c) Z. Answer: b
+3. Question three? a) P b) Q c) R. Answer: c"""
+    ]
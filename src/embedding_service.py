@@ -0,0 +1,284 @@
+"""
+FitScience Coach - Embedding Service
+One local process owns the embedding model and serves encode requests over a Unix socket
+
+Worker processes (load-test workers, API server workers, batch CLI) select it with
+FITSCIENCE_EMBEDDINGS=service and stay light: they never load sentence-transformers. Requests
+arriving within a few milliseconds of each other are micro-batched into one model call, so
+concurrent query encodes share a forward pass.
+
+    python src/embedding_service.py serve                          # minilm, /tmp/fitscience-embeddings.sock
+    python src/embedding_service.py serve --embedder onnx --max-wait-ms 3
+    python src/embedding_service.py stats
+    FITSCIENCE_EMBEDDINGS=service python src/load_test.py --processes 4
+
+Wire format (both directions): 4-byte big-endian length + JSON header; a response header is
+followed by n * dim float32 values. Unix sockets only (Linux / macOS).
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import queue
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_utils import embed_matrix
+from pipeline_logging import configure_logging, get_logger
+
+log = get_logger("embedding_service")
+
+DEFAULT_SOCKET = "/tmp/fitscience-embeddings.sock"
+_LENGTH = struct.Struct(">I")
+
+
+def default_socket_path() -> str:
+    return os.getenv("FITSCIENCE_EMBEDDING_SOCKET", DEFAULT_SOCKET)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    chunks, remaining = [], n
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding service connection closed")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _send_message(sock: socket.socket, header: Dict[str, Any], payload: bytes = b""):
+    body = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(body)) + body + payload)
+
+
+def _recv_header(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+class _Pending:
+    __slots__ = ("texts", "done", "vectors", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.vectors: Optional[np.ndarray] = None
+        self.error: Optional[str] = None
+
+
+class MicroBatcher:
+    """Collects encode requests for up to max_wait seconds (or max_batch texts) and runs them together"""
+
+    def __init__(self, embedder, max_batch: int = 64, max_wait: float = 0.005):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        pending = _Pending(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise RuntimeError(pending.error)
+        return pending.vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return embed_matrix(self.embedder, texts)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item.texts)
+            texts = [t for item in batch for t in item.texts]
+            try:
+                vectors = self._encode(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+                offset = 0
+                for item in batch:
+                    item.vectors = vectors[offset:offset + len(item.texts)]
+                    offset += len(item.texts)
+            except Exception as e:
+                for item in batch:
+                    item.error = str(e)
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += len(texts)
+            for item in batch:
+                item.done.set()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "avg_texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One client connection; serves requests until the client disconnects"""
+
+    def handle(self):
+        batcher: MicroBatcher = self.server.batcher
+        while True:
+            try:
+                request = _recv_header(self.request)
+            except (ConnectionError, OSError):
+                return
+            if request.get("op") == "stats":
+                _send_message(self.request, batcher.stats())
+                continue
+            try:
+                vectors = batcher.encode(request.get("texts", []))
+            except Exception as e:
+                _send_message(self.request, {"error": str(e)})
+                continue
+            n, dim = vectors.shape if vectors.size else (0, 0)
+            _send_message(self.request, {"n": n, "dim": dim}, vectors.astype(np.float32).tobytes())
+
+
+def _remove_stale_socket(socket_path: str):
+    """Unlink a socket file left by a dead server; raise if a live server still answers on it"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except FileNotFoundError:
+        return
+    except ConnectionRefusedError:
+        os.unlink(socket_path)  # nobody is listening: stale socket from a previous run
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"an embedding service is already listening on {socket_path}")
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # many workers connect at once on startup
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher):
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _Handler)
+        self.batcher = batcher
+        self.socket_path = socket_path
+
+
+class EmbeddingServiceClient:
+    """LangChain-style embeddings backed by the service; one persistent connection per thread"""
+
+    def __init__(self, socket_path: str = None, timeout: float = 60.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _request(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        for attempt in (1, 2):  # reconnect once if the service restarted under us
+            try:
+                sock = self._connection()
+                _send_message(sock, header)
+                response = _recv_header(sock)
+                payload = b""
+                if "n" in response:
+                    payload = _recv_exact(sock, response["n"] * response["dim"] * 4)
+                return response, payload
+            except (ConnectionError, OSError):
+                sock = getattr(self._local, "sock", None)
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt == 2:
+                    raise
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        response, payload = self._request({"texts": list(texts)})
+        if "error" in response:
+            raise RuntimeError(f"embedding service: {response['error']}")
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["n"], response["dim"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_matrix([text])[0].tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._request({"op": "stats"})[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared local embedding service (Unix socket)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="load the model and serve encode requests")
+    serve.add_argument("--socket", default=None, help=f"socket path (default $FITSCIENCE_EMBEDDING_SOCKET or {DEFAULT_SOCKET})")
+    serve.add_argument("--embedder", choices=["minilm", "onnx"], default="minilm")
+    serve.add_argument("--max-batch", type=int, default=64, help="texts per model call")
+    serve.add_argument("--max-wait-ms", type=float, default=5.0, help="how long to wait for more requests")
+    stats = sub.add_parser("stats", help="print batching counters of a running service")
+    stats.add_argument("--socket", default=None)
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    if args.command == "stats":
+        print(json.dumps(EmbeddingServiceClient(socket_path).stats(), indent=2))
+        return 0
+
+    configure_logging()
+    from rag_pipeline import create_embeddings
+    started = time.perf_counter()
+    embedder = create_embeddings(args.embedder)
+    embedder.embed_query("warm-up")
+    batcher = MicroBatcher(embedder, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0)
+    try:
+        server = EmbeddingServer(socket_path, batcher)
+    except OSError as e:
+        log.error("❌ Embedding service not started", socket=socket_path, error=str(e))
+        return 1
+    log.info("🧠 Embedding service ready", socket=socket_path, embedder=args.embedder,
+             load_s=round(time.perf_counter() - started, 2), max_wait_ms=args.max_wait_ms)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""
+FitScience Coach - Embedding Utilities
+Batch embedding into one float32 matrix for any embedder the pipeline can use
+
+Embedders with a native embed_matrix() (ONNX, the embedding service client, the benchmark hashing
+embedder) are called directly; LangChain embeddings go through embed_documents() in batches.
+Only NumPy is imported, so scorers and services can use this without the benchmark tooling.
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def embed_matrix(embedder, texts: List[str], batch_size: int = 256) -> np.ndarray:
+    """(len(texts), dim) float32 matrix of document embeddings"""
+    if hasattr(embedder, "embed_matrix"):
+        return np.asarray(embedder.embed_matrix(texts), dtype=np.float32)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    chunks = [np.asarray(embedder.embed_documents(texts[i:i + batch_size]), dtype=np.float32)
+              for i in range(0, len(texts), batch_size)]
+    return np.vstack(chunks)
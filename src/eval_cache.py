@@ -0,0 +1,119 @@
+"""
+FitScience Coach - Evaluation Cache
+RAGAs answers and metric scores cached per question, pipeline fingerprint and metric
+
+An answer is reused while the pipeline fingerprint (LLM, prompt template, index contents, k,
+embeddings; see FitScienceRAG.pipeline_fingerprint) is unchanged. A metric score is reused
+while the answer it judged and the judge model are unchanged, so editing one question or one
+prompt only re-pays the answers and judge calls it actually affects.
+
+    cache = EvalCache()                          # ragas_results/eval_cache.jsonl
+    cache.answer(sample, fingerprint)            # cached answer record or None
+    cache.score(sample, fingerprint, "faithfulness", answer, judge="gpt-4o-mini")
+
+The file is append-only JSONL; the latest record for a key wins.
+"""
+
+import json
+import math
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = Path("ragas_results") / "eval_cache.jsonl"
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def sample_key(sample: Dict[str, Any]) -> str:
+    """A question together with its reference answer and contexts (editing either invalidates it)"""
+    return _digest(sample["question"], sample.get("ground_truth"), sample.get("contexts"))
+
+
+class EvalCache:
+    """Answers and scores of earlier evaluation runs; path=None keeps the cache in memory only"""
+
+    def __init__(self, path: Optional[Path] = DEFAULT_CACHE_PATH):
+        self.path = Path(path) if path is not None else None
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = {"answer": 0, "score": 0}
+        self.misses = {"answer": 0, "score": 0}
+        if self.path is not None and self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partial line from an interrupted run
+                    self._records[record["key"]] = record
+
+    def _get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(key)
+        if record is None:
+            self.misses[kind] += 1
+        else:
+            self.hits[kind] += 1
+        return record
+
+    def _put(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records[record["key"]] = record
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _answer_key(sample: Dict[str, Any], fingerprint: Dict[str, Any]) -> str:
+        return "answer:" + _digest(sample_key(sample), fingerprint["hash"])
+
+    @staticmethod
+    def _score_key(sample: Dict[str, Any], fingerprint: Dict[str, Any], metric: str, answer: str, judge: str) -> str:
+        return "score:" + _digest(sample_key(sample), fingerprint["hash"], metric, judge, answer)
+
+    def answer(self, sample: Dict[str, Any], fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._get("answer", self._answer_key(sample, fingerprint))
+
+    def put_answer(self, sample: Dict[str, Any], fingerprint: Dict[str, Any], answer: str, latency_s: float,
+                   status: str = "ok"):
+        if status != "ok":
+            return  # errors, timeouts and rate-limit placeholders are retried next run rather than cached
+        self._put({"key": self._answer_key(sample, fingerprint), "question": sample["question"],
+                   "fingerprint": fingerprint["hash"], "answer": answer, "latency_s": latency_s})
+
+    def score(self, sample: Dict[str, Any], fingerprint: Dict[str, Any], metric: str, answer: str,
+              judge: str) -> Optional[float]:
+        record = self._get("score", self._score_key(sample, fingerprint, metric, answer, judge))
+        return record["value"] if record is not None else None
+
+    def put_score(self, sample: Dict[str, Any], fingerprint: Dict[str, Any], metric: str, answer: str,
+                  judge: str, value: float):
+        if value is None or math.isnan(value):
+            return  # a failed judge call is retried next run rather than cached
+        self._put({"key": self._score_key(sample, fingerprint, metric, answer, judge), "question": sample["question"],
+                   "fingerprint": fingerprint["hash"], "metric": metric, "judge": judge, "value": float(value)})
+
+    def missing_scores(self, samples: List[Dict[str, Any]], answers: List[str], fingerprint: Dict[str, Any],
+                       metrics: List[str], judge: str) -> Tuple[List[Dict[str, float]], Dict[Tuple[str, ...], List[int]]]:
+        """Cached scores per sample, and the sample indices still to evaluate grouped by missing metrics"""
+        scores, todo = [], {}
+        for i, (sample, answer) in enumerate(zip(samples, answers)):
+            found, missing = {}, []
+            for metric in metrics:
+                value = self.score(sample, fingerprint, metric, answer, judge)
+                if value is None:
+                    missing.append(metric)
+                else:
+                    found[metric] = value
+            scores.append(found)
+            if missing:
+                todo.setdefault(tuple(missing), []).append(i)
+        return scores, todo
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path) if self.path else None, "entries": len(self._records),
+                "hits": dict(self.hits), "misses": dict(self.misses)}
@@ -0,0 +1,177 @@
+"""
+FitScience Coach - Evaluation Dataset
+Evaluation questions with ground truths, reference contexts and relevant-source labels
+
+`relevant_sources` lists the learning_corpus.csv titles that answer each question; the
+retrieval evaluator (eval_retrieval.py) scores what FitScienceRAG retrieves against them.
+
+Larger datasets are streamed from JSONL or Parquet (pyarrow) one row at a time:
+
+    for sample in iter_samples("data/eval_questions.jsonl", shard=0, num_shards=4, fraction=0.1):
+        ...
+
+Every sample gets a stable `id` (the row's own `id`, else a hash of the question), and sharding and
+sampling are decided from that id alone, so shards are disjoint and a sample stays in or out of a
+run regardless of file order or which process reads it.
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+DEFAULT_DATASET_PATH = Path(__file__).resolve().parent.parent / "data" / "eval_questions.jsonl"
+PARQUET_BATCH_ROWS = 1024
+
+
+def create_evaluation_dataset():
+    return [
+        {
+            "question": "How much protein should I eat per day for muscle building?",
+            "ground_truth": "For resistance training, consume 1.6–2.2 g/kg body weight daily, spread across meals.",
+            "contexts": [
+                "Optimal intake for muscle growth is 1.6–2.2 g/kg/day distributed over multiple meals.",
+                "Protein distribution across the day enhances synthesis and recovery efficiency.",
+            ],
+            "relevant_sources": [
+                "Protein requirements for resistance training: A meta-analysis",
+                "Position stand: Nutrition and athletic performance",
+                "Protein timing and muscle protein synthesis",
+            ],
+        },
+        {
+            "question": "What is the best workout split for beginners?",
+            "ground_truth": "Full-body training three times per week is best for beginners before switching to upper/lower or push-pull-legs.",
+            "contexts": [
+                "Beginners progress best with full-body workouts 3 days per week.",
+                "This schedule balances stimulus and recovery across muscle groups.",
+            ],
+            "relevant_sources": [
+                "What Is The Best Workout Split?",
+                "Jeff Cavaliere: Optimize Your Exercise Program with Science-Based Tools",
+                "Resistance training volume and frequency",
+                "NHS Strength and Flex: 5-week beginner strength program",
+            ],
+        },
+        {
+            "question": "How do I calculate my BMR and TDEE?",
+            "ground_truth": "Use the Harris–Benedict formula for BMR and multiply by activity factor (1.2–1.9) for TDEE.",
+            "contexts": [
+                "Harris–Benedict: Men = 88.362 + (13.397×wt) + (4.799×ht) – (5.677×age).",
+                "TDEE = BMR × activity (1.2–1.9 depending on lifestyle).",
+            ],
+            "relevant_sources": [
+                "Basal metabolic rate: What it is and how to calculate it",
+                "Metabolic rate calculation accuracy: Harris-Benedict vs others",
+                "Energy balance and body composition",
+                "MyPlate Plan: Personalized daily calories by goal and activity",
+            ],
+        },
+        {
+            "question": "How much sleep do I need for optimal recovery?",
+            "ground_truth": "Adults 7–9 h; athletes 8–10 h. Deep sleep releases growth hormone aiding repair and immune function.",
+            "contexts": [
+                "Adults need 7–9 h; athletes 8–10 h.",
+                "Deep sleep supports muscle protein synthesis and hormone release.",
+            ],
+            "relevant_sources": [
+                "Sleep and athletic performance",
+            ],
+        },
+        {
+            "question": "What are the most important micronutrients for athletes?",
+            "ground_truth": "Iron, Vitamin D, Magnesium, Zinc, and B Vitamins are critical for performance and recovery.",
+            "contexts": [
+                "Iron for oxygen transport; Vitamin D for bone and muscle health.",
+                "Magnesium, Zinc, and B vitamins aid energy and immune functions.",
+            ],
+            "relevant_sources": [
+                "Micronutrients and athletic performance: A review",
+                "NIH ODS: Vitamins and Minerals Fact Sheets",
+                "Dietary Supplements—For Whom? The Current State of Knowledge about the Health Effects of Selected Supplement Use",
+            ],
+        },
+    ]
+
+
+def sample_id(row: Dict[str, Any]) -> str:
+    return str(row.get("id") or hashlib.sha256(row["question"].encode("utf-8")).hexdigest()[:12])
+
+
+def _bucket(sid: str, salt: str = "") -> float:
+    """Deterministic position of a sample id in [0, 1)"""
+    return int(hashlib.sha256((salt + sid).encode("utf-8")).hexdigest()[:15], 16) / float(16 ** 15)
+
+
+def _read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq  # optional: pip install pyarrow
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            yield from batch.to_pylist()
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_samples(path: str = None, shard: int = 0, num_shards: int = 1, fraction: float = 1.0,
+                 seed: int = 0, limit: int = None) -> Iterator[Dict[str, Any]]:
+    """Stream evaluation samples from a .jsonl / .parquet file (default: the built-in list)
+
+    Args:
+        path: Dataset file; rows need `question`, and may carry `id`, `ground_truth`,
+            `contexts` and `relevant_sources`
+        shard, num_shards: Keep only samples whose id hashes to this shard
+        fraction: Keep a deterministic `fraction` of samples (per seed)
+        limit: Stop after this many samples
+    """
+    rows = _read_rows(Path(path)) if path else iter(create_evaluation_dataset())
+    kept = 0
+    for row in rows:
+        if not row.get("question"):
+            continue
+        sid = sample_id(row)
+        if num_shards > 1 and int(_bucket(sid) * num_shards) != shard:
+            continue
+        if fraction < 1.0 and _bucket(sid, salt=f"{seed}:") >= fraction:
+            continue
+        yield {
+            "id": sid,
+            "question": row["question"],
+            "ground_truth": row.get("ground_truth") or "",
+            "contexts": list(row.get("contexts") or []),
+            "relevant_sources": list(row.get("relevant_sources") or []),
+        }
+        kept += 1
+        if limit is not None and kept >= limit:
+            return
+
+
+def iter_batches(samples: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group a sample stream into lists of at most `size`"""
+    batch = []
+    for sample in samples:
+        batch.append(sample)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def add_dataset_arguments(parser):
+    """--dataset / --shard / --sample / --seed / --limit, shared by the evaluation scripts"""
+    parser.add_argument("--dataset", default=None,
+                        help=f"questions .jsonl or .parquet (e.g. {DEFAULT_DATASET_PATH.relative_to(DEFAULT_DATASET_PATH.parents[1])}; "
+                             "default: built-in questions)")
+    parser.add_argument("--shard", default=None, metavar="I/N", help="evaluate shard I of N, e.g. 0/4")
+    parser.add_argument("--sample", type=float, default=1.0, help="deterministic fraction of questions to keep")
+    parser.add_argument("--seed", type=int, default=0, help="sampling seed")
+    parser.add_argument("--limit", type=int, default=None, help="at most N questions")
+
+
+def samples_from_args(args) -> Iterator[Dict[str, Any]]:
+    shard, num_shards = (int(x) for x in args.shard.split("/")) if args.shard else (0, 1)
+    return iter_samples(args.dataset, shard=shard, num_shards=num_shards, fraction=args.sample,
+                        seed=args.seed, limit=args.limit)
@@ -0,0 +1,188 @@
+"""
+FitScience Coach - Retrieval Evaluation
+LLM-free recall@k, MRR and nDCG of what FitScienceRAG actually retrieves, against labeled relevant sources
+
+Questions are encoded in batches (one batch for small datasets), searched with one FAISS call per
+batch and scored with NumPy, so a run takes seconds on CPU and can gate every change to k, the index
+type or chunking. Datasets are streamed (see eval_dataset.py), so memory stays flat on large files.
+
+    python src/eval_retrieval.py                                   # k = 1,3,5,8 on the built index
+    python src/eval_retrieval.py --index faiss_hnsw --k 1,5,10
+    python src/eval_retrieval.py --chunk-size 300 --chunk-overlap 50
+    python src/eval_retrieval.py --dataset data/eval_questions.jsonl --shard 0/4 --sample 0.25
+
+A retrieved chunk counts as relevant when its source title is in the question's
+`relevant_sources`; several chunks of one source count once (recall is over distinct sources).
+Results go to ragas_results/retrieval_evaluation_results.json.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from bench_retrieval import BACKENDS
+from embedding_utils import embed_matrix
+from bench_utils import PROJECT_ROOT
+from eval_dataset import add_dataset_arguments, iter_batches, samples_from_args
+from perf_history import pipeline_metrics, record_run
+from pipeline_logging import configure_logging
+
+DEFAULT_KS = [1, 3, 5, 8]
+INDEX_TYPES = [name for name in BACKENDS if name.startswith("faiss")]
+RESULTS_PATH = PROJECT_ROOT / "ragas_results" / "retrieval_evaluation_results.json"
+MAX_REPORTED_MISSES = 200
+
+
+def retrieve_sources(store, embedder, questions: List[str], k: int):
+    """Top-k chunk sources for every question (one encode batch + one index search)"""
+    started = time.perf_counter()
+    vectors = np.ascontiguousarray(embed_matrix(embedder, questions), dtype=np.float32)
+    encode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    _, rows = store.index.search(vectors, k)
+    search_s = time.perf_counter() - started
+    sources = []
+    for row in rows:
+        # FAISS pads with -1 when the index holds fewer than k vectors
+        sources.append([store.docstore.search(store.index_to_docstore_id[i]).metadata.get("source")
+                        if i >= 0 else None for i in row])
+    return sources, {"encode_s": encode_s, "search_s": search_s}
+
+
+def score_retrieval(retrieved: List[List[str]], relevant: List[List[str]], ks: List[int]) -> Dict[str, Any]:
+    """recall@k, MRR@k, nDCG@k and hit rate@k, computed for all questions at once"""
+    titles = sorted({t for row in retrieved for t in row if t} | {t for rel in relevant for t in rel})
+    column = {t: i for i, t in enumerate(titles)}
+    n, k_max = len(retrieved), max(ks)
+    # Source id per retrieved chunk; -1 (missing) indexes the extra always-irrelevant column
+    ids = np.array([[column[t] if t else -1 for t in row] + [-1] * (k_max - len(row)) for row in retrieved])
+    is_relevant = np.zeros((n, len(titles) + 1), dtype=bool)
+    for q, rel in enumerate(relevant):
+        is_relevant[q, [column[t] for t in rel]] = True
+    hits = is_relevant[np.arange(n)[:, None], ids]
+    first = np.ones_like(hits)
+    for j in range(1, k_max):
+        first[:, j] = (ids[:, :j] != ids[:, j:j + 1]).all(axis=1)
+    gains = hits & first  # each relevant source counts once, at its best rank
+
+    n_relevant = is_relevant[:, :-1].sum(axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, k_max + 2))
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])
+    results = {}
+    for k in ks:
+        g, h = gains[:, :k], hits[:, :k]
+        any_hit = h.any(axis=1)
+        reciprocal_rank = np.where(any_hit, 1.0 / (h.argmax(axis=1) + 1), 0.0)
+        ndcg = (g * discounts[:k]).sum(axis=1) / ideal[np.minimum(n_relevant, k)]
+        results[f"@{k}"] = {
+            "recall": float((g.sum(axis=1) / n_relevant).mean()),
+            "mrr": float(reciprocal_rank.mean()),
+            "ndcg": float(ndcg.mean()),
+            "hit_rate": float(any_hit.mean()),
+        }
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, 0)
+    return {"metrics": results, "first_relevant_rank": first_hit.tolist()}
+
+
+def build_store(rag, index_type: str, chunk_size: int = None, chunk_overlap: int = 0):
+    """The pipeline's own index, or a rebuilt one with another index type / chunking"""
+    if index_type == "faiss_flat" and not chunk_size:
+        return rag.vectorstore
+    documents = rag.create_synthetic_content()
+    if chunk_size:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        documents = splitter.split_documents(documents)
+    backend = BACKENDS[index_type]()
+    backend.build(embed_matrix(rag.embeddings, [d.page_content for d in documents]), documents, rag.embeddings)
+    return backend.store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM-free retrieval evaluation (recall@k, MRR, nDCG)")
+    parser.add_argument("--k", default=",".join(map(str, DEFAULT_KS)), help="comma-separated cutoffs")
+    parser.add_argument("--index", choices=INDEX_TYPES, default="faiss_flat")
+    parser.add_argument("--chunk-size", type=int, default=None, help="re-split source documents before indexing")
+    parser.add_argument("--chunk-overlap", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=1024, help="questions encoded and searched per batch")
+    parser.add_argument("--output", default=str(RESULTS_PATH))
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    ks = sorted({int(k) for k in args.k.split(",") if k})
+
+    configure_logging()
+    os.chdir(PROJECT_ROOT)  # initialize_system() loads data/ relative to the project root
+    from rag_pipeline import FitScienceRAG
+    rag = FitScienceRAG(use_groq=False)
+    if not rag.initialize_system():
+        print("❌ RAG system failed to initialize")
+        return 1
+
+    store = build_store(rag, args.index, args.chunk_size, args.chunk_overlap)
+    print(f"🔍 Evaluating retrieval on {store.index.ntotal} chunks ({args.index})")
+    # Stream the dataset in batches: one encode + one search + one scoring pass per batch
+    totals = {f"@{k}": {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0, "hit_rate": 0.0} for k in ks}
+    timings = {"encode_s": 0.0, "search_s": 0.0, "score_s": 0.0}
+    questions, unlabeled, misses = 0, 0, []
+    for batch in iter_batches(samples_from_args(args), args.batch_size):
+        labeled = [s for s in batch if s["relevant_sources"]]
+        unlabeled += len(batch) - len(labeled)
+        if not labeled:
+            continue
+        retrieved, batch_timings = retrieve_sources(store, rag.embeddings, [s["question"] for s in labeled], max(ks))
+        started = time.perf_counter()
+        scores = score_retrieval(retrieved, [s["relevant_sources"] for s in labeled], ks)
+        batch_timings["score_s"] = time.perf_counter() - started
+        for name, seconds in batch_timings.items():
+            timings[name] += seconds
+        for cutoff, metrics in scores["metrics"].items():
+            for name, value in metrics.items():
+                totals[cutoff][name] += value * len(labeled)  # per-question means → weighted sums
+        for sample, rank, row in zip(labeled, scores["first_relevant_rank"], retrieved):
+            if rank == 0 and len(misses) < MAX_REPORTED_MISSES:
+                misses.append({"id": sample["id"], "question": sample["question"], "retrieved_sources": row})
+        questions += len(labeled)
+    if not questions:
+        print("❌ No questions with relevant_sources labels")
+        return 1
+    metrics = {cutoff: {name: round(value / questions, 4) for name, value in sums.items()}
+               for cutoff, sums in totals.items()}
+    timings = {name: round(seconds, 4) for name, seconds in timings.items()}
+
+    print(f"📊 {questions} labeled questions" + (f" ({unlabeled} without labels skipped)" if unlabeled else ""))
+    print(f"{'k':>4} {'recall':>8} {'MRR':>8} {'nDCG':>8} {'hit rate':>9}")
+    for cutoff, m in metrics.items():
+        print(f"{cutoff[1:]:>4} {m['recall']:>8.3f} {m['mrr']:>8.3f} {m['ndcg']:>8.3f} {m['hit_rate']:>9.3f}")
+    print(f"⏱️ encode {timings['encode_s'] * 1000:.1f} ms  search {timings['search_s'] * 1000:.1f} ms  "
+          f"score {timings['score_s'] * 1000:.1f} ms")
+
+    out = {
+        "config": {"index": args.index, "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap,
+                   "k": ks, "chunks": int(store.index.ntotal), "questions": questions,
+                   "dataset": args.dataset, "shard": args.shard, "sample": args.sample, "seed": args.seed,
+                   "pipeline_fingerprint": rag.pipeline_fingerprint()},
+        "metrics": metrics,
+        "timings": timings,
+        "misses": misses,  # questions with no relevant source in the top max(k), first MAX_REPORTED_MISSES
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(out, f, indent=2)
+    print(f"💾 Saved → {output}")
+    perf = {name: value for name, value in pipeline_metrics().items() if not name.startswith("query_")}
+    perf.update({f"{name[:-1]}ms": seconds * 1000.0 for name, seconds in timings.items()})
+    perf.update({f"{name}{cutoff}": value for cutoff, m in metrics.items() for name, value in m.items()})
+    record_run("retrieval_eval", perf, config={k: out["config"][k] for k in ("index", "chunk_size", "chunk_overlap",
+                                                                              "questions", "dataset")})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+FitScience Coach - Learning Paths
+Learning paths, their modules and a precomputed path → module → lesson → source-row index
+
+The Courses tab, the sidebar module counts and the overall progress metric all read one
+LearningPathIndex, built once per corpus version instead of re-filtering the corpus with
+str.contains on every Streamlit rerun:
+
+    index = LearningPathIndex(corpus_df)
+    index.module_count(path)                       # non-empty modules of a path
+    index.modules(path)[module_id]["lesson_ids"]   # "<module id>_lesson_<n>", 1-based, in corpus order
+    index.sources(path, module_id)                 # the module's corpus rows (DataFrame)
+    index.overall_progress(completed)              # % of all lessons across every path
+
+A source belongs to a path when a path topic matches its Title or Notes (case-insensitive regex,
+like str.contains), and to a module of that path when the module's rule matches too. Topic matches
+come from a TopicMatrix (sources × topics booleans), so membership is NumPy mask arithmetic.
+"""
+
+import re
+import hashlib
+from typing import Any, Dict, FrozenSet, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+GOVERNMENT = "Government Resource"
+PODCAST = "Podcast"
+
+# Path definitions in sidebar order. A module rule is topics over Title and Notes, topics over
+# Title of one source type, or only a source type; empty modules are hidden.
+LEARNING_PATHS: Dict[str, Dict[str, Any]] = {
+    "🏋️‍♂️ Strength Training Fundamentals": {
+        "description": "Master the science of resistance training",
+        "topics": ["progressive overload", "resistance training", "workout split", "training", "periodization"],
+        "estimated_time": "2-3 hours",
+        "difficulty": "Beginner to Intermediate",
+        "modules": {
+            "💪 Module 1: Training Principles & Progression": {
+                "description": "Master fundamental training concepts and progressive overload",
+                "topics": ["progressive overload", "resistance training", "periodization", "training volume"],
+                "learning_objectives": ["Understand progressive overload principles", "Design training progression", "Apply periodization concepts"]
+            },
+            "🏋️‍♂️ Module 2: Expert Training Insights": {
+                "description": "Learn from strength training experts and practitioners",
+                "topics": ["Jeff Cavaliere", "training", "exercise", "workout"], "title_only": True, "type": PODCAST,
+                "learning_objectives": ["Gain expert training insights", "Learn practical programming", "Understand exercise selection"]
+            },
+            "📚 Module 3: Beginner Program Design": {
+                "description": "Apply structured training programs for beginners",
+                "type": GOVERNMENT,
+                "learning_objectives": ["Design beginner programs", "Implement safe progression", "Apply structured training"]
+            }
+        }
+    },
+    "🥗 Sports Nutrition Mastery": {
+        "description": "Evidence-based nutrition for athletes",
+        "topics": ["protein", "nutrition", "dietary", "micronutrient", "supplement"],
+        "estimated_time": "2-3 hours",
+        "difficulty": "Intermediate",
+        "modules": {
+            "🥩 Module 1: Protein Science & Requirements": {
+                "description": "Master protein needs for athletic performance",
+                "topics": ["protein", "nutrition"],
+                "learning_objectives": ["Calculate protein requirements", "Understand protein timing", "Apply protein strategies"]
+            },
+            "💊 Module 2: Supplement Evidence & Micronutrients": {
+                "description": "Navigate supplements and micronutrient needs",
+                "topics": ["supplement", "micronutrient", "vitamin"],
+                "learning_objectives": ["Evaluate supplement evidence", "Understand micronutrient needs", "Apply supplementation strategies"]
+            },
+            "🍽️ Module 3: Practical Nutrition Tools": {
+                "description": "Use official tools for meal planning and calorie targets",
+                "type": GOVERNMENT,
+                "learning_objectives": ["Plan balanced meals", "Calculate calorie needs", "Apply dietary guidelines"]
+            }
+        }
+    },
+    "🔥 Metabolic Science": {
+        "description": "Understand energy systems and metabolism",
+        "topics": ["BMR", "metabolic", "energy", "calorie", "NEAT"],
+        "estimated_time": "2-3 hours",
+        "difficulty": "Intermediate to Advanced",
+        "modules": {
+            "⚡ Module 1: Energy Systems & BMR": {
+                "description": "Understand metabolic rate and energy expenditure",
+                "topics": ["BMR", "metabolic", "energy", "calorie"],
+                "learning_objectives": ["Calculate BMR accurately", "Understand energy systems", "Apply metabolic principles"]
+            },
+            "🏃‍♂️ Module 2: NEAT & Activity Optimization": {
+                "description": "Optimize daily activity and energy expenditure",
+                "topics": ["NEAT", "activity"],
+                "learning_objectives": ["Understand NEAT principles", "Optimize daily activity", "Track energy expenditure"]
+            },
+            "📊 Module 3: Metabolic Calculations & Tools": {
+                "description": "Apply practical metabolic calculations and tools",
+                "type": GOVERNMENT,
+                "learning_objectives": ["Use metabolic calculators", "Apply energy balance", "Implement tracking methods"]
+            }
+        }
+    },
+    "💤 Recovery & Performance": {
+        "description": "Optimize sleep and athletic recovery",
+        "topics": ["sleep", "recovery", "athletic performance"],
+        "estimated_time": "1-2 hours",
+        "difficulty": "Beginner",
+        "modules": {
+            "😴 Module 1: Sleep Science & Recovery": {
+                "description": "Understand sleep's role in athletic performance",
+                "topics": ["sleep", "recovery", "athletic performance"],
+                "learning_objectives": ["Understand sleep physiology", "Optimize recovery protocols", "Apply sleep strategies"]
+            },
+            "🧠 Module 2: Performance Optimization Insights": {
+                "description": "Learn from performance and longevity experts",
+                "topics": ["Dr. Peter Attia", "performance", "longevity"], "title_only": True, "type": PODCAST,
+                "learning_objectives": ["Understand performance optimization", "Learn longevity protocols", "Apply recovery strategies"]
+            },
+            "🏥 Module 3: Health & Recovery Guidelines": {
+                "description": "Apply evidence-based health and recovery guidelines",
+                "type": GOVERNMENT,
+                "learning_objectives": ["Follow health guidelines", "Implement recovery protocols", "Apply wellness practices"]
+            }
+        }
+    }
+}
+
+
+def corpus_version(corpus: pd.DataFrame) -> str:
+    """Content hash of the corpus columns the index depends on"""
+    columns = [c for c in ("Title", "Notes", "Type") if c in corpus.columns]
+    row_hashes = pd.util.hash_pandas_object(corpus[columns], index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+
+
+def lesson_id(module_id: str, number: int) -> str:
+    return f"{module_id}_lesson_{number}"
+
+
+class TopicMatrix:
+    """Boolean sources × topics matrices for Title and Notes, built in one pass over the corpus
+
+    Each topic is a case-insensitive regex (str.contains semantics) compiled once; membership of
+    a path or module is then a column selection and an any() over NumPy arrays.
+    """
+
+    def __init__(self, corpus: pd.DataFrame, topics: Iterable[str]):
+        self.topics = list(dict.fromkeys(t.lower() for t in topics))
+        self.column = {topic: i for i, topic in enumerate(self.topics)}
+        matchers = [re.compile(topic, re.IGNORECASE).search for topic in self.topics]
+        self.title = np.zeros((len(corpus), len(self.topics)), dtype=bool)
+        self.notes = np.zeros_like(self.title)
+        for row, (title, notes) in enumerate(zip(corpus["Title"], corpus["Notes"])):
+            if isinstance(title, str):
+                self.title[row] = [match(title) is not None for match in matchers]
+            if isinstance(notes, str):
+                self.notes[row] = [match(notes) is not None for match in matchers]
+        self.matrix = self.title | self.notes
+
+    def any_of(self, topics: Iterable[str], title_only: bool = False) -> np.ndarray:
+        """Rows where any of the topics matches (in Title only, or in Title or Notes)"""
+        columns = [self.column[t.lower()] for t in topics]
+        return (self.title if title_only else self.matrix)[:, columns].any(axis=1)
+
+
+def _all_topics(paths: Dict[str, Dict[str, Any]]) -> List[str]:
+    return [t for path in paths.values()
+            for t in path["topics"] + [t for rule in path["modules"].values() for t in rule.get("topics", [])]]
+
+
+class LearningPathIndex:
+    """Paths → modules → lesson ids → corpus rows, computed once for one corpus version"""
+
+    def __init__(self, corpus: pd.DataFrame, paths: Dict[str, Dict[str, Any]] = None, version: str = None):
+        self.corpus = corpus
+        self.paths = paths or LEARNING_PATHS
+        self.version = version or corpus_version(corpus)
+        self.topics = TopicMatrix(corpus, _all_topics(self.paths))
+        types = corpus["Type"].to_numpy()
+        self._modules: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for name, path in self.paths.items():
+            in_path = self.topics.any_of(path["topics"])
+            modules = {}
+            for module_id, rule in path["modules"].items():
+                mask = in_path.copy()
+                if rule.get("type"):
+                    mask &= types == rule["type"]
+                if rule.get("topics"):
+                    mask &= self.topics.any_of(rule["topics"], title_only=rule.get("title_only", False))
+                rows = mask.nonzero()[0]
+                if not len(rows):
+                    continue
+                modules[module_id] = {
+                    "description": rule["description"],
+                    "learning_objectives": rule["learning_objectives"],
+                    "rows": rows,
+                    "lesson_ids": [lesson_id(module_id, i) for i in range(1, len(rows) + 1)],
+                }
+            self._modules[name] = modules
+        self._path_lessons = {name: frozenset(l for m in modules.values() for l in m["lesson_ids"])
+                              for name, modules in self._modules.items()}
+        self.all_lesson_ids: FrozenSet[str] = frozenset().union(*self._path_lessons.values())
+
+    def modules(self, path: str) -> Dict[str, Dict[str, Any]]:
+        return self._modules.get(path, {})
+
+    def module_count(self, path: str) -> int:
+        return len(self.modules(path))
+
+    def lesson_ids(self, path: str) -> FrozenSet[str]:
+        return self._path_lessons.get(path, frozenset())
+
+    def sources(self, path: str, module_id: str) -> pd.DataFrame:
+        return self.corpus.iloc[self.modules(path)[module_id]["rows"]]
+
+    def completed_modules(self, path: str, completed: Iterable[str]) -> List[str]:
+        """Modules of a path whose lessons are all completed"""
+        completed = set(completed)
+        return [module_id for module_id, module in self.modules(path).items()
+                if completed.issuperset(module["lesson_ids"])]
+
+    def overall_progress(self, completed: Iterable[str]) -> float:
+        """Completed lessons as a percentage of all lessons across every path"""
+        if not self.all_lesson_ids:
+            return 0.0
+        return len(self.all_lesson_ids.intersection(completed)) / len(self.all_lesson_ids) * 100
+
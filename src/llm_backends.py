@@ -0,0 +1,367 @@
+"""
+FitScience Coach - LLM Backends
+Pluggable answer generators behind one interface: OpenAI, Groq, a local GGUF model on CPU
+(llama.cpp) and any OpenAI-compatible local endpoint (llama.cpp server, Ollama, vLLM, ...)
+
+Select and order backends with FITSCIENCE_LLM_BACKENDS (e.g. "local,groq"); compare their latency with
+    python src/llm_backends.py --compare --backends groq,local
+
+The canned-answer "stub" backend is for load tests and benchmarks only and is not registered
+unless FITSCIENCE_STUB_LLM=1 is set or enable_stub_backend() is called.
+"""
+
+import os
+import time
+import random
+import threading
+from typing import Dict, List, Optional, Type
+
+from importlib.util import find_spec
+
+from rate_limiter import (
+    PRIORITY_BACKGROUND, RateLimitExceeded, estimate_tokens, get_groq_queue, retry_after_from_error
+)
+
+# Provider SDKs are optional and only imported when a backend first generates, so
+# importing the registry (and rag_pipeline) doesn't pay for packages a host never uses
+
+# OpenAI (optional - for improved faithfulness)
+OPENAI_AVAILABLE = find_spec("langchain_openai") is not None
+
+# Groq (free tier - no local install needed)
+GROQ_AVAILABLE = find_spec("langchain_groq") is not None
+
+# llama.cpp bindings (optional - local CPU inference for air-gapped deployments)
+LLAMA_CPP_AVAILABLE = find_spec("llama_cpp") is not None
+
+
+class LLMBackend:
+    """Base class for answer generators
+
+    Subclasses set the class attributes and implement generate(); they are registered by name
+    with @register_backend and created through get_backend(), which shares one instance (and
+    its HTTP client / loaded model) per configuration across the whole process.
+    """
+
+    name = ""              # registry key, also the cassette provider name
+    label = ""             # human-readable name for logs and the UI
+    icon = "🤖"
+    prompt_style = "groq"  # grounding prompt to use: "openai" (strict) or "groq" (conversational)
+    request_queue = None   # optional FairRequestQueue for rate-limited providers
+
+    def __init__(self, model: str = None):
+        self.model = model
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def is_available(self) -> bool:
+        return True
+
+    def unavailable_reason(self) -> str:
+        return f"{self.label} is not available"
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def observe(self, seconds: float, error: bool = False):
+        """Record one generation for per-backend latency comparison"""
+        with self._stats_lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            ok = self.calls - self.errors
+            return {
+                "model": self.model,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency_s": round(self.total_seconds / self.calls, 4) if self.calls else None,
+                "success_rate": round(ok / self.calls, 4) if self.calls else None,
+            }
+
+
+_BACKENDS: Dict[str, Type[LLMBackend]] = {}
+_instances: Dict[tuple, LLMBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(cls: Type[LLMBackend]) -> Type[LLMBackend]:
+    """Class decorator adding a backend to the registry under cls.name"""
+    _BACKENDS[cls.name] = cls
+    return cls
+
+
+def backend_classes() -> Dict[str, Type[LLMBackend]]:
+    return dict(_BACKENDS)
+
+
+def get_backend(name: str, **config) -> LLMBackend:
+    """Shared backend instance for this name + configuration (pooled clients / loaded models)"""
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose from: {sorted(_BACKENDS)}")
+    key = (name, tuple(sorted(config.items())))
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = _BACKENDS[name](**config)
+        return _instances[key]
+
+
+def backend_names_from_env() -> Optional[List[str]]:
+    """Backend order from FITSCIENCE_LLM_BACKENDS, or None to use the default OpenAI → Groq priority"""
+    value = os.getenv("FITSCIENCE_LLM_BACKENDS", "").strip()
+    return [n.strip() for n in value.split(",") if n.strip()] or None
+
+
+@register_backend
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+    label = "OpenAI GPT-4o-mini"
+    icon = "🤖"
+    prompt_style = "openai"
+
+    def __init__(self, api_key: str = None, model: str = "gpt-4o-mini"):
+        super().__init__(model)
+        self.api_key = api_key
+        self.client = None
+
+    def is_available(self) -> bool:
+        return OPENAI_AVAILABLE and bool(self.api_key)
+
+    def unavailable_reason(self) -> str:
+        if not OPENAI_AVAILABLE:
+            return "Install langchain-openai: pip install langchain-openai"
+        return "OPENAI_API_KEY not set"
+
+    def generate(self, prompt: str) -> str:
+        if self.client is None:
+            if not self.is_available():
+                raise Exception("OpenAI not available or API key not provided")
+            from langchain_openai import ChatOpenAI
+            self.client = ChatOpenAI(
+                model=self.model,
+                temperature=0.0,  # Zero temperature for maximum faithfulness
+                api_key=self.api_key
+            )
+        response = self.client.invoke(prompt)
+        return response.content.strip()
+
+
+@register_backend
+class GroqBackend(LLMBackend):
+    name = "groq"
+    label = "Groq Llama (free cloud API)"
+    icon = "🦙"
+    prompt_style = "groq"
+
+    def __init__(self, api_key: str = None, model: str = "llama-3.1-8b-instant"):
+        super().__init__(model)
+        self.api_key = api_key
+        self.client = None
+        self.request_queue = get_groq_queue()
+
+    def is_available(self) -> bool:
+        return GROQ_AVAILABLE and bool(self.api_key)
+
+    def unavailable_reason(self) -> str:
+        if not GROQ_AVAILABLE:
+            return "Install langchain-groq: pip install langchain-groq"
+        return "GROQ_API_KEY not set - add to .env and restart app"
+
+    def generate(self, prompt: str) -> str:
+        if self.client is None:
+            if not self.is_available():
+                raise Exception("Groq not available or API key not provided")
+            from langchain_groq import ChatGroq
+            self.client = ChatGroq(
+                model=self.model,
+                temperature=0.0,
+                api_key=self.api_key
+            )
+        response = self.client.invoke(prompt)
+        return response.content.strip() if hasattr(response, 'content') else str(response)
+
+
+@register_backend
+class LlamaCppBackend(LLMBackend):
+    """Small quantized GGUF model (e.g. Llama-3.2-1B-Instruct Q4_K_M) run in-process on CPU"""
+
+    name = "local"
+    label = "Local GGUF model (llama.cpp, CPU)"
+    icon = "💻"
+    prompt_style = "groq"
+
+    def __init__(self, model_path: str = None, n_ctx: int = 4096, n_threads: int = None,
+                 max_tokens: int = 512):
+        model_path = model_path or os.getenv("FITSCIENCE_GGUF_MODEL", "")
+        super().__init__(os.path.basename(model_path) or None)
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads or int(os.getenv("FITSCIENCE_GGUF_THREADS", os.cpu_count() or 4))
+        self.max_tokens = max_tokens
+        self.client = None
+        self._lock = threading.Lock()  # a llama.cpp context serves one generation at a time
+
+    def is_available(self) -> bool:
+        return LLAMA_CPP_AVAILABLE and bool(self.model_path) and os.path.exists(self.model_path)
+
+    def unavailable_reason(self) -> str:
+        if not LLAMA_CPP_AVAILABLE:
+            return "Install llama-cpp-python: pip install llama-cpp-python"
+        return "FITSCIENCE_GGUF_MODEL must point to a .gguf model file"
+
+    def generate(self, prompt: str) -> str:
+        with self._lock:
+            if self.client is None:
+                if not self.is_available():
+                    raise Exception(self.unavailable_reason())
+                from llama_cpp import Llama
+                self.client = Llama(model_path=self.model_path, n_ctx=self.n_ctx,
+                                    n_threads=self.n_threads, verbose=False)
+            out = self.client.create_chat_completion(
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                max_tokens=self.max_tokens,
+            )
+        return out["choices"][0]["message"]["content"].strip()
+
+
+@register_backend
+class OpenAICompatibleBackend(LLMBackend):
+    """Any local server speaking the OpenAI chat completions API (llama.cpp server, Ollama, vLLM)"""
+
+    name = "openai_compatible"
+    label = "Local OpenAI-compatible endpoint"
+    icon = "🖧"
+    prompt_style = "groq"
+
+    def __init__(self, base_url: str = None, model: str = None, api_key: str = None,
+                 timeout: float = 120.0, max_tokens: int = 512):
+        super().__init__(model or os.getenv("FITSCIENCE_LOCAL_LLM_MODEL", "local-model"))
+        self.base_url = (base_url or os.getenv("FITSCIENCE_LOCAL_LLM_URL", "")).rstrip("/")
+        self.api_key = api_key or os.getenv("FITSCIENCE_LOCAL_LLM_KEY", "")
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        import requests
+        self.session = requests.Session()  # keep-alive connection pool shared by all sessions
+
+    def is_available(self) -> bool:
+        return bool(self.base_url)
+
+    def unavailable_reason(self) -> str:
+        return "FITSCIENCE_LOCAL_LLM_URL not set (e.g. http://localhost:8080/v1)"
+
+    def generate(self, prompt: str) -> str:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.0,
+                "max_tokens": self.max_tokens,
+            },
+            headers=headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+
+class StubBackend(LLMBackend):
+    """Canned answer after a simulated delay - for load tests and benchmarks with no LLM at all
+
+    Deliberately left out of the registry so a misconfigured FITSCIENCE_LLM_BACKENDS can't serve
+    canned answers to users; see enable_stub_backend().
+    """
+
+    name = "stub"
+    label = "Stub LLM (benchmarking only)"
+    icon = "🧪"
+    prompt_style = "groq"
+
+    def __init__(self, latency: float = None, jitter: float = 0.2):
+        super().__init__("stub")
+        self.latency = float(os.getenv("FITSCIENCE_STUB_LATENCY", "0.5")) if latency is None else latency
+        self.jitter = jitter
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(max(0.0, random.gauss(self.latency, self.latency * self.jitter)))
+        return ("Based on the available sources, here is a summary of the research relevant to your "
+                f"question. (stub answer, prompt of {len(prompt)} characters)")
+
+
+def enable_stub_backend() -> Type[LLMBackend]:
+    """Register the stub backend (opt-in for load tests and benchmarks)"""
+    return register_backend(StubBackend)
+
+
+if os.getenv("FITSCIENCE_STUB_LLM") == "1":
+    enable_stub_backend()
+
+
+def compare_backends(names: List[str], prompt: str, repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """Time the same prompt on each available backend (API keys read from the environment)"""
+    config = {
+        "openai": {"api_key": os.getenv("OPENAI_API_KEY", "")},
+        "groq": {"api_key": os.getenv("GROQ_API_KEY", "")},
+    }
+    results = {}
+    for name in names:
+        backend = get_backend(name, **config.get(name, {}))
+        if not backend.is_available():
+            print(f"⚠️ Skipping {backend.label}: {backend.unavailable_reason()}")
+            continue
+        latencies = []
+        for _ in range(repeats):
+            queue = backend.request_queue
+            try:
+                # Rate-limited providers are admitted through their shared queue like any app request
+                if queue is not None:
+                    queue.acquire(estimate_tokens(prompt), session_id="compare_backends", priority=PRIORITY_BACKGROUND)
+            except RateLimitExceeded as e:
+                print(f"⏳ {backend.label} rate budget exhausted, retry in ~{e.retry_after:.0f}s")
+                break
+            started = time.perf_counter()
+            try:
+                backend.generate(prompt)
+                backend.observe(time.perf_counter() - started)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                backend.observe(time.perf_counter() - started, error=True)
+                retry_after = retry_after_from_error(e) if queue is not None else None
+                if retry_after is not None:
+                    queue.limiter.penalize(retry_after)
+                print(f"⚠️ {backend.label} failed: {e}")
+        latencies.sort()
+        results[name] = {
+            "model": backend.model,
+            "runs": len(latencies),
+            "min_s": round(latencies[0], 3) if latencies else None,
+            "median_s": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        }
+        print(f"{backend.icon} {backend.label}: {results[name]}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from pathlib import Path
+
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+    parser = argparse.ArgumentParser(description="Compare answer latency across LLM backends")
+    parser.add_argument("--compare", action="store_true", help="run the latency comparison")
+    parser.add_argument("--backends", default=",".join(_BACKENDS), help="comma-separated backend names")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--prompt", default="In two sentences: how much protein per kg of bodyweight "
+                                            "supports muscle growth with resistance training?")
+    args = parser.parse_args()
+    if args.compare:
+        compare_backends([n.strip() for n in args.backends.split(",") if n.strip()], args.prompt, args.repeats)
+    else:
+        for name, cls in _BACKENDS.items():
+            print(f"{cls.icon} {name:18} {cls.label}")
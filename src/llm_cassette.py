@@ -0,0 +1,136 @@
+"""
+FitScience Coach - LLM Cassettes
+Record prompt→response pairs from the live LLMs and replay them offline, deterministically
+
+Record on a machine with API keys:
+    FITSCIENCE_CASSETTE=cassettes/demo.jsonl FITSCIENCE_CASSETTE_MODE=record python src/rag_pipeline.py
+Replay anywhere (no keys, no network), optionally simulating the recorded LLM latency:
+    FITSCIENCE_CASSETTE=cassettes/demo.jsonl FITSCIENCE_CASSETTE_LATENCY=recorded python src/rag_pipeline.py
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(Exception):
+    """Raised in strict replay mode when a prompt was never recorded"""
+
+
+def prompt_key(provider: str, prompt: str) -> str:
+    """Stable cassette key for a provider + exact prompt text"""
+    return hashlib.sha256(f"{provider}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCassette:
+    """JSONL file of recorded LLM interactions
+
+    Each line is one interaction: {"key", "provider", "model", "prompt", "response", "latency_s", "recorded_at"}.
+    In replay mode a later line for the same key wins, so re-recording into the same file is safe.
+
+    Args:
+        path: Cassette file (created on first record)
+        mode: "record" (call the live LLM and append) or "replay" (serve from file)
+        latency: Simulated LLM latency on replay - None for instant, "recorded" to sleep for the
+            latency captured at record time, or a number of seconds
+        strict: In replay mode, raise CassetteMiss for unknown prompts instead of calling the live LLM
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str = REPLAY,
+                 latency: Optional[Union[str, float]] = None, strict: bool = True):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be '{RECORD}' or '{REPLAY}', got {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.strict = strict
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if self.path.exists():
+            self._load()
+        elif mode == REPLAY:
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCassette"]:
+        """Build a cassette from FITSCIENCE_CASSETTE* environment variables (None if unset)"""
+        path = os.getenv("FITSCIENCE_CASSETTE")
+        if not path:
+            return None
+        latency = os.getenv("FITSCIENCE_CASSETTE_LATENCY") or None
+        if latency not in (None, "recorded"):
+            latency = float(latency)
+        return cls(
+            path,
+            mode=os.getenv("FITSCIENCE_CASSETTE_MODE", REPLAY),
+            latency=latency,
+            strict=os.getenv("FITSCIENCE_CASSETTE_STRICT", "1") != "0",
+        )
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, provider: str, model: str, prompt: str, response: str, latency_s: float):
+        """Append one live interaction to the cassette"""
+        entry = {
+            "key": prompt_key(provider, prompt),
+            "provider": provider,
+            "model": model,
+            "prompt": prompt,
+            "response": response,
+            "latency_s": round(latency_s, 4),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[entry["key"]] = entry
+
+    def replay(self, candidates: Iterable[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+        """First recorded (provider, response) among candidate (provider, prompt) pairs, or None
+
+        Sleeps for the configured simulated latency before returning a hit.
+        """
+        entry = None
+        for provider, prompt in candidates:
+            entry = self._entries.get(prompt_key(provider, prompt))
+            if entry is not None:
+                break
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        delay = entry.get("latency_s", 0.0) if self.latency == "recorded" else self.latency
+        if delay:
+            time.sleep(delay)
+        return entry["provider"], entry["response"]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,279 @@
+"""
+FitScience Coach - Load Test
+Simulates concurrent users on FitScienceRAG.query() and ramps concurrency to find the saturation point
+
+The traffic mix mirrors the Streamlit app: free-text Ask Coach questions, Quick Questions, and Study /
+Quiz generation prompts from the Courses tab. LLM answers come from a stub backend (fixed simulated
+latency) or from a recorded cassette (see llm_cassette.py), so runs need no API keys or network.
+
+    python src/load_test.py --llm stub --stub-latency 0.8 --concurrency 1,2,4,8,16,32 --duration 30
+    python src/load_test.py --llm replay --cassette cassettes/demo.jsonl --processes 2
+
+Reports throughput, latency percentiles (overall and per request kind), error and throttle rates and
+per-process RSS at every concurrency step, and writes bench_results/load_<git-revision>.json.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from bench_utils import BENCH_RESULTS_DIR, PROJECT_ROOT, latency_summary, current_rss_mb, run_metadata, write_results
+from perf_history import latency_metrics, record_run
+from pipeline_logging import configure_logging
+from coach_prompts import QUICK_QUESTIONS, study_prompt, quiz_prompts
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+# Free-text Ask Coach questions (demo + evaluation questions)
+ASK_QUESTIONS = [
+    "How much protein should I eat for muscle building?",
+    "How do I calculate my daily calorie needs?",
+    "What is progressive overload in training?",
+    "What micronutrients are important for athletes?",
+    "How much fish oil should I take per day?",
+    "What is the best workout split for beginners?",
+    "How much sleep do I need for optimal recovery?",
+    "Does protein timing matter after a workout?",
+    "How many sets per week should I do for hypertrophy?",
+    "What is NEAT and how can I increase it?",
+    "Is creatine safe and effective?",
+    "How big should my calorie deficit be for fat loss?",
+]
+
+DEFAULT_MIX = {"ask": 0.5, "quick": 0.2, "study": 0.15, "quiz": 0.15}
+PRIORITIES = {"ask": PRIORITY_INTERACTIVE, "quick": PRIORITY_INTERACTIVE,
+              "study": PRIORITY_BACKGROUND, "quiz": PRIORITY_BACKGROUND}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown request kind '{kind}'. Choose from: {list(DEFAULT_MIX)}")
+        mix[kind] = float(weight)
+    return mix
+
+
+class TrafficMix:
+    """Draws (kind, prompt) pairs with the configured weights"""
+
+    def __init__(self, mix: Dict[str, float], lesson_titles: List[str], seed: int):
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.titles = lesson_titles
+        self.rng = random.Random(seed)
+
+    def next(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "ask":
+            return kind, self.rng.choice(ASK_QUESTIONS)
+        if kind == "quick":
+            return kind, self.rng.choice(QUICK_QUESTIONS)
+        title = self.rng.choice(self.titles)
+        return kind, study_prompt(title) if kind == "study" else quiz_prompts(title)[0]
+
+
+def build_rag(args):
+    """FitScienceRAG wired to the stub backend or a replay cassette"""
+    from rag_pipeline import FitScienceRAG
+    from llm_cassette import LLMCassette
+    os.chdir(PROJECT_ROOT)  # initialize_system() loads data/ relative to the project root
+    if args.llm == "stub":
+        from llm_backends import enable_stub_backend
+        os.environ["FITSCIENCE_STUB_LATENCY"] = str(args.stub_latency)
+        enable_stub_backend()
+        rag = FitScienceRAG(llm_backends=["stub"])
+    else:
+        latency = args.replay_latency
+        if latency not in (None, "recorded"):
+            latency = float(latency)
+        rag = FitScienceRAG(use_groq=False,
+                            cassette=LLMCassette(args.cassette, mode="replay", latency=latency))
+    if not rag.initialize_system():
+        raise RuntimeError("RAG system failed to initialize")
+    return rag
+
+
+def run_step(rag, users: int, duration: float, think_time: float, mix: Dict[str, float],
+             titles: List[str], worker_id: int) -> Dict:
+    """Run `users` concurrent simulated users against rag for `duration` seconds"""
+    samples = []  # (kind, latency_s, outcome)
+    samples_lock = threading.Lock()
+    stop = threading.Event()
+    rss_peak = [current_rss_mb()]
+
+    def user_loop(user_id: int):
+        traffic = TrafficMix(mix, titles, seed=worker_id * 10_000 + user_id)
+        session_id = f"loadtest-{worker_id}-{user_id}"
+        while not stop.is_set():
+            kind, prompt = traffic.next()
+            started = time.perf_counter()
+            try:
+                result = rag.query(prompt, session_id=session_id, priority=PRIORITIES[kind])
+                outcome = "error" if "error" in result else ("throttled" if "retry_after" in result else "ok")
+            except Exception:
+                outcome = "error"
+            latency = time.perf_counter() - started
+            with samples_lock:
+                samples.append((kind, latency, outcome))
+            if think_time:
+                stop.wait(think_time)
+
+    def monitor_rss():
+        while not stop.wait(0.5):
+            rss_peak[0] = max(rss_peak[0], current_rss_mb())
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(users)]
+    monitor = threading.Thread(target=monitor_rss, daemon=True)
+    started = time.perf_counter()
+    monitor.start()
+    for t in threads:
+        t.start()
+    stop.wait(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {"worker": worker_id, "pid": os.getpid(), "elapsed_s": elapsed, "samples": samples,
+            "rss_peak_mb": max(rss_peak[0], current_rss_mb())}
+
+
+def _worker_main(conn, args, worker_id: int, titles: List[str]):
+    """Long-lived worker process: builds its own RAG once, then runs steps on request"""
+    os.environ.setdefault("FITSCIENCE_LOG_LEVEL", "WARNING")  # keep pipeline chatter out of the report
+    configure_logging()
+    rag = build_rag(args)
+    conn.send({"ready": True, "rss_mb": current_rss_mb()})
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        users, duration = msg
+        conn.send(run_step(rag, users, duration, args.think_time, args.mix, titles, worker_id))
+
+
+def summarize_step(users: int, worker_results: List[Dict]) -> Dict:
+    samples = [s for r in worker_results for s in r["samples"]]
+    elapsed = max(r["elapsed_s"] for r in worker_results)
+    ok = [lat for _, lat, outcome in samples if outcome == "ok"]
+    errors = sum(1 for _, _, outcome in samples if outcome == "error")
+    throttled = sum(1 for _, _, outcome in samples if outcome == "throttled")
+    by_kind = {}
+    for kind in DEFAULT_MIX:
+        lats = [lat for k, lat, outcome in samples if k == kind and outcome == "ok"]
+        if lats:
+            by_kind[kind] = latency_summary(lats)
+    return {
+        "concurrency": users,
+        "requests": len(samples),
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throttle_rate": round(throttled / len(samples), 4) if samples else 0.0,
+        "latency": latency_summary(ok),
+        "latency_by_kind": by_kind,
+        "process_rss_mb": {str(r["pid"]): r["rss_peak_mb"] for r in worker_results},
+    }
+
+
+def find_saturation(steps: List[Dict], min_gain: float = 0.1, max_error_rate: float = 0.01):
+    """First concurrency whose throughput gain over the previous step drops below min_gain (or errors appear)"""
+    for prev, step in zip(steps, steps[1:]):
+        if step["error_rate"] > max_error_rate:
+            return {"concurrency": step["concurrency"], "reason": f"error rate {step['error_rate']:.1%}"}
+        if prev["throughput_rps"] and step["throughput_rps"] < prev["throughput_rps"] * (1 + min_gain):
+            return {"concurrency": prev["concurrency"],
+                    "reason": f"throughput gain < {min_gain:.0%} beyond {prev['concurrency']} users"}
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for FitScienceRAG.query()")
+    parser.add_argument("--llm", choices=["stub", "replay"], default="stub")
+    parser.add_argument("--stub-latency", type=float, default=0.8, help="stub LLM latency in seconds")
+    parser.add_argument("--cassette", help="cassette file for --llm replay")
+    parser.add_argument("--replay-latency", default="recorded", help="'recorded', seconds, or 0 for none")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="ramp of concurrent users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per concurrency step")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between a user's requests")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes sharing the users")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="e.g. ask=5,quick=2,study=1.5,quiz=1.5")
+    parser.add_argument("--output", help="result file (default bench_results/load_<git-revision>.json)")
+    args = parser.parse_args()
+    if args.llm == "replay" and not args.cassette:
+        parser.error("--llm replay requires --cassette")
+
+    titles = pd.read_csv(PROJECT_ROOT / "data" / "learning_corpus.csv")["Title"].tolist()
+    ramp = [int(c) for c in args.concurrency.split(",") if c]
+
+    print(f"🚀 Starting {args.processes} worker process(es) ({args.llm} LLM)...")
+    ctx = mp.get_context("spawn")
+    workers = []
+    for worker_id in range(args.processes):
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_worker_main, args=(child_conn, args, worker_id, titles), daemon=True)
+        proc.start()
+        workers.append((proc, parent_conn))
+    idle_rss = {}
+    for proc, conn in workers:
+        idle_rss[str(proc.pid)] = conn.recv()["rss_mb"]
+    print(f"✅ Workers ready (idle RSS MB: {idle_rss})")
+
+    steps = []
+    print(f"\n{'users':>6} {'req':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>6} {'thr':>6}  RSS MB")
+    for users in ramp:
+        shares = [users // args.processes + (1 if i < users % args.processes else 0) for i in range(args.processes)]
+        active = [(w, n) for w, n in zip(workers, shares) if n]
+        for (proc, conn), n in active:
+            conn.send((n, args.duration))
+        step = summarize_step(users, [conn.recv() for (proc, conn), _ in active])
+        steps.append(step)
+        lat = step["latency"]
+        print(f"{users:>6} {step['requests']:>6} {step['throughput_rps']:>8.2f} {lat.get('p50_ms', float('nan')):>9.1f} "
+              f"{lat.get('p95_ms', float('nan')):>9.1f} {lat.get('p99_ms', float('nan')):>9.1f} "
+              f"{step['error_rate']:>6.1%} {step['throttle_rate']:>6.1%}  {list(step['process_rss_mb'].values())}")
+
+    for proc, conn in workers:
+        conn.send(None)
+        proc.join(timeout=10)
+
+    saturation = find_saturation(steps)
+    if saturation:
+        print(f"\n📉 Saturation at ~{saturation['concurrency']} concurrent users ({saturation['reason']})")
+    else:
+        print("\n📈 No saturation within the tested ramp")
+
+    payload = {
+        "benchmark": "load",
+        "run": run_metadata(),
+        "config": {"llm": args.llm, "stub_latency_s": args.stub_latency if args.llm == "stub" else None,
+                   "cassette": args.cassette, "duration_s": args.duration, "think_time_s": args.think_time,
+                   "processes": args.processes, "mix": args.mix},
+        "idle_rss_mb": idle_rss,
+        "steps": steps,
+        "saturation": saturation,
+    }
+    output = Path(args.output) if args.output else BENCH_RESULTS_DIR / f"load_{payload['run']['git_revision']}.json"
+    write_results(output, payload)
+    print(f"💾 Saved → {output}")
+    if steps:
+        top = steps[-1]
+        record_run("load", {"max_throughput_rps": max(s["throughput_rps"] for s in steps),
+                            "error_rate": top["error_rate"], "max_rss_mb": max(top["process_rss_mb"].values()),
+                            "saturation_users": saturation["concurrency"] if saturation else None,
+                            **latency_metrics(top["latency"], f"users{top['concurrency']}")},
+                   config=payload["config"], run=payload["run"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
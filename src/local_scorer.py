@@ -0,0 +1,149 @@
+"""
+FitScience Coach - Local Answer Scorer
+Judge-free, embedding-based proxies for RAGAs answer relevancy, faithfulness and context recall
+
+Uses the pipeline's own all-MiniLM-L6-v2 embeddings (create_embeddings, so FITSCIENCE_EMBEDDINGS
+applies), runs offline and costs nothing, so it works as a cheap pre-filter before the OpenAI judge
+or as its replacement in CI:
+
+    local_answer_relevancy   cosine(question, answer)
+    local_grounding          mean over answer sentences of the best cosine to any context
+    local_context_overlap    mean over ground-truth sentences of the best cosine to any context
+
+    python src/local_scorer.py answers.jsonl          # batch_answer.py output or {question, answer, contexts}
+    python src/ragas_evaluation_v3.py --scorer local  # evaluation without ChatOpenAI / OpenAIEmbeddings
+
+Scores are cosines in [-1, 1]; they rank and gate well but are not on the RAGAs scale.
+"""
+
+import re
+import sys
+import json
+import argparse
+from typing import Any, Dict, List
+
+import numpy as np
+
+from embedding_utils import embed_matrix
+
+LOCAL_METRICS = ["local_answer_relevancy", "local_grounding", "local_context_overlap"]
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str, max_sentences: int = 32) -> List[str]:
+    sentences = [s.strip() for s in _SENTENCE_END.split(text or "") if len(s.strip()) > 3]
+    return sentences[:max_sentences]
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def _best_match_means(pieces: List[List[str]], contexts: List[List[str]], vectors: Dict[str, np.ndarray]) -> np.ndarray:
+    """Per sample: mean over its pieces of the best cosine to one of its own contexts (NaN if either is empty)"""
+    n = len(pieces)
+    piece_owner = np.array([i for i, ps in enumerate(pieces) for _ in ps], dtype=np.int64)
+    context_owner = np.array([i for i, cs in enumerate(contexts) for _ in cs], dtype=np.int64)
+    if not len(piece_owner) or not len(context_owner):
+        return np.full(n, np.nan)
+    P = np.vstack([vectors[p] for ps in pieces for p in ps])
+    C = np.vstack([vectors[c] for cs in contexts for c in cs])
+    sims = P @ C.T
+    sims[piece_owner[:, None] != context_owner[None, :]] = -np.inf  # only compare within a sample
+    best = sims.max(axis=1)
+    valid = np.isfinite(best)
+    counts = np.bincount(piece_owner[valid], minlength=n).astype(np.float64)
+    totals = np.bincount(piece_owner[valid], weights=best[valid], minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+class LocalScorer:
+    """Cosine-based answer scoring on a LangChain-style embedder (default: the pipeline's MiniLM)"""
+
+    def __init__(self, embedder=None, batch_size: int = 256):
+        if embedder is None:
+            from rag_pipeline import create_embeddings
+            embedder = create_embeddings()
+        self.embedder = embedder
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return {}
+        return dict(zip(unique, _normalized(np.asarray(embed_matrix(self.embedder, unique), dtype=np.float32))))
+
+    def score(self, questions: List[str], answers: List[str], contexts: List[List[str]],
+              ground_truths: List[str] = None) -> Dict[str, List[float]]:
+        """{metric: [score per sample]} (same shape as a RAGAs result's _scores_dict); NaN = not scorable"""
+        ground_truths = ground_truths or [""] * len(questions)
+        scores = {name: [] for name in LOCAL_METRICS}
+        for start in range(0, len(questions), self.batch_size):
+            end = start + self.batch_size
+            q, a, ctx, gt = questions[start:end], answers[start:end], contexts[start:end], ground_truths[start:end]
+            answer_sentences = [split_sentences(text) for text in a]
+            truth_sentences = [split_sentences(text) for text in gt]
+            vectors = self._encode(q + a + [c for cs in ctx for c in cs]
+                                   + [s for ss in answer_sentences + truth_sentences for s in ss])
+            Q = np.vstack([vectors[text] for text in q])
+            A = np.vstack([vectors[text] for text in a])
+            scores["local_answer_relevancy"].extend((Q * A).sum(axis=1).tolist())
+            scores["local_grounding"].extend(_best_match_means(answer_sentences, ctx, vectors).tolist())
+            scores["local_context_overlap"].extend(_best_match_means(truth_sentences, ctx, vectors).tolist())
+        return scores
+
+
+def summarize(scores: Dict[str, List[float]]) -> Dict[str, Any]:
+    """Mean per metric over the samples that could be scored"""
+    summary = {}
+    for name, values in scores.items():
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        summary[name] = round(float(values.mean()), 4) if len(values) else None
+    return summary
+
+
+def _rounded(value: float):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def _contexts(row: Dict[str, Any]) -> List[str]:
+    if row.get("contexts"):
+        return list(row["contexts"])
+    return [s.get("content_preview", "") for s in row.get("sources", []) if s.get("content_preview")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Judge-free embedding scores for answers")
+    parser.add_argument("input", help="JSONL with question, answer and contexts (or batch_answer.py sources)")
+    parser.add_argument("--output", help="write per-sample scores as JSONL")
+    parser.add_argument("--min-score", type=float, default=None,
+                        help="exit 1 if any metric's mean falls below this (CI gate)")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        rows = [row for row in map(json.loads, filter(str.strip, f)) if row.get("answer")]
+    scorer = LocalScorer()
+    scores = scorer.score([r["question"] for r in rows], [r["answer"] for r in rows],
+                          [_contexts(r) for r in rows], [r.get("ground_truth", "") for r in rows])
+    summary = summarize(scores)
+    print(f"📏 Local scores for {len(rows)} answers")
+    for name, value in summary.items():
+        print(f"{name:24}: {value if value is not None else 'n/a'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for i, row in enumerate(rows):
+                f.write(json.dumps({"id": row.get("id"), "question": row["question"],
+                                    **{name: _rounded(scores[name][i]) for name in LOCAL_METRICS}}) + "\n")
+        print(f"💾 Saved → {args.output}")
+    if args.min_score is not None:
+        failing = [name for name, value in summary.items() if value is not None and value < args.min_score]
+        if failing:
+            print(f"❌ Below {args.min_score}: {', '.join(failing)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+FitScience Coach - Metrics
+In-process counters, gauges and histograms, exported in Prometheus text format
+
+Every FitScienceRAG in the process records into the shared REGISTRY, so per-stage timings from
+all Streamlit sessions (or load-test users) end up in one place. start_metrics_server() serves
+the registry at http://127.0.0.1:<FITSCIENCE_METRICS_PORT>/metrics for Prometheus to scrape.
+"""
+
+import os
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from pipeline_logging import get_logger
+
+log = get_logger("metrics")
+
+# Seconds - from a cached FAISS lookup (~1 ms) up to a slow free-tier LLM call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonically increasing count with optional labels"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Current value with optional labels; `fn` makes it read its value at scrape time instead"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float] = None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), float("nan"))
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        if self.fn is not None:
+            try:
+                return [(self.name, {}, float(self.fn()))]
+            except Exception:
+                return []
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def series(self) -> List[Tuple[Dict[str, str], List[Tuple[float, int]], float, int]]:
+        """(labels, cumulative [(upper_bound, count)...] ending with +Inf, sum, count) per label set"""
+        out = []
+        with self._lock:
+            for key, s in self._series.items():
+                cumulative, running = [], 0
+                for bound, n in zip(self.buckets + (float("inf"),), s["counts"]):
+                    running += n
+                    cumulative.append((bound, running))
+                out.append((dict(key), cumulative, s["sum"], s["count"]))
+        return out
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        out = []
+        for labels, cumulative, total, count in self.series():
+            for bound, running in cumulative:
+                out.append((f"{self.name}_bucket", dict(labels, le=_format_value(bound)), running))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, count))
+        return out
+
+    def quantile(self, q: float, **labels) -> float:
+        """Bucket-interpolated quantile estimate (like PromQL histogram_quantile)"""
+        for series_labels, cumulative, _, count in self.series():
+            if series_labels != {k: str(v) for k, v in labels.items()}:
+                continue
+            if not count:
+                break
+            rank, prev_bound, prev_count = q * count, 0.0, 0
+            for bound, running in cumulative:
+                if running >= rank:
+                    if bound == float("inf"):
+                        return prev_bound
+                    span = running - prev_count
+                    return prev_bound + (bound - prev_bound) * ((rank - prev_count) / span if span else 0.0)
+                prev_bound, prev_count = bound, running
+        return float("nan")
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use so callers never need to pre-declare them"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _get_or_create(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help))
+
+    def gauge(self, name: str, help: str = "", fn: Callable[[], float] = None) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help, fn))
+
+    def histogram(self, name: str, help: str = "", buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    def metrics(self) -> List[object]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+QUERY_SECONDS = REGISTRY.histogram(
+    "fitscience_query_seconds", "End-to-end FitScienceRAG.query() latency, including coalesced callers")
+STAGE_SECONDS = REGISTRY.histogram(
+    "fitscience_query_stage_seconds", "Latency of one query stage (embed, search, context, llm)")
+LLM_TOKENS = REGISTRY.histogram(
+    "fitscience_llm_tokens", "Estimated prompt / completion tokens per LLM answer", TOKEN_BUCKETS)
+QUERIES = REGISTRY.counter(
+    "fitscience_queries_total", "query() calls by outcome (ok, error, rate_limited) and whether they were coalesced")
+LLM_REQUESTS = REGISTRY.counter(
+    "fitscience_llm_requests_total", "LLM generation attempts per provider")
+LLM_ERRORS = REGISTRY.counter(
+    "fitscience_llm_errors_total", "Failed LLM generation attempts per provider (rate_limited or error)")
+LLM_FALLBACKS = REGISTRY.counter(
+    "fitscience_llm_fallbacks_total", "Answers not served by the primary LLM backend, by reason")
+CASSETTE_LOOKUPS = REGISTRY.counter(
+    "fitscience_cassette_lookups_total", "LLM cassette replay lookups by result (hit, miss)")
+INDEX_VECTORS = REGISTRY.gauge(
+    "fitscience_index_vectors", "Vectors in the most recently built FAISS index")
+CORPUS_SOURCES = REGISTRY.gauge(
+    "fitscience_corpus_sources", "Sources (rows) in the most recently loaded learning corpus")
+BUILD_SECONDS = REGISTRY.gauge(
+    "fitscience_build_seconds", "Duration of the last initialize_system() run, by step")
+
+
+class StageTimer:
+    """Monotonic per-stage timings for one request; repeated stages (e.g. a broader re-search) accumulate"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        """Stage timings plus total, in milliseconds, for the query result dict"""
+        timings = {name: round(seconds * 1000.0, 2) for name, seconds in self.stages.items()}
+        timings["total"] = round(self.total() * 1000.0, 2)
+        return timings
+
+    def observe(self, histogram: Histogram = STAGE_SECONDS):
+        for name, seconds in self.stages.items():
+            histogram.observe(seconds, stage=name)
+
+
+def _metrics_handler(registry: MetricsRegistry):
+    # http.server is imported here, not at module load, to keep `import rag_pipeline` fast
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the app's stdout
+
+    return MetricsHandler
+
+
+_server = None
+_server_attempted = False  # one bind attempt per process, successful or not
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = None, host: str = None):
+    """Serve REGISTRY on a daemon thread; idempotent, so Streamlit reruns can call it freely
+
+    The port comes from FITSCIENCE_METRICS_PORT (default 9108, 0 disables) and binds to
+    127.0.0.1 unless FITSCIENCE_METRICS_HOST says otherwise. Returns None when disabled or
+    when the port is taken (e.g. by a second app process on the same host); only the first
+    call per process tries to bind, so a taken port is warned about once, not on every rerun.
+    """
+    global _server, _server_attempted
+    with _server_lock:
+        if _server_attempted:
+            return _server
+        _server_attempted = True
+        port = int(os.getenv("FITSCIENCE_METRICS_PORT", "9108")) if port is None else port
+        host = host or os.getenv("FITSCIENCE_METRICS_HOST", "127.0.0.1")
+        if not port:
+            return None
+        try:
+            from http.server import ThreadingHTTPServer
+            _server = ThreadingHTTPServer((host, port), _metrics_handler(REGISTRY))
+        except OSError as e:
+            log.warning("⚠️ Metrics endpoint not started", host=host, port=port, error=str(e))
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="fitscience-metrics", daemon=True).start()
+        log.info("📈 Metrics endpoint started", url=f"http://{host}:{port}/metrics")
+        return _server
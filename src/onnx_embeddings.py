@@ -0,0 +1,231 @@
+"""
+FitScience Coach - ONNX Embeddings
+int8-quantized ONNX export of all-MiniLM-L6-v2 for fast CPU query encoding
+
+Same model, tokenizer, mean pooling and L2 normalization as the sentence-transformers pipeline,
+run through onnxruntime with dynamically quantized int8 weights. At query time only onnxruntime
+and tokenizers are needed (no PyTorch). Select it for FitScienceRAG with
+FITSCIENCE_EMBEDDINGS=onnx (model directory from FITSCIENCE_ONNX_MODEL_DIR).
+
+    pip install onnxruntime                             # plus torch/transformers for the export step
+    python src/onnx_embeddings.py export                # → models/all-MiniLM-L6-v2-onnx-int8/
+    python src/onnx_embeddings.py compare               # parity + latency vs the PyTorch model
+
+`compare` exits nonzero when cosine agreement or top-k retrieval overlap fall below thresholds,
+and writes bench_results/embeddings_<git-revision>.json.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from embedding_utils import embed_matrix
+
+# The parity/latency comparison below imports bench_utils and perf_history only when it runs, so the
+# runtime embedder (FITSCIENCE_EMBEDDINGS=onnx) doesn't load benchmark tooling
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_MODEL_DIR = PROJECT_ROOT / "models" / "all-MiniLM-L6-v2-onnx-int8"
+MAX_SEQ_LENGTH = 256  # sentence-transformers' max_seq_length for all-MiniLM-L6-v2
+INT8_MODEL_FILE = "model_int8.onnx"
+FP32_MODEL_FILE = "model_fp32.onnx"
+
+
+def default_model_dir() -> Path:
+    return Path(os.getenv("FITSCIENCE_ONNX_MODEL_DIR", DEFAULT_MODEL_DIR))
+
+
+def export_int8(model_dir: Path = None, model_name: str = MODEL_NAME, opset: int = 14) -> Path:
+    """Export the transformer to ONNX, quantize weights to int8 and save the tokenizer next to it"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_dir = Path(model_dir or default_model_dir())
+    model_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    inputs = ["input_ids", "attention_mask", "token_type_ids"]
+    sample = tokenizer(["How much protein should I eat?"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in inputs), str(model_dir / FP32_MODEL_FILE),
+                          input_names=inputs, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    quantize_dynamic(str(model_dir / FP32_MODEL_FILE), str(model_dir / INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(str(model_dir))  # writes tokenizer.json for the runtime
+    return model_dir / INT8_MODEL_FILE
+
+
+class OnnxMiniLMEmbeddings:
+    """all-MiniLM-L6-v2 on onnxruntime (int8 by default); implements the LangChain Embeddings methods"""
+
+    def __init__(self, model_dir: str = None, model_file: str = INT8_MODEL_FILE, batch_size: int = 32,
+                 threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir or default_model_dir())
+        model_path = model_dir / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(f"{model_path} not found - run: python src/onnx_embeddings.py export")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or int(os.getenv("FITSCIENCE_ONNX_THREADS", "0"))  # 0 = all cores
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+        self.batch_size = batch_size
+        self.model_path = model_path
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        # Mean pooling over real tokens, then L2 normalize (sentence-transformers' Pooling + Normalize)
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 384), dtype=np.float32)
+        return np.vstack([self._encode_batch(texts[i:i + self.batch_size])
+                          for i in range(0, len(texts), self.batch_size)]).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+# ---------------------------------------------------------------------
+# Parity and performance comparison against the PyTorch model
+# ---------------------------------------------------------------------
+def parity(reference, candidate, documents: List[str], queries: List[str], k: int = 8) -> Dict:
+    """Cosine agreement per text and top-k retrieval overlap per query between two embedders"""
+    ref_docs, cand_docs = embed_matrix(reference, documents), embed_matrix(candidate, documents)
+    ref_q, cand_q = embed_matrix(reference, queries), embed_matrix(candidate, queries)
+    normalize = lambda m: m / np.clip(np.linalg.norm(m, axis=1, keepdims=True), 1e-12, None)
+    cosine = np.concatenate([(normalize(ref_docs) * normalize(cand_docs)).sum(axis=1),
+                             (normalize(ref_q) * normalize(cand_q)).sum(axis=1)])
+    ref_top = np.argsort(-(ref_q @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_q @ cand_docs.T), axis=1)[:, :k]
+    overlap = np.array([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)])
+    return {
+        "texts": int(len(cosine)),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        "cosine_p5": round(float(np.percentile(cosine, 5)), 5),
+        "k": k,
+        "topk_overlap_mean": round(float(overlap.mean()), 4),
+        "topk_overlap_min": round(float(overlap.min()), 4),
+        "top1_agreement": round(float((ref_top[:, 0] == cand_top[:, 0]).mean()), 4),
+    }
+
+
+def performance(embedder, queries: List[str], documents: List[str], batch_size: int = 32) -> Dict:
+    """Single-query encode latency (the per-question cost) and batch throughput (index builds)"""
+    from bench_utils import latency_summary
+    embedder.embed_query("warm-up")
+    latencies = []
+    for q in queries:
+        started = time.perf_counter()
+        embedder.embed_query(q)
+        latencies.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    for i in range(0, len(documents), batch_size):
+        embedder.embed_documents(documents[i:i + batch_size])
+    elapsed = time.perf_counter() - started
+    return {"query_latency": latency_summary(latencies),
+            "batch_throughput_texts_per_s": round(len(documents) / elapsed, 1) if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 ONNX all-MiniLM-L6-v2 for CPU query encoding")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export + quantize the model")
+    export.add_argument("--model-dir", default=None)
+    compare = sub.add_parser("compare", help="parity and latency vs the PyTorch model")
+    compare.add_argument("--model-dir", default=None)
+    compare.add_argument("--docs", type=int, default=2000, help="synthetic corpus chunks")
+    compare.add_argument("--queries", type=int, default=200)
+    compare.add_argument("--k", type=int, default=8)
+    compare.add_argument("--min-cosine", type=float, default=0.99, help="mean cosine agreement required")
+    compare.add_argument("--min-overlap", type=float, default=0.9, help="mean top-k overlap required")
+    compare.add_argument("--output", help="result file (default bench_results/embeddings_<git-revision>.json)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_int8(args.model_dir)
+        print(f"✅ Exported int8 model → {path} ({path.stat().st_size / 1e6:.1f} MB)")
+        return 0
+
+    from bench_retrieval import synthetic_corpus, corpus_documents, synthetic_queries
+    from bench_utils import BENCH_RESULTS_DIR, run_metadata, write_results
+    from perf_history import latency_metrics, record_run
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    documents = [d.page_content for d in corpus_documents(synthetic_corpus(args.docs))]
+    queries = synthetic_queries(args.queries)
+
+    embedders = {}
+    load_s = {}
+    for name, factory in [
+        ("pytorch", lambda: HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2", model_kwargs={"device": "cpu"})),
+        ("onnx_int8", lambda: OnnxMiniLMEmbeddings(args.model_dir)),
+    ]:
+        started = time.perf_counter()
+        embedders[name] = factory()
+        load_s[name] = round(time.perf_counter() - started, 3)
+
+    print(f"🔍 Parity on {len(documents)} chunks / {len(queries)} queries...")
+    agreement = parity(embedders["pytorch"], embedders["onnx_int8"], documents, queries, k=args.k)
+    print(f"   cosine mean {agreement['cosine_mean']:.4f} (min {agreement['cosine_min']:.4f}), "
+          f"top-{args.k} overlap {agreement['topk_overlap_mean']:.3f}, top-1 agreement {agreement['top1_agreement']:.3f}")
+
+    perf = {}
+    for name, embedder in embedders.items():
+        perf[name] = dict(performance(embedder, queries, documents), load_s=load_s[name])
+        lat = perf[name]["query_latency"]
+        print(f"⏱️ {name:10s} query p50 {lat['p50_ms']:.2f} ms  p95 {lat['p95_ms']:.2f} ms  "
+              f"batch {perf[name]['batch_throughput_texts_per_s']} texts/s  load {load_s[name]} s")
+
+    passed = agreement["cosine_mean"] >= args.min_cosine and agreement["topk_overlap_mean"] >= args.min_overlap
+    payload = {
+        "benchmark": "embeddings",
+        "run": run_metadata(),
+        "model": str(embedders["onnx_int8"].model_path),
+        "parity": agreement,
+        "thresholds": {"min_cosine": args.min_cosine, "min_overlap": args.min_overlap},
+        "passed": passed,
+        "performance": perf,
+    }
+    output = Path(args.output) if args.output else BENCH_RESULTS_DIR / f"embeddings_{payload['run']['git_revision']}.json"
+    write_results(output, payload)
+    print(f"💾 Saved → {output}")
+    history = {"cosine_mean": agreement["cosine_mean"], "topk_overlap_mean": agreement["topk_overlap_mean"]}
+    for name, p in perf.items():
+        history.update(latency_metrics(p["query_latency"], name))
+        history.update({f"{name}_batch_texts_per_s": p["batch_throughput_texts_per_s"], f"{name}_load_s": p["load_s"]})
+    record_run("embeddings", history, config={"docs": args.docs, "queries": args.queries, "k": args.k},
+               run=payload["run"])
+    print("✅ Parity within thresholds" if passed else "❌ Parity below thresholds")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
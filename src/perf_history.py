@@ -0,0 +1,190 @@
+"""
+FitScience Coach - Performance History
+Latency, tokens, memory and build time of every evaluation and benchmark run, with regression checks
+
+Evaluation and benchmark scripts append one JSON line per run to ragas_results/perf_history.jsonl
+(next to the RAGAs aggregates; override with FITSCIENCE_PERF_HISTORY):
+
+    {"run": {timestamp, git_revision, ...}, "kind": "ragas", "metrics": {"query_p95_ms": ..., ...},
+     "config": {...}}
+
+    python src/perf_history.py list --kind ragas
+    python src/perf_history.py compare --kind ragas                       # latest vs the run before it
+    python src/perf_history.py compare --kind load --baseline 3f2c1ab --threshold 0.05
+
+A metric regresses when it moves in its bad direction by more than --threshold (relative to the
+baseline): latencies, tokens, memory and build times should go down, throughput and retrieval
+quality up. `compare` exits 1 on any regression, so it can gate CI after a benchmark run.
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bench_utils import PROJECT_ROOT, peak_rss_mb, run_metadata
+
+HISTORY_PATH = PROJECT_ROOT / "ragas_results" / "perf_history.jsonl"
+DEFAULT_THRESHOLD = 0.10
+# Metric names containing one of these improve when they go up; everything else should go down
+HIGHER_IS_BETTER = ("rps", "per_s", "throughput", "recall", "mrr", "ndcg", "hit_rate", "overall_score",
+                    "saturation", "cosine", "overlap", "agreement")
+
+
+def history_path() -> Path:
+    return Path(os.getenv("FITSCIENCE_PERF_HISTORY", str(HISTORY_PATH)))
+
+
+def _clean(metrics: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric, finite metrics only, rounded (None / NaN entries are dropped)"""
+    clean = {}
+    for name, value in metrics.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+            continue
+        clean[name] = round(float(value), 4)
+    return clean
+
+
+def record_run(kind: str, metrics: Dict[str, Any], config: Dict[str, Any] = None,
+               run: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Append one run to the history; never fails the run that is being recorded"""
+    record = {"run": run or run_metadata(), "kind": kind, "metrics": _clean(metrics), "config": config or {}}
+    path = history_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"📈 Performance history → {path}")
+    except OSError as e:
+        print(f"⚠️ Could not append to performance history {path}: {e}")
+    return record
+
+
+def latency_metrics(summary: Dict[str, Any], prefix: str) -> Dict[str, float]:
+    """bench_utils.latency_summary() output as flat {prefix_p50_ms, prefix_p95_ms, prefix_p99_ms}"""
+    return {f"{prefix}_{p}_ms": summary[f"{p}_ms"] for p in ("p50", "p95", "p99") if f"{p}_ms" in summary}
+
+
+def pipeline_metrics() -> Dict[str, float]:
+    """This process's query latency, tokens per answer, index build time and peak RSS (metrics.REGISTRY)"""
+    from metrics import QUERY_SECONDS, LLM_TOKENS, BUILD_SECONDS
+    out = {f"query_{name}_ms": QUERY_SECONDS.quantile(q) * 1000.0
+           for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+    totals = {"prompt": [0.0, 0], "completion": [0.0, 0]}
+    for labels, _, total, count in LLM_TOKENS.series():
+        if labels.get("kind") in totals:
+            totals[labels["kind"]][0] += total
+            totals[labels["kind"]][1] += count
+    for kind, (total, count) in totals.items():
+        if count:
+            out[f"{kind}_tokens_per_answer"] = total / count
+    out["index_build_s"] = BUILD_SECONDS.value(step="total")
+    out["peak_rss_mb"] = peak_rss_mb()
+    return out
+
+
+def load_history(path: Path = None, kind: str = None) -> List[Dict[str, Any]]:
+    path = Path(path) if path else history_path()
+    if not path.exists():
+        return []
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if kind is None or record.get("kind") == kind:
+                runs.append(record)
+    return runs
+
+
+def select_run(runs: List[Dict[str, Any]], spec: str, before: int = None) -> Optional[Dict[str, Any]]:
+    """A run by position ("-1" = latest, "0" = oldest), "previous" (the one before `before`) or git revision"""
+    if not runs:
+        return None
+    if spec == "latest":
+        return runs[-1]
+    if spec == "previous":
+        end = len(runs) - 1 if before is None else before
+        return runs[end - 1] if end >= 1 else None
+    if spec.lstrip("-").isdigit() and -len(runs) <= int(spec) < len(runs):
+        return runs[int(spec)]
+    matches = [r for r in runs if r["run"].get("git_revision", "").startswith(spec)]
+    return matches[-1] if matches else None
+
+
+def higher_is_better(metric: str) -> bool:
+    return any(token in metric for token in HIGHER_IS_BETTER)
+
+
+def compare_runs(baseline: Dict[str, Any], candidate: Dict[str, Any],
+                 threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Per shared metric: relative change and whether it is a regression beyond the threshold"""
+    rows = []
+    for name in sorted(set(baseline["metrics"]) & set(candidate["metrics"])):
+        before, after = baseline["metrics"][name], candidate["metrics"][name]
+        change = (after - before) / abs(before) if before else (0.0 if after == before else float("inf"))
+        worse = -change if higher_is_better(name) else change
+        rows.append({"metric": name, "baseline": before, "candidate": after,
+                     "change": change, "regression": worse > threshold})
+    return rows
+
+
+def _describe(record: Dict[str, Any]) -> str:
+    return f"{record['run'].get('git_revision', '?')} @ {record['run'].get('timestamp', '?')}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance history of evaluation and benchmark runs")
+    parser.add_argument("--history", default=None, help=f"history file (default {HISTORY_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="show recorded runs")
+    listing.add_argument("--kind", default=None, help="ragas, retrieval_eval, batch, load, api, retrieval, ...")
+    compare = sub.add_parser("compare", help="flag regressions of a run against a baseline run")
+    compare.add_argument("--kind", required=True)
+    compare.add_argument("--baseline", default="previous",
+                         help="'previous', a position (0 = oldest, -2 = second latest) or a git revision")
+    compare.add_argument("--candidate", default="latest", help="same forms as --baseline")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="allowed relative change in the bad direction (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        runs = load_history(args.history, args.kind)
+        if not runs:
+            print("📭 No runs recorded")
+            return 0
+        for i, record in enumerate(runs):
+            highlights = ", ".join(f"{k}={v:g}" for k, v in list(record["metrics"].items())[:4])
+            print(f"{i:>4}  {record['kind']:15} {_describe(record):32} {highlights}")
+        return 0
+
+    runs = load_history(args.history, args.kind)
+    candidate = select_run(runs, args.candidate)
+    position = next((i for i, r in enumerate(runs) if r is candidate), None)
+    baseline = select_run(runs, args.baseline, before=position)
+    if candidate is None or baseline is None:
+        print(f"❌ Need a baseline and a candidate run of kind '{args.kind}' ({len(runs)} recorded)")
+        return 2
+    print(f"🔎 {args.kind}: baseline {_describe(baseline)} → candidate {_describe(candidate)} "
+          f"(threshold {args.threshold:.0%})")
+    if baseline.get("config") != candidate.get("config"):
+        print("⚠️ Runs used different configs; differences may not be regressions")
+    rows = compare_runs(baseline, candidate, args.threshold)
+    print(f"{'metric':32} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for row in rows:
+        flag = "  ❌" if row["regression"] else ""
+        print(f"{row['metric']:32} {row['baseline']:>12g} {row['candidate']:>12g} {row['change']:>+9.1%}{flag}")
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("✅ No regressions beyond the threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+FitScience Coach - Pipeline Logging
+Leveled, structured logging with a request id on every record, written off the request path
+
+Records are handed to a queue by the calling thread and formatted/written by a single
+background listener, so concurrent sessions never contend on (or interleave) stdout writes.
+Per-request chatter is logged at DEBUG and hidden at the default INFO level.
+
+    FITSCIENCE_LOG_LEVEL=DEBUG      # show per-request retrieval / LLM steps
+    FITSCIENCE_LOG_FORMAT=json      # one JSON object per line for log shippers
+
+Entry points (the Streamlit app, API server, CLIs and benchmark workers) call configure_logging()
+once at startup; library code only calls get_logger().
+"""
+
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+ROOT_LOGGER = "fitscience"
+
+_request_id: ContextVar[str] = ContextVar("fitscience_request_id", default="-")
+
+_LOG_RECORD_KWARGS = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: str = None):
+    """Tag every record logged inside the block (on this thread / task) with a request id"""
+    token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps the caller's request id before the record crosses to the listener thread"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(message)s", "%H:%M:%S")
+
+    def formatMessage(self, record):  # fields go on the message line, before any traceback
+        line = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) else f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:  # formatted by _QueueHandler on the logging thread
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Keeps the message and traceback apart when a record crosses to the listener thread
+
+    QueueHandler.prepare() folds the formatted traceback into msg and drops exc_info (tracebacks
+    can't be pickled or outlive their frames); here the traceback is formatted into exc_text on
+    the producer side instead, so JsonFormatter can emit it as its own "exc" field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+        record.msg, record.args, record.message = message, None, message
+        record.exc_info = None
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """logger.info("message", key=value, ...) - keyword arguments become structured fields
+
+    The level check happens before any field is formatted, so disabled DEBUG calls cost one
+    comparison on the request path.
+    """
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in _LOG_RECORD_KWARGS}
+        extra = dict(kwargs.get("extra") or {})
+        extra["fields"] = fields
+        kwargs["extra"] = extra
+        return msg, kwargs
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(level: str = None, fmt: str = None) -> None:
+    """Install the queue handler + background listener once per process (later calls only adjust the level)"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel((level or os.getenv("FITSCIENCE_LOG_LEVEL", "INFO")).upper())
+    with _configure_lock:
+        if _listener is not None:
+            return
+        fmt = (fmt or os.getenv("FITSCIENCE_LOG_FORMAT", "text")).lower()
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        handler.addFilter(_RequestIdFilter())
+        root.addHandler(handler)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush queued records on interpreter exit
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
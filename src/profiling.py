@@ -0,0 +1,189 @@
+"""
+FitScience Coach - Request Profiler
+Opt-in sampling profiler that captures a flamegraph for a fraction of query() calls
+
+A daemon thread walks the profiled thread's stack via sys._current_frames() every few
+milliseconds, so LangChain, sentence-transformers and FAISS frames show up without
+instrumenting them and unsampled requests pay nothing. Each capture is written as a
+collapsed-stack file (flamegraph.pl / inferno / speedscope import) and/or a speedscope JSON
+file, named after the question hash, and indexed with its stage timings in profiles/index.jsonl.
+
+    FITSCIENCE_PROFILE_RATE=0.05 streamlit run src/streamlit_app.py   # profile 5% of queries
+    python src/rag_pipeline.py --profile 1                            # profile every demo query
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def profile_rate_from_env() -> float:
+    """Fraction of queries to profile, from FITSCIENCE_PROFILE_RATE (default 0 = off)"""
+    try:
+        return min(1.0, max(0.0, float(os.getenv("FITSCIENCE_PROFILE_RATE", "0"))))
+    except ValueError:
+        return 0.0
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:12]
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to site-packages or the project, so stacks read 'langchain/...' not '/usr/lib/...'"""
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    try:
+        return str(Path(filename).resolve().relative_to(PROJECT_ROOT))
+    except ValueError:
+        return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval on a background thread"""
+
+    def __init__(self, interval: float = None, thread_id: int = None):
+        self.interval = interval or float(os.getenv("FITSCIENCE_PROFILE_INTERVAL_MS", "5")) / 1000.0
+        self.thread_id = thread_id
+        self.samples: List[Tuple[Tuple[Frame, ...], float]] = []  # (root→leaf stack, weight seconds)
+        self.started = self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._code_cache: Dict[Any, Frame] = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="fitscience-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _frame(self, code) -> Frame:
+        frame = self._code_cache.get(code)
+        if frame is None:
+            frame = self._code_cache[code] = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+        return frame
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            self.samples.append((tuple(reversed(stack)), now - last))
+            last = now
+
+    @property
+    def duration(self) -> float:
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed stacks: 'root;child;leaf <count>' per line"""
+        counts = Counter(";".join(f"{name} ({path}:{line})" for name, path, line in stack)
+                         for stack, _ in self.samples)
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """Sampled profile in speedscope's file format, weighted by real time between samples"""
+        frames, index = [], {}
+        samples = []
+        for stack, _ in self.samples:
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "seconds",
+                "startValue": 0, "endValue": self.duration,
+                "samples": samples, "weights": [weight for _, weight in self.samples],
+            }],
+            "name": name,
+            "exporter": "fitscience-profiler",
+        }
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their captures under FITSCIENCE_PROFILE_DIR"""
+
+    def __init__(self, rate: float = None, output_dir: str = None, formats: str = None):
+        self.rate = profile_rate_from_env() if rate is None else rate
+        self.output_dir = Path(output_dir or os.getenv("FITSCIENCE_PROFILE_DIR", PROJECT_ROOT / "profiles"))
+        self.formats = (formats or os.getenv("FITSCIENCE_PROFILE_FORMAT", "collapsed,speedscope")).split(",")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def sample(self) -> Optional[SamplingProfiler]:
+        """A profiler for this request if it falls in the sampled fraction, else None"""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        return SamplingProfiler()
+
+    def save(self, profiler: SamplingProfiler, question: str, tags: Dict[str, Any] = None) -> List[Path]:
+        """Write the capture files and append an index entry tagged with the question hash and timings"""
+        qhash = question_hash(question)
+        stem = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{qhash}"
+        tags = tags or {}
+        timings = tags.get("timings") or {}
+        name = f"query {qhash} " + " ".join(f"{k}={v:.0f}ms" for k, v in timings.items())
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        if "collapsed" in self.formats:
+            path = self.output_dir / f"{stem}.collapsed"
+            path.write_text(profiler.collapsed(), encoding="utf-8")
+            paths.append(path)
+        if "speedscope" in self.formats:
+            path = self.output_dir / f"{stem}.speedscope.json"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(profiler.speedscope(name.strip()), f)
+            paths.append(path)
+        entry = {
+            "question_hash": qhash,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(profiler.duration * 1000.0, 2),
+            "samples": len(profiler.samples),
+            "interval_ms": profiler.interval * 1000.0,
+            "files": [p.name for p in paths],
+            **tags,
+        }
+        with self._lock, open(self.output_dir / "index.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return paths
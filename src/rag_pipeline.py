@@ -4,88 +4,142 @@ Personal Learning Portal for Evidence-Based Fitness & Nutrition
 """
 
 import os
+import json
+import hashlib
 from pathlib import Path
 from dotenv import load_dotenv
 # Load .env from project root
 load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
-import pandas as pd
-import numpy as np
-from typing import List, Dict, Any
-import json
-from datetime import datetime
-
-# LangChain imports
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain.schema import Document
-import requests
-
-# OpenAI imports (optional - for improved faithfulness)
-try:
-    from langchain_openai import ChatOpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-# Groq imports (free tier - no local install needed)
-try:
-    from langchain_groq import ChatGroq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-
-# Streamlit for demo
-import streamlit as st
+from typing import List, Dict, Any, TYPE_CHECKING
+import time
+
+# pandas, LangChain, sentence-transformers and FAISS are imported on first use (see
+# load_corpus_from_csv, embeddings, build_vectorstore) so `import rag_pipeline` stays cheap
+# for the CLI, evaluation scripts and worker processes; check with src/bench_startup.py
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+# LLM providers (OpenAI, Groq, local CPU models) live behind the backend registry
+from llm_backends import LLMBackend, get_backend, backend_classes, backend_names_from_env
+
+from rate_limiter import PRIORITY_INTERACTIVE, RateLimitExceeded, estimate_tokens, retry_after_from_error
+from single_flight import SingleFlight, normalize_question
+from profiling import RequestProfiler
+from pipeline_logging import configure_logging, get_logger, request_context
+from warmup import current_warmup
+from topic_mapper import TOPIC_MAPPER
+from llm_cassette import LLMCassette, CassetteMiss
+from metrics import (
+    REGISTRY, StageTimer, QUERY_SECONDS, LLM_TOKENS, QUERIES, LLM_REQUESTS, LLM_ERRORS, LLM_FALLBACKS,
+    CASSETTE_LOOKUPS, INDEX_VECTORS, CORPUS_SOURCES, BUILD_SECONDS
+)
+
+log = get_logger("pipeline")
+
+# Shared by every FitScienceRAG in the process so identical questions from different
+# sessions (a class clicking the same Quick Question) run retrieval + LLM only once
+_query_flight = SingleFlight()
+REGISTRY.gauge("fitscience_coalescing_ratio", "Share of query() calls served by another caller's in-flight run",
+               fn=lambda: _query_flight.stats()["coalescing_ratio"])
+REGISTRY.gauge("fitscience_queries_in_flight", "Distinct questions currently being answered",
+               fn=lambda: _query_flight.stats()["in_flight"])
+
+def create_embeddings(backend: str = None):
+    """all-MiniLM-L6-v2 embeddings from the backend named by FITSCIENCE_EMBEDDINGS
+
+    minilm   - sentence-transformers on PyTorch (default)
+    onnx     - int8 ONNX export of the same model, faster CPU query encoding (onnx_embeddings.py)
+    service  - client of a shared local embedding service process (embedding_service.py)
+    """
+    backend = (backend or os.getenv("FITSCIENCE_EMBEDDINGS", "minilm")).lower()
+    if backend == "onnx":
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        return OnnxMiniLMEmbeddings()
+    if backend == "service":
+        from embedding_service import EmbeddingServiceClient
+        return EmbeddingServiceClient()
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name="all-MiniLM-L6-v2",
+        model_kwargs={"device": "cpu"}
+    )
 
 class FitScienceRAG:
-    def __init__(self, use_groq: bool = True, openai_api_key: str = None, groq_api_key: str = None):
+    def __init__(self, use_groq: bool = True, openai_api_key: str = None, groq_api_key: str = None,
+                 cassette: LLMCassette = None, llm_backends: List[str] = None, profile_rate: float = None):
         """Initialize the RAG system for FitScience Coach
         
         Args:
             use_groq: If True, use Groq Llama (free cloud API - no local install)
             openai_api_key: Optional OpenAI API key for GPT-4o-mini (better faithfulness)
             groq_api_key: Groq API key for free Llama (get at console.groq.com)
+            cassette: Optional LLM cassette to record live answers or replay them offline
+                (defaults to the FITSCIENCE_CASSETTE environment variable, see llm_cassette.py)
+            llm_backends: Ordered backend names to try, e.g. ["local", "groq"] (defaults to
+                FITSCIENCE_LLM_BACKENDS, else OpenAI if a key is set, then Groq)
+            profile_rate: Fraction of queries to capture a sampling-profiler flamegraph for
+                (defaults to FITSCIENCE_PROFILE_RATE, i.e. off; see profiling.py)
         """
         self.use_groq = use_groq
         self.openai_api_key = openai_api_key
         self.groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY", "")
+        self.cassette = cassette if cassette is not None else LLMCassette.from_env()
         
-        # Initialize components
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-        )
-        
-        # Use sentence transformers for embeddings (free)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"}
-        )
+        # Text splitter and embedding model are created on first use
+        self._text_splitter = None
+        self._embeddings = None
         
         self.vectorstore = None
+        self._index_fingerprint = None  # (vectorstore, content hash), see pipeline_fingerprint()
         self.qa_chain = None
         self.corpus_metadata = []
-        self.llm = None  # "openai" | "groq" | None
-        self.openai_llm = None
-        self.groq_llm = None
+        self.retrieval_k = 8
+        self.llm = None  # name of the primary LLM backend ("openai" | "groq" | "local" | ...) or None
+        self.llm_backend_names = llm_backends or backend_names_from_env()
+        self.backends: List[LLMBackend] = []
+        self.profiler = RequestProfiler(rate=profile_rate)
         
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+            )
+        return self._text_splitter
+
+    @property
+    def embeddings(self):
+        """Sentence-transformers embeddings (free), loaded the first time they're needed
+
+        The implementation comes from FITSCIENCE_EMBEDDINGS, see create_embeddings().
+        """
+        if self._embeddings is None:
+            self._embeddings = create_embeddings()
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings):
+        self._embeddings = embeddings
+
     def load_corpus_from_csv(self, csv_path: str = "data/learning_corpus.csv"):
         """Load learning corpus from CSV file"""
+        import pandas as pd
         try:
             df = pd.read_csv(csv_path)
             self.corpus_metadata = df.to_dict('records')
-            print(f"✅ Loaded {len(self.corpus_metadata)} sources from corpus")
+            CORPUS_SOURCES.set(len(self.corpus_metadata))
+            log.info("✅ Loaded corpus", sources=len(self.corpus_metadata), path=csv_path)
             return df
         except Exception as e:
-            print(f"❌ Error loading corpus: {e}")
+            log.error("❌ Error loading corpus", path=csv_path, error=str(e))
             return None
     
     def create_synthetic_content(self):
         """Create synthetic content for demo purposes based on corpus metadata"""
+        from langchain.schema import Document
         documents = []
         
         # Sample content templates based on the corpus
@@ -231,45 +285,8 @@ class FitScienceRAG:
         
         # Create documents with metadata
         for i, source in enumerate(self.corpus_metadata):
-            # Map sources to content templates
-            content_key = None
-            title_lower = source['Title'].lower()
-            
-            if 'protein' in title_lower:
-                content_key = 'protein_requirements'
-            elif 'bmr' in title_lower or 'metabolic' in title_lower:
-                content_key = 'bmr_calculation'
-            elif 'training' in title_lower or 'workout' in title_lower or 'progressive' in title_lower or 'resistance' in title_lower:
-                content_key = 'training_progression'
-            elif 'split' in title_lower or 'best workout' in title_lower:
-                content_key = 'workout_splits'
-            elif 'micronutrient' in title_lower or 'vitamin' in title_lower or 'supplement' in title_lower:
-                content_key = 'micronutrients'
-            elif 'omega' in title_lower or 'fish oil' in title_lower:
-                content_key = 'omega3_supplements'
-            elif 'neat' in title_lower or 'activity' in title_lower:
-                content_key = 'neat_activity'
-            elif 'sleep' in title_lower:
-                content_key = 'sleep_recovery'
-            elif 'energy' in title_lower or 'calorie' in title_lower or 'balance' in title_lower:
-                content_key = 'bmr_calculation'
-            elif 'periodization' in title_lower:
-                content_key = 'training_progression'
-            elif 'nutrition' in title_lower or 'performance' in title_lower:
-                content_key = 'protein_requirements'
-            elif 'cavaliere' in title_lower or 'athlean' in title_lower:
-                content_key = 'workout_splits'
-            elif 'jamnadas' in title_lower or 'visceral' in title_lower or 'fat' in title_lower:
-                content_key = 'bmr_calculation'
-            elif 'attia' in title_lower or 'longevity' in title_lower:
-                content_key = 'training_progression'
-            elif 'probiotic' in title_lower or 'metabolic' in title_lower:
-                content_key = 'micronutrients'
-            elif 'myplate' in title_lower or 'nhs' in title_lower or 'nih' in title_lower:
-                content_key = 'micronutrients'
-            else:
-                # Generic content for other sources - use training progression as safer default
-                content_key = 'training_progression'
+            # Map sources to content templates (priority-ordered keyword rules, see topic_mapper.py)
+            content_key = TOPIC_MAPPER.template_for(source['Title'])
             
             if content_key in content_templates:
                 doc = Document(
@@ -286,46 +303,67 @@ class FitScienceRAG:
         
         return documents
     
-    def build_vectorstore(self, documents: List[Document]):
+    def build_vectorstore(self, documents: List["Document"]):
         """Build FAISS vector store from documents"""
+        from langchain_community.vectorstores import FAISS
         try:
-            print("🔄 Building vector store...")
+            log.info("🔄 Building vector store...", documents=len(documents))
             self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-            print(f"✅ Vector store built with {len(documents)} documents")
+            INDEX_VECTORS.set(self.vectorstore.index.ntotal)
+            log.info("✅ Vector store built", documents=len(documents), vectors=self.vectorstore.index.ntotal)
             return True
         except Exception as e:
-            print(f"❌ Error building vector store: {e}")
+            log.error("❌ Error building vector store", error=str(e))
             return False
     
     def setup_qa_chain(self):
         """Setup retriever and LLM for QA with citations"""
         if not self.vectorstore:
-            print("❌ Vector store not initialized")
+            log.error("❌ Vector store not initialized")
             return False
 
         try:
-            # Initialize Groq (free cloud API - no local install)
-            if self.use_groq and GROQ_AVAILABLE and self.groq_api_key:
-                self.llm = "groq"
-                print("✅ Groq Llama ready (free cloud API)")
-            elif self.use_groq and not GROQ_AVAILABLE:
-                print("⚠️ Install langchain-groq: pip install langchain-groq")
-                self.llm = None
-            elif self.use_groq and not self.groq_api_key:
-                print("⚠️ GROQ_API_KEY not set - add to .env and restart app. Using corpus-only mode.")
-                self.llm = None
+            self.backends = self._configure_backends()
+            if self.backends:
+                self.llm = self.backends[0].name
+                log.info("✅ LLM backend ready", backend=self.backends[0].name, label=self.backends[0].label)
             else:
-                print("⚠️ Groq disabled. Using corpus-only mode.")
+                log.warning("⚠️ No LLM backend available. Using corpus-only mode.")
                 self.llm = None
 
             # Keep retriever available with adaptive retrieval
-            self.qa_chain = self.vectorstore.as_retriever(search_kwargs={"k": 8})
-            print("✅ QA components ready")
+            self.qa_chain = self.vectorstore.as_retriever(search_kwargs={"k": self.retrieval_k})
+            log.info("✅ QA components ready", k=self.retrieval_k)
             return True
         except Exception as e:
-            print(f"❌ Error setting up QA components: {e}")
+            log.error("❌ Error setting up QA components", error=str(e))
             return False
     
+    def _configure_backends(self) -> List[LLMBackend]:
+        """Resolve the ordered list of usable LLM backends for this instance"""
+        names = self.llm_backend_names
+        if names is None:
+            # Default priority: OpenAI (best faithfulness) when a key is set, then Groq (free)
+            names = (["openai"] if self.openai_api_key else []) + (["groq"] if self.use_groq else [])
+            if not self.use_groq:
+                log.warning("⚠️ Groq disabled.")
+        credentials = {
+            "openai": {"api_key": self.openai_api_key},
+            "groq": {"api_key": self.groq_api_key},
+        }
+        backends = []
+        for name in names:
+            backend = get_backend(name, **credentials.get(name, {}))
+            if backend.is_available():
+                backends.append(backend)
+            else:
+                log.warning("⚠️ LLM backend unavailable", backend=name, reason=backend.unavailable_reason())
+        return backends
+
+    def backend_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-backend call counts, error rates and average latency (for comparing backends)"""
+        return {b.name: b.stats() for b in self.backends}
+
     def calculate_bmr(self, weight_kg: float, height_cm: float, age: int, gender: str) -> float:
         """Calculate BMR using Harris-Benedict equation"""
         if gender.lower() in ['male', 'm', 'man']:
@@ -353,22 +391,9 @@ class FitScienceRAG:
         else:
             raise ValueError(f"Invalid activity level. Choose from: {list(activity_multipliers.keys())}")
     
-    def generate_openai_response(self, context: str, question: str, docs=None) -> str:
-        """Generate response using OpenAI GPT-4o-mini with maximum faithfulness"""
-        try:
-            if not self.openai_llm:
-                # Initialize OpenAI LLM if not already done
-                if not OPENAI_AVAILABLE or not self.openai_api_key:
-                    raise Exception("OpenAI not available or API key not provided")
-                
-                self.openai_llm = ChatOpenAI(
-                    model="gpt-4o-mini",
-                    temperature=0.0,  # Zero temperature for maximum faithfulness
-                    api_key=self.openai_api_key
-                )
-            
-            # Strict prompt for faithfulness
-            prompt = f"""You are FitScience Coach, a fitness and nutrition expert. You MUST answer ONLY using the research sources provided below. Do NOT add any information from general knowledge.
+    def _openai_prompt(self, context: str, question: str) -> str:
+        """Strict grounding prompt used with OpenAI GPT-4o-mini"""
+        return f"""You are FitScience Coach, a fitness and nutrition expert. You MUST answer ONLY using the research sources provided below. Do NOT add any information from general knowledge.
 
 Research Sources from Knowledge Base:
 {context}
@@ -384,27 +409,10 @@ CRITICAL INSTRUCTIONS:
 6. Do NOT include sources or a references list in your answer—they are displayed separately.
 
 Answer (using ONLY the explicit information from the sources above):"""
-            
-            # Generate response
-            response = self.openai_llm.invoke(prompt)
-            return response.content.strip()
-            
-        except Exception as e:
-            return f"OpenAI generation error: {e}"
-    
-    def generate_groq_response(self, context: str, question: str, docs=None) -> str:
-        """Generate response using Groq Llama (free cloud API) with high faithfulness"""
-        try:
-            if not self.groq_llm:
-                if not GROQ_AVAILABLE or not self.groq_api_key:
-                    raise Exception("Groq not available or API key not provided")
-                self.groq_llm = ChatGroq(
-                    model="llama-3.1-8b-instant",
-                    temperature=0.0,
-                    api_key=self.groq_api_key
-                )
-            
-            prompt = f"""You are FitScience Coach, a fitness and nutrition expert. You MUST answer ONLY using the research sources provided below. Do NOT add information from general knowledge.
+
+    def _groq_prompt(self, context: str, question: str) -> str:
+        """Grounding prompt used with Groq Llama"""
+        return f"""You are FitScience Coach, a fitness and nutrition expert. You MUST answer ONLY using the research sources provided below. Do NOT add information from general knowledge.
 
 Research Sources from Knowledge Base:
 {context}
@@ -420,26 +428,199 @@ CRITICAL INSTRUCTIONS:
 6. Do NOT include sources or a references list in your answer—they are displayed separately.
 
 Answer (using ONLY the information from the sources above):"""
-            
-            response = self.groq_llm.invoke(prompt)
-            return response.content.strip() if hasattr(response, 'content') else str(response)
-            
+
+    def _prompt_for(self, style: str, context: str, question: str) -> str:
+        return self._openai_prompt(context, question) if style == "openai" else self._groq_prompt(context, question)
+
+    def _generate_with_backend(self, backend: LLMBackend, context: str, question: str,
+                               session_id: str = None, priority: int = PRIORITY_INTERACTIVE,
+                               trace: Dict[str, Any] = None) -> str:
+        """Build the backend's grounding prompt, respect its rate limits, generate and record
+
+        When a trace dict is given, the answering provider and estimated token usage are written to it.
+        """
+        prompt = self._prompt_for(backend.prompt_style, context, question)
+        queue = backend.request_queue
+        if queue is not None:
+            queue.acquire(estimate_tokens(prompt), session_id=session_id, priority=priority)
+        started = time.perf_counter()
+        LLM_REQUESTS.inc(provider=backend.name)
+        try:
+            answer = backend.generate(prompt)
+        except Exception as e:
+            backend.observe(time.perf_counter() - started, error=True)
+            retry_after = retry_after_from_error(e) if queue is not None else None
+            LLM_ERRORS.inc(provider=backend.name, kind="error" if retry_after is None else "rate_limited")
+            if retry_after is None:
+                raise
+            # The provider rejected us anyway (other processes share the key) - back off everyone
+            queue.limiter.penalize(retry_after)
+            raise RateLimitExceeded(retry_after) from e
+        latency = time.perf_counter() - started
+        backend.observe(latency)
+        if self.cassette is not None and self.cassette.recording:
+            self.cassette.record(backend.name, backend.model, prompt, answer, latency)
+        if trace is not None:
+            self._trace_llm(trace, backend.name, prompt, answer)
+        return answer
+
+    @staticmethod
+    def _trace_llm(trace: Dict[str, Any], provider: str, prompt: str, answer: str):
+        """Record which provider answered and ~4-chars-per-token usage (providers' own counts aren't surfaced)"""
+        usage = {"prompt_tokens": estimate_tokens(prompt, completion_reserve=0),
+                 "completion_tokens": estimate_tokens(answer, completion_reserve=0)}
+        trace["provider"] = provider
+        trace["usage"] = usage
+        LLM_TOKENS.observe(usage["prompt_tokens"], kind="prompt", provider=provider)
+        LLM_TOKENS.observe(usage["completion_tokens"], kind="completion", provider=provider)
+
+    def _backend(self, name: str) -> LLMBackend:
+        for backend in self.backends:
+            if backend.name == name:
+                return backend
+        credentials = {"openai": self.openai_api_key, "groq": self.groq_api_key}
+        return get_backend(name, api_key=credentials.get(name))
+
+    def generate_openai_response(self, context: str, question: str, docs=None) -> str:
+        """Generate response using OpenAI GPT-4o-mini with maximum faithfulness"""
+        try:
+            return self._generate_with_backend(self._backend("openai"), context, question)
+        except Exception as e:
+            return f"OpenAI generation error: {e}"
+    
+    def generate_groq_response(self, context: str, question: str, docs=None,
+                               session_id: str = None, priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Generate response using Groq Llama (free cloud API) with high faithfulness
+
+        Requests go through the process-wide Groq queue so the free-tier RPM/TPM budgets are
+        shared fairly across sessions; raises RateLimitExceeded with an estimated wait when the
+        request cannot be admitted in time.
+        """
+        try:
+            return self._generate_with_backend(self._backend("groq"), context, question,
+                                               session_id=session_id, priority=priority)
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             return f"Groq API error: {e}"
     
-    def query(self, question: str) -> Dict[str, Any]:
-        """Query the RAG system with LLM answer and explicit source links"""
+    def query(self, question: str, session_id: str = None, priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """Query the RAG system with LLM answer and explicit source links
+
+        Args:
+            question: User question or generation prompt
+            session_id: Caller's session, used for fair Groq scheduling across users
+            priority: PRIORITY_INTERACTIVE (Ask Coach) or PRIORITY_BACKGROUND (Study/Quiz)
+        """
         if not self.qa_chain:
             return {"error": "QA chain not initialized"}
         
+        with request_context():
+            started = time.perf_counter()
+            # Coalesced callers share the leader's LLM request, charged to the leader's session; the
+            # priority is part of the key so an interactive caller never waits on a background run
+            key = (normalize_question(question), self._model_signature(), priority)
+            result, shared = _query_flight.do(
+                key, lambda: self._run_query_profiled(question, session_id=session_id, priority=priority)
+            )
+            if shared:
+                log.debug("🔗 Joined in-flight computation", question=question[:50])
+                result["coalesced"] = True
+            elapsed = time.perf_counter() - started
+            QUERY_SECONDS.observe(elapsed)
+            outcome = "error" if "error" in result else ("rate_limited" if "retry_after" in result else "ok")
+            QUERIES.inc(outcome=outcome, coalesced=str(shared).lower())
+            log.debug("✅ Query answered", outcome=outcome, provider=result.get("provider"),
+                      total_ms=round(elapsed * 1000.0, 1), session=session_id)
+            return result
+
+    @staticmethod
+    def metrics_text() -> str:
+        """Process-wide request, provider, cache and index metrics in Prometheus text format"""
+        return REGISTRY.render_prometheus()
+
+    def _model_signature(self) -> str:
+        """Identifies which LLM would answer, so coalescing never mixes providers"""
+        if self.cassette is not None and self.cassette.replaying:
+            return f"replay:{self.cassette.path}"
+        if self.backends:
+            return f"{self.backends[0].name}:{self.backends[0].model}"
+        return "corpus-only"
+
+    def pipeline_fingerprint(self) -> Dict[str, Any]:
+        """Everything that determines an answer: LLM, prompt template, indexed chunks, k, embeddings
+
+        `hash` changes whenever any part does; the evaluation cache (eval_cache.py) keys on it.
+        """
+        if self.backends:
+            template = self._prompt_for(self.backends[0].prompt_style, "{context}", "{question}")
+        else:
+            template = "corpus-only"
+        parts = {
+            "model": self._model_signature(),
+            "prompt": hashlib.sha256(template.encode("utf-8")).hexdigest()[:12],
+            "index": self._index_hash(),
+            "k": self.retrieval_k,
+            "embeddings": os.getenv("FITSCIENCE_EMBEDDINGS", "minilm").lower(),
+        }
+        parts["hash"] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return parts
+
+    def _index_hash(self) -> str:
+        """Content hash of the indexed chunks in index order (computed once per vector store)"""
+        store = self.vectorstore
+        if store is None:
+            return "none"
+        if self._index_fingerprint is not None and self._index_fingerprint[0] is store:
+            return self._index_fingerprint[1]
+        digest = hashlib.sha256()
+        for i in range(store.index.ntotal):
+            doc = store.docstore.search(store.index_to_docstore_id[i])
+            digest.update(doc.page_content.encode("utf-8"))
+            digest.update(b"\0")
+        self._index_fingerprint = (store, digest.hexdigest()[:12])
+        return self._index_fingerprint[1]
+
+    @staticmethod
+    def coalescing_stats() -> Dict[str, float]:
+        """Process-wide single-flight counters, including the coalescing ratio"""
+        return _query_flight.stats()
+
+    def _run_query_profiled(self, question: str, session_id: str = None,
+                            priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """_run_query(), under the sampling profiler for the configured fraction of requests"""
+        profiler = self.profiler.sample()
+        if profiler is None:
+            return self._run_query(question, session_id=session_id, priority=priority)
+        with profiler:
+            result = self._run_query(question, session_id=session_id, priority=priority)
+        try:
+            paths = self.profiler.save(profiler, question, tags={
+                "timings": result.get("timings"), "provider": result.get("provider"),
+                "error": result.get("error"),
+            })
+            log.info("🔥 Profile captured", samples=len(profiler.samples),
+                     path=str(paths[0] if paths else self.profiler.output_dir))
+        except OSError as e:
+            log.warning("⚠️ Could not write profile", error=str(e))
+        return result
+
+    def _run_query(self, question: str, session_id: str = None, priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """Retrieve, build context and generate - the uncoalesced body of query()
+
+        The result carries monotonic per-stage timings in ms ("timings": embed, search, context,
+        llm, total), the answering "provider" and estimated token "usage".
+        """
+        timer = StageTimer()
+        trace: Dict[str, Any] = {"provider": None, "usage": None}
         try:
             # Retrieve relevant docs
-            docs = self.qa_chain.invoke(question)
-            print(f"📚 Initial search found {len(docs)} relevant sources for: '{question[:50]}...'")
+            docs = self._retrieve(question, timer)
+            log.debug("📚 Initial search", sources=len(docs), question=question[:50])
 
             # If no relevant docs found, try broader search terms
             if len(docs) == 0:
-                print("🔍 No relevant sources found, trying broader search...")
+                log.debug("🔍 No relevant sources found, trying broader search...")
                 # Try searching with key terms from the question
                 question_words = question.lower().split()
                 key_terms = [word for word in question_words if len(word) > 3 and word not in ['what', 'how', 'when', 'where', 'why', 'should', 'would', 'could', 'will', 'does', 'doesn', 'don', 'isn', 'aren', 'wasn', 'weren', 'haven', 'hasn', 'hadn', 'won', 'can', 'can\'t']]
@@ -447,24 +628,35 @@ Answer (using ONLY the information from the sources above):"""
                 if key_terms:
                     # Try searching with the most relevant terms
                     search_terms = " ".join(key_terms[:3])  # Use top 3 terms
-                    docs = self.qa_chain.invoke(search_terms)
-                    print(f"🔍 Broader search with terms '{search_terms}' found {len(docs)} sources")
+                    docs = self._retrieve(search_terms, timer)
+                    log.debug("🔍 Broader search", terms=search_terms, sources=len(docs))
 
             # Build context with sources
-            context_lines = []
-            for idx, d in enumerate(docs, 1):
-                title = d.metadata.get('source', f'Source {idx}')
-                url = d.metadata.get('url', '')
-                note = d.metadata.get('notes', d.metadata.get('relevance', ''))
-                context_lines.append(f"[{idx}] {title} | {url} | {note}\n{d.page_content[:800]}")
+            with timer.stage("context"):
+                context_lines = []
+                for idx, d in enumerate(docs, 1):
+                    title = d.metadata.get('source', f'Source {idx}')
+                    url = d.metadata.get('url', '')
+                    note = d.metadata.get('notes', d.metadata.get('relevance', ''))
+                    context_lines.append(f"[{idx}] {title} | {url} | {note}\n{d.page_content[:800]}")
 
-            context_text = "\n\n".join(context_lines)
+                context_text = "\n\n".join(context_lines)
 
             # Always use LLM to generate answer (corpus + general knowledge)
-            print(f"📚 Using {len(docs)} relevant sources in final answer")
-            answer = self._generate_llm_answer(context_text, question, docs)
+            log.debug("📚 Building answer", sources=len(docs))
+            retry_after = None
+            try:
+                with timer.stage("llm"):
+                    answer = self._generate_llm_answer(context_text, question, docs, session_id=session_id,
+                                                       priority=priority, trace=trace)
+            except RateLimitExceeded as e:
+                log.warning("⏳ LLM budget exhausted", retry_after=round(e.retry_after, 1))
+                retry_after = round(e.retry_after, 1)
+                answer = self._rate_limited_message(docs, retry_after)
+                trace["provider"] = "rate-limited"
+                LLM_FALLBACKS.inc(reason="rate_limited")
 
-            return {
+            result = {
                 "answer": answer,
                 "sources": [
                     {
@@ -478,41 +670,82 @@ Answer (using ONLY the information from the sources above):"""
                     for d in docs
                 ]
             }
+            if retry_after is not None:
+                result["retry_after"] = retry_after
+            timer.observe()
+            result["timings"] = timer.as_ms()
+            result["provider"] = trace["provider"]
+            result["usage"] = trace["usage"]
+            return result
         except Exception as e:
+            log.error("❌ Query failed", error=str(e), question=question[:50])
             return {"error": f"Query failed: {e}"}
     
-    def _generate_llm_answer(self, context_text: str, question: str, docs) -> str:
-        """Generate answer using LLM with corpus context - OpenAI preferred, Groq as free option"""
+    def _generate_llm_answer(self, context_text: str, question: str, docs, session_id: str = None,
+                             priority: int = PRIORITY_INTERACTIVE, trace: Dict[str, Any] = None) -> str:
+        """Generate answer using LLM with corpus context - configured backends in order, then corpus fallback"""
+        trace = trace if trace is not None else {}
         
-        # Priority 1: Try OpenAI GPT-4o-mini (best faithfulness)
-        if self.openai_api_key and OPENAI_AVAILABLE:
-            try:
-                print("🤖 Using OpenAI GPT-4o-mini for high-faithfulness response...")
-                return self.generate_openai_response(context_text, question, docs)
-            except Exception as e:
-                print(f"⚠️ OpenAI failed: {e}, falling back to Groq...")
+        # Offline replay: serve the recorded answer without touching any provider
+        if self.cassette is not None and self.cassette.replaying:
+            answer = self._replay_llm_answer(context_text, question, trace)
+            if answer is not None:
+                return answer
         
-        # Priority 2: Try Groq Llama (free cloud API - no local install)
-        if self.llm == "groq":
+        # Try each configured backend in priority order (e.g. OpenAI → Groq, or local → Groq); a
+        # rate-limited backend falls through to the next one like a failed one
+        attempted = False
+        rate_limited = None
+        for backend in self.backends:
             try:
-                print("🦙 Using Groq Llama (free cloud API)...")
-                return self.generate_groq_response(context_text, question, docs)
+                log.debug("🤖 Generating answer", backend=backend.name)
+                return self._generate_with_backend(backend, context_text, question, session_id=session_id,
+                                                   priority=priority, trace=trace)
+            except RateLimitExceeded as e:
+                log.info("⏳ LLM backend rate-limited", backend=backend.name, retry_after=round(e.retry_after, 1))
+                LLM_FALLBACKS.inc(reason="backend_rate_limited", provider=backend.name)
+                if rate_limited is None or e.retry_after < rate_limited.retry_after:
+                    rate_limited = e
             except Exception as e:
-                print(f"⚠️ Groq failed, falling back to corpus-only response: {e}")
-                return self._create_corpus_fallback_response(docs, question)
-        else:
-            # Try Groq if we have key but wasn't set at init
-            if self.use_groq and self.groq_api_key and GROQ_AVAILABLE:
-                print("🦙 Groq API key found, generating answer...")
-                self.llm = "groq"
-                try:
-                    return self.generate_groq_response(context_text, question, docs)
-                except Exception as e:
-                    print(f"⚠️ Groq failed: {e}")
-            
-            return self._no_llm_message(docs)
-    
+                attempted = True
+                log.warning("⚠️ LLM backend failed", backend=backend.name, error=str(e))
+                LLM_FALLBACKS.inc(reason="backend_failed", provider=backend.name)
+        
+        # Nobody answered: a rate limit means "try again shortly", which beats a corpus excerpt
+        if rate_limited is not None:
+            raise rate_limited
+        if attempted:
+            log.warning("⚠️ All LLM backends failed, falling back to corpus-only response")
+            trace["provider"] = "corpus-fallback"
+            LLM_FALLBACKS.inc(reason="corpus_fallback", provider="none")
+            return self._create_corpus_fallback_response(docs, question)
+        trace["provider"] = "none"
+        LLM_FALLBACKS.inc(reason="no_backend", provider="none")
+        return self._no_llm_message(docs)
     
+    def _replay_llm_answer(self, context_text: str, question: str, trace: Dict[str, Any] = None):
+        """Recorded answer for this exact prompt from whichever provider recorded it"""
+        candidates = {name: self._prompt_for(cls.prompt_style, context_text, question)
+                      for name, cls in backend_classes().items()}
+        hit = self.cassette.replay(candidates.items())
+        CASSETTE_LOOKUPS.inc(result="miss" if hit is None else "hit")
+        if hit is not None:
+            log.debug("📼 Replayed recorded answer", provider=hit[0])
+            if trace is not None:
+                self._trace_llm(trace, f"replay:{hit[0]}", candidates[hit[0]], hit[1])
+            return hit[1]
+        if self.cassette.strict:
+            raise CassetteMiss(f"No recorded answer in {self.cassette.path} for: '{question[:50]}...'")
+        log.info("📼 Prompt not in cassette, falling back to live LLM...", question=question[:50])
+        return None
+
+    def _retrieve(self, query: str, timer: StageTimer) -> List["Document"]:
+        """Same top-k search as the retriever, split into timed embed and FAISS search stages"""
+        with timer.stage("embed"):
+            vector = self.embeddings.embed_query(query)
+        with timer.stage("search"):
+            return self.vectorstore.similarity_search_by_vector(vector, k=self.retrieval_k)
+
     def _create_corpus_fallback_response(self, docs, question: str) -> str:
         """Create a faithful response using ONLY corpus content when LLM fails"""
         if not docs:
@@ -535,6 +768,15 @@ Answer (using ONLY the information from the sources above):"""
         
         return "\n".join(response_parts)
 
+    def _rate_limited_message(self, docs, retry_after: float) -> str:
+        """Tell the user when the coach can answer instead of failing while Groq's budget refills"""
+        message = (f"⏳ FitScience Coach is busy right now (free-tier LLM limit reached). "
+                   f"Please try again in about {retry_after:.0f} seconds.")
+        if docs:
+            message += ("\n\n**Sources found in my knowledge base:**\n" +
+                        "\n".join([f"• {d.metadata.get('source', 'Unknown')}" for d in docs[:3]]))
+        return message
+
     def _no_llm_message(self, docs) -> str:
         """Show helpful message when no LLM is available"""
         groq_help = (
@@ -606,32 +848,73 @@ Answer (using ONLY the information from the sources above):"""
             ]
         }
     
-    def initialize_system(self):
-        """Initialize the complete RAG system"""
-        print("🚀 Initializing FitScience Coach RAG System...")
-        
-        # Load corpus
-        corpus_df = self.load_corpus_from_csv()
-        if corpus_df is None:
-            return False
-        
-        # Create synthetic content for demo
-        documents = self.create_synthetic_content()
+    def initialize_system(self, warmup_timeout: float = None):
+        """Initialize the complete RAG system
+
+        When a background warm-up was started in this process (warmup.start_warmup), waits for it
+        and shares its corpus, embedding model and index instead of building them again; builds
+        them itself if there is no warm-up or it failed.
+        """
+        log.info("🚀 Initializing FitScience Coach RAG System...")
+        timer = StageTimer()
+        try:
+            if not self._adopt_warmup(timer, warmup_timeout):
+                # Load corpus
+                with timer.stage("load_corpus"):
+                    corpus_df = self.load_corpus_from_csv()
+                if corpus_df is None:
+                    return False
+                
+                # Create synthetic content for demo
+                with timer.stage("chunk"):
+                    documents = self.create_synthetic_content()
+                
+                # Build vector store
+                with timer.stage("vectorstore"):
+                    built = self.build_vectorstore(documents)
+                if not built:
+                    return False
+            
+            # Setup QA chain
+            with timer.stage("qa_setup"):
+                ready = self.setup_qa_chain()
+            if not ready:
+                return False
+        finally:
+            for step, seconds in timer.stages.items():
+                BUILD_SECONDS.set(seconds, step=step)
+            BUILD_SECONDS.set(timer.total(), step="total")
         
-        # Build vector store
-        if not self.build_vectorstore(documents):
+        log.info("✅ FitScience Coach RAG System ready!", build_s=round(timer.total(), 2))
+        return True
+
+    def _adopt_warmup(self, timer: StageTimer, timeout: float = None) -> bool:
+        """Share the process-wide warmed corpus, embeddings and index; False if there is none to share"""
+        warm = current_warmup()
+        if warm is None:
             return False
-        
-        # Setup QA chain
-        if not self.setup_qa_chain():
+        if not warm.ready:
+            log.info("⏳ Waiting for shared warm-up...", state=warm.state)
+        with timer.stage("warmup_wait"):
+            ready = warm.wait(timeout)
+        if not ready:
+            log.warning("⚠️ Shared warm-up unavailable, building a private index", state=warm.state, error=warm.error)
             return False
-        
-        print("✅ FitScience Coach RAG System ready!")
+        self.corpus_metadata = warm.corpus_metadata
+        self.embeddings = warm.embeddings
+        self.vectorstore = warm.vectorstore
+        log.info("♻️ Using shared warmed index", vectors=self.vectorstore.index.ntotal)
         return True
 
 def main():
     """Demo function"""
-    rag = FitScienceRAG()
+    import argparse
+    parser = argparse.ArgumentParser(description="FitScience Coach RAG demo")
+    parser.add_argument("--profile", type=float, metavar="RATE", default=None,
+                        help="fraction of demo queries to profile (1 = all); files go to profiles/")
+    args = parser.parse_args()
+    configure_logging()
+    rag = FitScienceRAG(profile_rate=args.profile)
     
     if rag.initialize_system():
         # Demo queries
@@ -654,6 +937,14 @@ def main():
                     print(f"   - {source['title']}")
             else:
                 print(f"❌ Error: {result['error']}")
+        
+        stats = FitScienceRAG.coalescing_stats()
+        print(f"\n🔗 Coalescing: {stats['coalesced']}/{stats['requests']} requests shared "
+              f"(ratio {stats['coalescing_ratio']:.2f})")
+        for name, stats in rag.backend_stats().items():
+            print(f"⏱️ {name}: {stats}")
+        if rag.cassette is not None:
+            print(f"📼 Cassette ({rag.cassette.mode}) {rag.cassette.path}: {rag.cassette.stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,23 +2,27 @@
 """
 RAGAs Evaluation Script for FitScience Coach
 Using OpenAI API for reliable evaluation.
+
+`--scorer local` replaces the OpenAI judge with local embedding scores (local_scorer.py) for offline
+and CI runs; `--min-local` stops before any judge call when the local scores are already too low.
 """
 
 import os
 import json
+import time
+import argparse
+from collections import Counter
 import warnings
+import queue
+import threading
 import pandas as pd
-from datasets import Dataset
-from ragas import evaluate
-from ragas.metrics import (
-    Faithfulness,
-    AnswerRelevancy,
-    ContextPrecision,
-    ContextRecall,
-    ContextRelevance,
-)
 from rag_pipeline import FitScienceRAG
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from eval_cache import EvalCache
+from eval_dataset import add_dataset_arguments, create_evaluation_dataset, samples_from_args
+from local_scorer import LOCAL_METRICS, LocalScorer, summarize
+from bench_utils import latency_summary
+from perf_history import latency_metrics, pipeline_metrics, record_run
+from pipeline_logging import configure_logging
 
 # ---------------------------------------------------------------------
 # Configuration
@@ -30,57 +34,21 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "your-openai-api-key-here")
 if OPENAI_API_KEY != "your-openai-api-key-here":
     os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-# ---------------------------------------------------------------------
-# Evaluation dataset
-# ---------------------------------------------------------------------
-def create_evaluation_dataset():
-    return [
-        {
-            "question": "How much protein should I eat per day for muscle building?",
-            "ground_truth": "For resistance training, consume 1.6–2.2 g/kg body weight daily, spread across meals.",
-            "contexts": [
-                "Optimal intake for muscle growth is 1.6–2.2 g/kg/day distributed over multiple meals.",
-                "Protein distribution across the day enhances synthesis and recovery efficiency.",
-            ],
-        },
-        {
-            "question": "What is the best workout split for beginners?",
-            "ground_truth": "Full-body training three times per week is best for beginners before switching to upper/lower or push-pull-legs.",
-            "contexts": [
-                "Beginners progress best with full-body workouts 3 days per week.",
-                "This schedule balances stimulus and recovery across muscle groups.",
-            ],
-        },
-        {
-            "question": "How do I calculate my BMR and TDEE?",
-            "ground_truth": "Use the Harris–Benedict formula for BMR and multiply by activity factor (1.2–1.9) for TDEE.",
-            "contexts": [
-                "Harris–Benedict: Men = 88.362 + (13.397×wt) + (4.799×ht) – (5.677×age).",
-                "TDEE = BMR × activity (1.2–1.9 depending on lifestyle).",
-            ],
-        },
-        {
-            "question": "How much sleep do I need for optimal recovery?",
-            "ground_truth": "Adults 7–9 h; athletes 8–10 h. Deep sleep releases growth hormone aiding repair and immune function.",
-            "contexts": [
-                "Adults need 7–9 h; athletes 8–10 h.",
-                "Deep sleep supports muscle protein synthesis and hormone release.",
-            ],
-        },
-        {
-            "question": "What are the most important micronutrients for athletes?",
-            "ground_truth": "Iron, Vitamin D, Magnesium, Zinc, and B Vitamins are critical for performance and recovery.",
-            "contexts": [
-                "Iron for oxygen transport; Vitamin D for bone and muscle health.",
-                "Magnesium, Zinc, and B vitamins aid energy and immune functions.",
-            ],
-        },
-    ]
+# Judge model for RAGAs metrics (part of every cached score's key)
+JUDGE_MODEL = "gpt-4o-mini"
+SCORED_STATUSES = ("ok", "cached")  # responses that are real answers; the rest are only counted
 
 # ---------------------------------------------------------------------
 # Collect RAG responses
 # ---------------------------------------------------------------------
-def get_rag_responses(evaluation_data):
+def _run_query(rag, question, index, finished):
+    """Worker body: answer one question and hand (index, result, error, end time) back"""
+    try:
+        finished.put((index, rag.query(question), None, time.perf_counter()))
+    except Exception as e:
+        finished.put((index, None, e, time.perf_counter()))
+
+def create_rag():
     print("🚀 Initializing FitScience Coach RAG System for evaluation…")
     print("🔑 Using OpenAI API key for improved faithfulness")
     rag = FitScienceRAG(
@@ -89,88 +57,271 @@ def get_rag_responses(evaluation_data):
         groq_api_key=os.environ.get("GROQ_API_KEY", "")
     )
     rag.initialize_system()
-    results = []
-    for i, q in enumerate(evaluation_data, 1):
-        print(f"📝 Query {i}: {q['question']}")
+    return rag
+
+def get_rag_responses(evaluation_data, concurrency=None, timeout=None, rag=None):
+    """Answer every evaluation question, up to `concurrency` at a time, in dataset order
+
+    A question still unanswered `timeout` seconds after its query started is recorded with status
+    "timeout" and its daemon worker is abandoned, so its slot goes to the next question and a hung
+    query cannot stall the run or interpreter exit. Statuses are ok, rate_limited, error and
+    timeout; each response carries its own `latency_s`.
+    """
+    concurrency = concurrency or int(os.environ.get("FITSCIENCE_EVAL_CONCURRENCY", "4"))
+    timeout = timeout or float(os.environ.get("FITSCIENCE_EVAL_TIMEOUT", "120"))
+    rag = rag or create_rag()
+    print(f"⚡ Collecting {len(evaluation_data)} answers, {concurrency} at a time (timeout {timeout:g} s)")
+
+    def response(q, answer, latency, status):
+        return {
+            "question": q["question"],
+            "answer": answer,
+            "contexts": q["contexts"],
+            "ground_truth": q["ground_truth"],
+            "latency_s": round(latency, 3) if latency is not None else None,
+            "status": status,
+        }
+
+    results = [None] * len(evaluation_data)
+    finished = queue.Queue()
+    running = {}  # index -> start time of queries still being waited for
+    next_index = 0
+    while next_index < len(evaluation_data) or running:
+        # Daemon threads: a query abandoned at its timeout frees its slot and never blocks exit
+        while next_index < len(evaluation_data) and len(running) < concurrency:
+            running[next_index] = time.perf_counter()
+            threading.Thread(target=_run_query, args=(rag, evaluation_data[next_index]["question"], next_index, finished),
+                             name=f"eval-query-{next_index}", daemon=True).start()
+            next_index += 1
         try:
-            r = rag.query(q["question"])
-            results.append({
-                "question": q["question"],
-                "answer": r["answer"],
-                "contexts": q["contexts"],
-                "ground_truth": q["ground_truth"],
-            })
-            print(f"✅ Answer {i} captured.")
-        except Exception as e:
-            print(f"❌ Query {i} failed: {e}")
-            results.append({
-                "question": q["question"],
-                "answer": f"Error: {e}",
-                "contexts": q["contexts"],
-                "ground_truth": q["ground_truth"],
-            })
+            i, r, error, ended = finished.get(timeout=0.1)
+        except queue.Empty:
+            pass
+        else:
+            if i in running:  # results of queries that already timed out are dropped
+                q, latency = evaluation_data[i], ended - running.pop(i)
+                if error is None and "error" in r:
+                    error = RuntimeError(r["error"])
+                if error is not None:
+                    print(f"❌ Query {i + 1} failed: {error}")
+                    results[i] = response(q, f"Error: {error}", latency, "error")
+                elif "retry_after" in r:
+                    print(f"⏳ Query {i + 1} rate-limited (retry after ~{r['retry_after']:.0f} s)")
+                    results[i] = response(q, r["answer"], latency, "rate_limited")
+                else:
+                    results[i] = response(q, r["answer"], latency, "ok")
+                    print(f"✅ Answer {i + 1} captured in {latency:.1f} s.")
+        now = time.perf_counter()
+        for i, started in list(running.items()):
+            if now - started > timeout:
+                del running[i]
+                print(f"⏰ Query {i + 1} timed out after {timeout:g} s")
+                results[i] = response(evaluation_data[i], f"Error: timed out after {timeout:g} s", now - started, "timeout")
     return results
 
 # ---------------------------------------------------------------------
 # RAGAS evaluation
 # ---------------------------------------------------------------------
-def run_ragas_evaluation():
+def _score(value):
+    return None if value is None or pd.isna(value) else float(value)
+
+def run_ragas_evaluation(concurrency=None, timeout=None, use_cache=True, samples=None, scorer="ragas",
+                         min_local=None):
+    """Evaluate with RAGAs, reusing cached answers and scores (see eval_cache.py)
+
+    Only questions whose answer is missing for the current pipeline fingerprint are re-answered,
+    and only (sample, metric) scores missing for those answers are sent to the judge LLM.
+    Local embedding scores are always computed; with scorer="local" they are the only scores.
+    """
     print("🔬 Starting RAGAs Evaluation for FitScience Coach…")
-    print("🔑 Using OpenAI GPT-4o-mini (fast & reliable)")
+    if scorer == "ragas":
+        print("🔑 Using OpenAI GPT-4o-mini (fast & reliable)")
+    else:
+        print("📏 Using local MiniLM scores (no judge LLM)")
     
-    eval_data = create_evaluation_dataset()
+    # RAGAs scores a whole in-memory Dataset, so a streamed selection is materialized here;
+    # use --shard / --sample / --limit to bound it
+    eval_data = list(samples) if samples is not None else create_evaluation_dataset()
     print(f"📊 Dataset contains {len(eval_data)} questions")
-    responses = get_rag_responses(eval_data)
+    cache = EvalCache() if use_cache else EvalCache(path=None)
+    rag = create_rag()
+    fingerprint = rag.pipeline_fingerprint()
+    print(f"🧬 Pipeline fingerprint {fingerprint['hash']}: model={fingerprint['model']} "
+          f"prompt={fingerprint['prompt']} index={fingerprint['index']} k={fingerprint['k']}")
+
+    responses = [None] * len(eval_data)
+    for i, q in enumerate(eval_data):
+        cached = cache.answer(q, fingerprint)
+        if cached is not None:
+            responses[i] = {"question": q["question"], "answer": cached["answer"], "contexts": q["contexts"],
+                            "ground_truth": q["ground_truth"], "latency_s": cached["latency_s"], "status": "cached"}
+    missing = [i for i, r in enumerate(responses) if r is None]
+    print(f"♻️ {len(eval_data) - len(missing)} cached answers, {len(missing)} to generate")
+    collection_started = time.perf_counter()
+    if missing:
+        fresh = get_rag_responses([eval_data[i] for i in missing], concurrency=concurrency, timeout=timeout, rag=rag)
+        for i, r in zip(missing, fresh):
+            responses[i] = r
+            cache.put_answer(eval_data[i], fingerprint, r["answer"], r["latency_s"], r["status"])
+    collection_s = time.perf_counter() - collection_started
+    statuses = dict(Counter(r["status"] for r in responses))
+    print(f"⏱️ Collected {len(missing)} answers in {collection_s:.1f} s ("
+          + ", ".join(f"{status} {count}" for status, count in sorted(statuses.items())) + ")")
 
-    dataset = Dataset.from_dict({
-        "question": [r["question"] for r in responses],
-        "answer": [r["answer"] for r in responses],
-        "contexts": [r["contexts"] for r in responses],
-        "ground_truth": [r["ground_truth"] for r in responses],
-    })
+    # Errors, timeouts and rate-limit messages are not answers: keep them away from the (paid) judge
+    # and out of every average; they are only counted in the details
+    answers = [r["answer"] for r in responses]
+    scored = [i for i, r in enumerate(responses) if r["status"] in SCORED_STATUSES]
+    excluded = {status: count for status, count in statuses.items() if status not in SCORED_STATUSES}
+    if excluded:
+        print(f"⚠️ Not scoring {len(responses) - len(scored)} failed answers: "
+              + ", ".join(f"{status} {count}" for status, count in sorted(excluded.items())))
+    local = LocalScorer(rag.embeddings).score(
+        [responses[i]["question"] for i in scored], [answers[i] for i in scored],
+        [responses[i]["contexts"] for i in scored], [responses[i]["ground_truth"] for i in scored])
+    local_averages = summarize(local)
+    print("📏 Local scores: " + ", ".join(f"{k}={v}" for k, v in local_averages.items()))
+    if min_local is not None:
+        failing = [k for k, v in local_averages.items() if v is not None and v < min_local]
+        if failing:
+            print(f"❌ Local pre-filter failed ({', '.join(failing)} < {min_local}); skipping the judge")
+            return None
 
-    metrics = [Faithfulness(), AnswerRelevancy(), ContextPrecision(), ContextRecall(), ContextRelevance()]
-    print("🎯 Metrics: Faithfulness, Answer Relevancy, Context Precision, Context Recall, Context Relevance")
+    if scorer == "ragas":
+        from ragas.metrics import (
+            Faithfulness,
+            AnswerRelevancy,
+            ContextPrecision,
+            ContextRecall,
+            ContextRelevance,
+        )
+        metrics = [Faithfulness(), AnswerRelevancy(), ContextPrecision(), ContextRecall(), ContextRelevance()]
+        print("🎯 Metrics: Faithfulness, Answer Relevancy, Context Precision, Context Recall, Context Relevance")
+    else:
+        metrics = []
+    judge_names = [m.name for m in metrics]
+    cached_scores, todo = cache.missing_scores([eval_data[i] for i in scored], [answers[i] for i in scored],
+                                               fingerprint, judge_names, JUDGE_MODEL)
+    todo = {names: [scored[j] for j in positions] for names, positions in todo.items()}
+    scores = [{} for _ in responses]
+    for j, i in enumerate(scored):
+        scores[i] = cached_scores[j]
+        scores[i].update({name: local[name][j] for name in LOCAL_METRICS})
+    pending = sum(len(names) * len(indices) for names, indices in todo.items())
+    if metrics:
+        print(f"♻️ {len(scored) * len(metrics) - pending} cached scores, {pending} to evaluate")
 
-    # Initialize OpenAI models
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    print("✅ OpenAI models initialized")
+    if todo:
+        from datasets import Dataset
+        from ragas import evaluate
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        # Initialize OpenAI models
+        llm = ChatOpenAI(model=JUDGE_MODEL, temperature=0)
+        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        print("✅ OpenAI models initialized")
 
-    # Run evaluation
-    try:
-        print("⚙️ Running RAGAS evaluation with OpenAI…")
-        result = evaluate(dataset, metrics=metrics, llm=llm, embeddings=embeddings)
-        print("✅ Evaluation completed successfully!")
-    except Exception as e:
-        print(f"❌ Evaluation failed: {e}")
-        return None
+    # Run evaluation only for the (samples, metrics) groups the cache could not answer
+    for names, indices in todo.items():
+        dataset = Dataset.from_dict({
+            "question": [responses[i]["question"] for i in indices],
+            "answer": [responses[i]["answer"] for i in indices],
+            "contexts": [responses[i]["contexts"] for i in indices],
+            "ground_truth": [responses[i]["ground_truth"] for i in indices],
+        })
+        try:
+            print(f"⚙️ Running RAGAS evaluation with OpenAI on {len(indices)} samples: {', '.join(names)}…")
+            result = evaluate(dataset, metrics=[m for m in metrics if m.name in names], llm=llm, embeddings=embeddings)
+            print("✅ Evaluation completed successfully!")
+        except Exception as e:
+            print(f"❌ Evaluation failed: {e}")
+            return None
+        for name, values in result._scores_dict.items():
+            for i, value in zip(indices, values):
+                scores[i][name] = value
+                cache.put_score(eval_data[i], fingerprint, name, answers[i], JUDGE_MODEL, _score(value))
 
-    # Extract scores
+    # Aggregate over every scored sample, fresh and cached
     print("\n🎉 RAGAS Evaluation Results:")
     print("="*60)
-    scores_dict = result._scores_dict
-    for k, v in scores_dict.items():
-        val = v[0]
-        print(f"{k:22}: {val if not pd.isna(val) else 'NaN'}")
+    metric_names = judge_names + LOCAL_METRICS
+    averages = {}
+    for name in metric_names:
+        vals = [_score(s.get(name)) for s in scores]
+        vals = [v for v in vals if v is not None]
+        averages[name] = sum(vals) / len(vals) if vals else None
+        print(f"{name:22}: {averages[name] if averages[name] is not None else 'NaN'}")
 
-    vals = [v[0] for v in scores_dict.values() if not pd.isna(v[0])]
+    # The overall score stays on the judge's scale; local scores only stand in without a judge
+    vals = [averages[name] for name in (judge_names or LOCAL_METRICS) if averages[name] is not None]
     overall = sum(vals)/len(vals) if vals else float("nan")
     print(f"\n🏁 Overall RAGAS Score: {overall:.3f}")
 
+    details = {"system": "FitScience Coach v1.0", "model": JUDGE_MODEL if metrics else "local-minilm",
+               "scorer": scorer, "questions": len(eval_data), "scored": len(scored),
+               "response_collection_s": round(collection_s, 2), "statuses": statuses,
+               "pipeline_fingerprint": fingerprint,
+               "cache": cache.stats()}
     out = {
-        "metrics": {k: (v[0] if not pd.isna(v[0]) else None) for k, v in scores_dict.items()},
+        "metrics": averages,
+        "overall_score": overall,
+        "details": details,
+        "responses": [
+            {k: r[k] for k in ("question", "answer", "latency_s", "status")} for r in responses
+        ],
+    }
+    per_sample = [
+        {"user_input": r["question"], "retrieved_contexts": r["contexts"], "response": r["answer"],
+         "reference": r["ground_truth"], "status": r["status"],
+         **{name: _score(s.get(name)) for name in metric_names}}
+        for r, s in zip(responses, scores)
+    ]
+    aggregate = {
+        "per_sample": per_sample,
+        "macro_averages": averages,
         "overall_score": overall,
-        "details": {"system": "FitScience Coach v1.0", "model": "gpt-4o-mini", "questions": len(dataset)},
+        "evaluation_details": {"total_questions": len(eval_data), "scored_questions": len(scored),
+                               "excluded": excluded,
+                               "metrics_used": [type(m).__name__ for m in metrics] + LOCAL_METRICS,
+                               "evaluation_framework": "RAGAs", "system_version": "FitScience Coach v1.0",
+                               "pipeline_fingerprint": fingerprint["hash"]},
     }
+    os.makedirs("ragas_results", exist_ok=True)
     with open("ragas_results/ragas_evaluation_results.json", "w") as f:
         json.dump(out, f, indent=2)
-    print("💾 Saved → ragas_results/ragas_evaluation_results.json")
+    with open("ragas_results/ragas_aggregate_results.json", "w") as f:
+        json.dump(aggregate, f, indent=2)
+    pd.DataFrame(per_sample).to_csv("ragas_results/ragas_scores_per_sample.csv", index=False)
+    print("💾 Saved → ragas_results/ragas_evaluation_results.json, ragas_aggregate_results.json, "
+          "ragas_scores_per_sample.csv")
+
+    # Latency of this run's fresh answers (cached ones were not re-timed) plus tokens, memory, build time
+    perf = pipeline_metrics()
+    perf.update(latency_metrics(latency_summary(r["latency_s"] for r in responses if r["status"] == "ok"), "query"))
+    perf["overall_score"] = overall
+    if missing:  # wall time depends on how many answers were cached, so record it per generated answer
+        perf["response_collection_s_per_answer"] = collection_s / len(missing)
+    record_run("ragas", perf, config={"scorer": scorer, "questions": len(eval_data), "answered": len(missing),
+                                      "concurrency": concurrency, "pipeline_fingerprint": fingerprint["hash"]})
     return out
 
 # ---------------------------------------------------------------------
 if __name__ == "__main__":
-    res = run_ragas_evaluation()
+    parser = argparse.ArgumentParser(description="RAGAs evaluation for FitScience Coach")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="questions answered in parallel (default $FITSCIENCE_EVAL_CONCURRENCY or 4)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds per question (default $FITSCIENCE_EVAL_TIMEOUT or 120)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="regenerate every answer and score (ignore ragas_results/eval_cache.jsonl)")
+    parser.add_argument("--scorer", choices=["ragas", "local"], default="ragas",
+                        help="ragas = OpenAI judge (+ local scores); local = local MiniLM scores only, offline")
+    parser.add_argument("--min-local", type=float, default=None,
+                        help="pre-filter: stop before the judge if any local score's mean is below this")
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    configure_logging()
+    res = run_ragas_evaluation(concurrency=args.concurrency, timeout=args.timeout, use_cache=not args.no_cache,
+                               samples=samples_from_args(args), scorer=args.scorer, min_local=args.min_local)
     if res:
         print("\n📊 Summary")
         print("="*60)
@@ -0,0 +1,236 @@
+"""
+FitScience Coach - Groq Rate Limiting
+Process-wide token buckets for the Groq free tier plus a fair request queue across sessions
+"""
+
+import os
+import threading
+import time
+import itertools
+from collections import deque
+from typing import Dict, Optional
+
+# Request priorities (lower value is served first)
+PRIORITY_INTERACTIVE = 0   # Ask Coach questions - a user is waiting on the answer
+PRIORITY_BACKGROUND = 1    # Study guide / quiz generation from the Courses tab
+
+# Groq free-tier budgets for llama-3.1-8b-instant (override via .env if your plan differs)
+DEFAULT_GROQ_RPM = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+DEFAULT_GROQ_TPM = int(os.getenv("GROQ_TPM_LIMIT", "6000"))
+
+# Tokens reserved for the completion on top of the prompt estimate
+COMPLETION_TOKEN_RESERVE = 512
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted within its maximum wait"""
+
+    def __init__(self, retry_after: float, message: str = None):
+        self.retry_after = max(0.0, float(retry_after))
+        super().__init__(message or f"Rate limit reached - estimated wait {self.retry_after:.1f}s")
+
+
+def estimate_tokens(text: str, completion_reserve: int = COMPLETION_TOKEN_RESERVE) -> int:
+    """Rough token estimate for a prompt (~4 characters per token) plus the completion budget"""
+    return max(1, len(text or "") // 4) + completion_reserve
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` tokens, refilled continuously over `period` seconds"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period  # tokens per second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def time_until(self, amount: float, now: float = None) -> float:
+        """Seconds until `amount` tokens are available (0.0 if available now)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        # Requests larger than the bucket are admitted once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float = None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self, seconds: float, now: float = None):
+        """Empty the bucket so that it only refills after `seconds` (used on provider 429s)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class GroqRateLimiter:
+    """Models both Groq budgets: requests per minute and tokens per minute"""
+
+    def __init__(self, rpm: int = DEFAULT_GROQ_RPM, tpm: int = DEFAULT_GROQ_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def time_until(self, tokens: int, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(self.requests.time_until(1, now), self.tokens.time_until(tokens, now))
+
+    def consume(self, tokens: int, now: float = None):
+        now = time.monotonic() if now is None else now
+        self.requests.consume(1, now)
+        self.tokens.consume(tokens, now)
+
+    def penalize(self, retry_after: float):
+        """Back off after the provider itself rejected a request"""
+        now = time.monotonic()
+        self.requests.drain(retry_after, now)
+        self.tokens.drain(retry_after, now)
+
+    def estimate_wait(self, requests_ahead: int, tokens_ahead: int) -> float:
+        """Estimated seconds before a request queued behind the given backlog is admitted"""
+        now = time.monotonic()
+        self.requests._refill(now)
+        self.tokens._refill(now)
+        request_deficit = requests_ahead - self.requests.tokens
+        token_deficit = tokens_ahead - self.tokens.tokens
+        return max(0.0,
+                   request_deficit / self.requests.rate,
+                   token_deficit / self.tokens.rate)
+
+
+class _Ticket:
+    __slots__ = ("seq", "session_id", "priority", "tokens")
+
+    def __init__(self, seq: int, session_id: str, priority: int, tokens: int):
+        self.seq = seq
+        self.session_id = session_id
+        self.priority = priority
+        self.tokens = tokens
+
+
+class FairRequestQueue:
+    """Admits LLM requests against a GroqRateLimiter in priority order, round-robin across sessions
+
+    Interactive requests always go before background ones. Within a priority the session that
+    has been served least in the last FAIRNESS_WINDOW seconds goes first, so one user generating
+    a whole course's worth of quizzes cannot starve everybody else. Only grants inside the window
+    are remembered, so the bookkeeping stays bounded by the provider's request budget.
+    """
+
+    FAIRNESS_WINDOW = 60.0  # seconds, the period of Groq's per-minute budgets
+
+    # Longest a caller will queue before getting an estimated wait instead of an answer
+    MAX_WAIT = {
+        PRIORITY_INTERACTIVE: float(os.getenv("GROQ_MAX_WAIT_INTERACTIVE", "20")),
+        PRIORITY_BACKGROUND: float(os.getenv("GROQ_MAX_WAIT_BACKGROUND", "60")),
+    }
+
+    def __init__(self, limiter: GroqRateLimiter):
+        self.limiter = limiter
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._served: Dict[str, int] = {}  # grants per session inside the window
+        self._grants = deque()             # (granted_at, session_id), oldest first
+        self._seq = itertools.count()
+
+    def _expire(self, now: float):
+        """Forget grants older than the fairness window (caller holds self._cond)"""
+        horizon = now - self.FAIRNESS_WINDOW
+        while self._grants and self._grants[0][0] < horizon:
+            _, session_id = self._grants.popleft()
+            self._served[session_id] -= 1
+            if not self._served[session_id]:
+                del self._served[session_id]
+
+    def _order(self, ticket: _Ticket):
+        return (ticket.priority, self._served.get(ticket.session_id, 0), ticket.seq)
+
+    def _ahead_of(self, ticket: _Ticket):
+        key = self._order(ticket)
+        return [t for t in self._waiting if self._order(t) < key]
+
+    def estimate_wait(self, tokens: int, priority: int = PRIORITY_INTERACTIVE, session_id: str = None) -> float:
+        """Estimated queueing delay for a new request, without enqueuing it"""
+        with self._cond:
+            self._expire(time.monotonic())
+            probe = _Ticket(float("inf"), session_id or "anonymous", priority, tokens)
+            ahead = self._ahead_of(probe)
+            return self.limiter.estimate_wait(len(ahead) + 1, sum(t.tokens for t in ahead) + tokens)
+
+    def acquire(self, tokens: int, session_id: str = None, priority: int = PRIORITY_INTERACTIVE,
+                max_wait: Optional[float] = None) -> float:
+        """Block until the request is admitted; returns seconds spent queueing
+
+        Raises RateLimitExceeded (with an estimated wait) if admission would take longer than max_wait.
+        """
+        if max_wait is None:
+            max_wait = self.MAX_WAIT.get(priority, self.MAX_WAIT[PRIORITY_BACKGROUND])
+        start = time.monotonic()
+        deadline = start + max_wait
+
+        with self._cond:
+            ticket = _Ticket(next(self._seq), session_id or "anonymous", priority, tokens)
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+                    head = min(self._waiting, key=self._order)
+                    if head is ticket:
+                        wait = self.limiter.time_until(tokens, now)
+                        if wait <= 0:
+                            self.limiter.consume(tokens, now)
+                            self._served[ticket.session_id] = self._served.get(ticket.session_id, 0) + 1
+                            self._grants.append((now, ticket.session_id))
+                            return now - start
+                    else:
+                        ahead = self._ahead_of(ticket)
+                        wait = self.limiter.estimate_wait(len(ahead) + 1,
+                                                          sum(t.tokens for t in ahead) + tokens)
+                    if now + wait > deadline:
+                        raise RateLimitExceeded(wait)
+                    # The head wakes itself when its budget refills; everyone else waits for a grant
+                    self._cond.wait(timeout=min(wait, deadline - now) if head is ticket else deadline - now)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+
+_groq_queue = None
+_groq_queue_lock = threading.Lock()
+
+
+def get_groq_queue() -> FairRequestQueue:
+    """Process-wide Groq request queue shared by every FitScienceRAG instance (i.e. every session)"""
+    global _groq_queue
+    if _groq_queue is None:
+        with _groq_queue_lock:
+            if _groq_queue is None:
+                _groq_queue = FairRequestQueue(GroqRateLimiter())
+    return _groq_queue
+
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """Detect a provider rate-limit rejection; returns its retry delay (seconds) or None
+
+    HTTP 429 (the SDKs' status_code) or the providers' RateLimitError type decide; the message is
+    only a fallback for an explicit "rate limit" phrase, since any error text can contain "429"
+    (token counts, request ids) and a false match stalls the shared queue for every session.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError" and "rate limit" not in str(error).lower():
+        return None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 10.0))
+    except (TypeError, ValueError, AttributeError):
+        return 10.0
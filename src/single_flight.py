@@ -0,0 +1,110 @@
+"""
+FitScience Coach - Single-Flight Query Coalescing
+Concurrent identical requests share one in-flight computation and all receive its result
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # followers' snapshot, never handed out or mutated itself
+        self.error = None
+        self.followers = 0
+
+
+def _copy_exception(error: Exception) -> Exception:
+    """Same type, args and attributes, without re-running __init__ (its signature may differ from args)"""
+    try:
+        clone = type(error).__new__(type(error), *error.args)
+        clone.__dict__.update(getattr(error, "__dict__", {}))
+        return clone
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls with the same key
+
+    The first caller for a key (the leader) runs the function; callers arriving while it is
+    still running wait for it and get a deep copy of its result (or a copy of its exception).
+    Nothing is cached once the call completes - the next request for the key starts a fresh
+    computation.
+
+    Only the leader's fn runs, so whatever it closes over (e.g. the session charged for an LLM
+    request) applies to the whole group; put anything followers must not share into the key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.requests = 0    # every call to do()
+        self.executions = 0  # calls that actually ran the function
+        self.coalesced = 0   # calls that shared a leader's result
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per concurrent key; returns (result, shared)"""
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if not isinstance(call.error, Exception):  # KeyboardInterrupt / SystemExit belong to the leader's thread
+                    raise RuntimeError(f"coalesced call was interrupted ({type(call.error).__name__})") from call.error
+                # A fresh exception per follower: raising one instance from many threads races on its traceback
+                raise _copy_exception(call.error) from call.error
+            # Followers get their own copy so callers can't mutate each other's results
+            return copy.deepcopy(call.result), True
+
+        try:
+            try:
+                result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            # Snapshot before waking followers: the leader is free to mutate its own result afterwards
+            try:
+                call.result = copy.deepcopy(result)
+            except Exception as e:  # the leader's result stands; only the followers can't share it
+                call.error = RuntimeError(f"coalesced result could not be copied: {e}")
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus coalescing ratio (share of requests served by another request's computation)"""
+        with self._lock:
+            ratio = self.coalesced / self.requests if self.requests else 0.0
+            return {
+                "requests": self.requests,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+                "coalescing_ratio": round(ratio, 4),
+            }
+
+
+def normalize_question(question: str) -> str:
+    """Normalization used for coalescing keys: case-insensitive, whitespace-collapsed, trailing punctuation ignored"""
+    return " ".join((question or "").lower().split()).rstrip("?!. ")
@@ -12,8 +12,15 @@ load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
 import streamlit as st
 import pandas as pd
 from rag_pipeline import FitScienceRAG
+from rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from coach_prompts import QUICK_QUESTIONS, study_prompt, quiz_prompts
+from learning_paths import LearningPathIndex, corpus_version
+from metrics import start_metrics_server
+from pipeline_logging import configure_logging
+from warmup import start_warmup
 import json
 import re
+import uuid
 from datetime import datetime
 
 def _parse_quiz_json(text):
@@ -142,6 +149,8 @@ if 'corpus_data' not in st.session_state:
     st.session_state.corpus_data = None
 if 'query_history' not in st.session_state:
     st.session_state.query_history = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # fair LLM scheduling across users
 if 'openai_api_key' not in st.session_state:
     st.session_state.openai_api_key = os.getenv("OPENAI_API_KEY", "")
 if 'groq_api_key' not in st.session_state:
@@ -203,9 +212,21 @@ def load_corpus_data():
         st.error(f"Error loading corpus: {e}")
         return None
 
+@st.cache_resource
+def load_learning_index(version, _corpus):
+    """Learning path index, shared by all sessions until the corpus changes"""
+    return LearningPathIndex(_corpus, version=version)
+
+def get_learning_index(corpus):
+    """This session's learning path index (the corpus is hashed once per session, not per rerun)"""
+    if st.session_state.get('learning_index') is None:
+        st.session_state.learning_index = load_learning_index(corpus_version(corpus), corpus)
+    return st.session_state.learning_index
+
 def initialize_rag_system():
     """Initialize the RAG system"""
     if st.session_state.rag_system is None:
+        # Waits on the shared warm-up rather than loading the model and index per session
         with st.spinner("🚀 Initializing FitScience Coach..."):
             rag = FitScienceRAG(
                 use_groq=st.session_state.use_groq,
@@ -226,6 +247,12 @@ def main():
     st.markdown('<h1 class="main-header">🏋️‍♀️ FitScience Coach</h1>', unsafe_allow_html=True)
     st.markdown('<p style="text-align: center; font-size: 1.2rem; color: #666;">Your Evidence-Based Fitness & Nutrition Portal</p>', unsafe_allow_html=True)
     
+    # Logging, Prometheus endpoint and shared model/index warm-up for the whole server process
+    # (all no-ops after the first script run)
+    configure_logging()
+    start_metrics_server()
+    start_warmup()
+    
     # Initialize systems
     if not initialize_rag_system():
         st.stop()
@@ -250,306 +277,20 @@ def main():
             if 'current_learning_path' not in st.session_state:
                 st.session_state.current_learning_path = []
             
+            # Learning paths → modules → lessons, indexed once per corpus version
+            learning_index = get_learning_index(st.session_state.corpus_data)
+            learning_paths = learning_index.paths
+            
             st.markdown("### 📊 Learning Dashboard")
             
-            # Overall Progress - Now calculated dynamically across all learning paths
-            overall_progress = st.session_state.get('overall_progress', 0.0)
+            # Overall Progress - completed lessons across all learning paths
+            overall_progress = learning_index.overall_progress(st.session_state.completed_modules)
+            st.session_state.overall_progress = overall_progress
             st.metric("Overall Progress", f"{overall_progress:.1f}%")
             st.progress(overall_progress / 100)
             
             st.markdown("### 🎯 Learning Paths")
             
-            # Function to calculate actual module count for a learning path
-            def calculate_module_count(path_name, corpus_data, path_topics=None):
-                # Filter data by learning path topics first (same as main content area)
-                if path_topics:
-                    path_data = corpus_data[
-                        corpus_data['Title'].str.contains('|'.join(path_topics), case=False, na=False) |
-                        corpus_data['Notes'].str.contains('|'.join(path_topics), case=False, na=False)
-                    ]
-                else:
-                    path_data = corpus_data
-                
-                if path_name == "🏋️‍♂️ Strength Training Fundamentals":
-                    # Training principles
-                    training_sources = path_data[
-                        (path_data['Title'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False))
-                    ]
-                    # Expert insights
-                    expert_sources = path_data[
-                        (path_data['Type'] == 'Podcast') & 
-                        (path_data['Title'].str.contains('Jeff Cavaliere|training|exercise|workout', case=False, na=False))
-                    ]
-                    # Government resources
-                    gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                    
-                    count = 0
-                    if len(training_sources) > 0: count += 1
-                    if len(expert_sources) > 0: count += 1
-                    if len(gov_sources) > 0: count += 1
-                    return count
-                    
-                elif path_name == "🥗 Sports Nutrition Mastery":
-                    # Protein sources
-                    protein_sources = path_data[
-                        (path_data['Title'].str.contains('protein|nutrition', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('protein|nutrition', case=False, na=False))
-                    ]
-                    # Supplement sources
-                    supplement_sources = path_data[
-                        (path_data['Title'].str.contains('supplement|micronutrient|vitamin', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('supplement|micronutrient|vitamin', case=False, na=False))
-                    ]
-                    # Government resources
-                    gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                    
-                    count = 0
-                    if len(protein_sources) > 0: count += 1
-                    if len(supplement_sources) > 0: count += 1
-                    if len(gov_sources) > 0: count += 1
-                    return count
-                    
-                elif path_name == "🔥 Metabolic Science":
-                    # BMR sources
-                    bmr_sources = path_data[
-                        (path_data['Title'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False))
-                    ]
-                    # NEAT sources
-                    neat_sources = path_data[
-                        (path_data['Title'].str.contains('NEAT|activity', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('NEAT|activity', case=False, na=False))
-                    ]
-                    # Government resources
-                    gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                    
-                    count = 0
-                    if len(bmr_sources) > 0: count += 1
-                    if len(neat_sources) > 0: count += 1
-                    if len(gov_sources) > 0: count += 1
-                    return count
-                    
-                elif path_name == "💤 Recovery & Performance":
-                    # Sleep sources
-                    sleep_sources = path_data[
-                        (path_data['Title'].str.contains('sleep|recovery|athletic performance', case=False, na=False)) |
-                        (path_data['Notes'].str.contains('sleep|recovery|athletic performance', case=False, na=False))
-                    ]
-                    # Performance sources
-                    performance_sources = path_data[
-                        (path_data['Type'] == 'Podcast') & 
-                        (path_data['Title'].str.contains('Dr. Peter Attia|performance|longevity', case=False, na=False))
-                    ]
-                    # Government resources
-                    gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                    
-                    count = 0
-                    if len(sleep_sources) > 0: count += 1
-                    if len(performance_sources) > 0: count += 1
-                    if len(gov_sources) > 0: count += 1
-                    return count
-                    
-                return 0
-            
-            # Define structured learning paths (like Coursera specializations)
-            learning_paths = {
-                "🏋️‍♂️ Strength Training Fundamentals": {
-                    "description": "Master the science of resistance training",
-                    "topics": ["progressive overload", "resistance training", "workout split", "training", "periodization"],
-                    "estimated_time": "2-3 hours",
-                    "difficulty": "Beginner to Intermediate"
-                },
-                "🥗 Sports Nutrition Mastery": {
-                    "description": "Evidence-based nutrition for athletes",
-                    "topics": ["protein", "nutrition", "dietary", "micronutrient", "supplement"],
-                    "estimated_time": "2-3 hours", 
-                    "difficulty": "Intermediate"
-                },
-                "🔥 Metabolic Science": {
-                    "description": "Understand energy systems and metabolism",
-                    "topics": ["BMR", "metabolic", "energy", "calorie", "NEAT"],
-                    "estimated_time": "2-3 hours",
-                    "difficulty": "Intermediate to Advanced"
-                },
-                "💤 Recovery & Performance": {
-                    "description": "Optimize sleep and athletic recovery",
-                    "topics": ["sleep", "recovery", "athletic performance"],
-                    "estimated_time": "1-2 hours",
-                    "difficulty": "Beginner"
-                }
-            }
-            
-            # Calculate module counts for each learning path
-            for path_name, path_info in learning_paths.items():
-                path_info["modules"] = calculate_module_count(path_name, st.session_state.corpus_data, path_info["topics"])
-            
-            # Function to calculate overall progress across all learning paths
-            def calculate_overall_progress():
-                """Calculate overall progress across all learning paths"""
-                total_lessons_all_paths = 0
-                completed_lessons_all_paths = 0
-                
-                for path_name, path_info in learning_paths.items():
-                    # Get path topics
-                    path_topics = path_info.get('topics', [])
-                    
-                    # Filter corpus data for this path
-                    if path_topics:
-                        path_data = st.session_state.corpus_data[
-                            st.session_state.corpus_data['Title'].str.contains('|'.join(path_topics), case=False, na=False) |
-                            st.session_state.corpus_data['Notes'].str.contains('|'.join(path_topics), case=False, na=False)
-                        ]
-                    else:
-                        path_data = st.session_state.corpus_data
-                    
-                    # Calculate modules and lessons for this path (same logic as main content)
-                    modules = {}
-                    if path_name == "🏋️‍♂️ Strength Training Fundamentals":
-                        # Training principles
-                        training_sources = path_data[
-                            (path_data['Title'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False))
-                        ]
-                        if len(training_sources) > 0:
-                            modules["Training Principles & Progression"] = {"sources": training_sources}
-                        
-                        # Expert insights
-                        expert_sources = path_data[
-                            (path_data['Type'] == 'Podcast') & 
-                            (path_data['Title'].str.contains('Jeff Cavaliere|training|exercise|workout', case=False, na=False))
-                        ]
-                        if len(expert_sources) > 0:
-                            modules["Expert Training Insights"] = {"sources": expert_sources}
-                        
-                        # Government resources
-                        gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                        if len(gov_sources) > 0:
-                            modules["Official Training Guidelines"] = {"sources": gov_sources}
-                    
-                    elif path_name == "🥗 Sports Nutrition Mastery":
-                        # Protein sources
-                        protein_sources = path_data[
-                            (path_data['Title'].str.contains('protein|nutrition', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('protein|nutrition', case=False, na=False))
-                        ]
-                        if len(protein_sources) > 0:
-                            modules["Protein & Nutrition Science"] = {"sources": protein_sources}
-                        
-                        # Supplement sources
-                        supplement_sources = path_data[
-                            (path_data['Title'].str.contains('supplement|micronutrient|vitamin', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('supplement|micronutrient|vitamin', case=False, na=False))
-                        ]
-                        if len(supplement_sources) > 0:
-                            modules["Evidence-Based Supplements"] = {"sources": supplement_sources}
-                        
-                        # Government resources
-                        gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                        if len(gov_sources) > 0:
-                            modules["Nutritional Guidelines"] = {"sources": gov_sources}
-                    
-                    elif path_name == "🔥 Metabolic Science":
-                        # BMR sources
-                        bmr_sources = path_data[
-                            (path_data['Title'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False))
-                        ]
-                        if len(bmr_sources) > 0:
-                            modules["Energy Systems & BMR"] = {"sources": bmr_sources}
-                        
-                        # NEAT sources
-                        neat_sources = path_data[
-                            (path_data['Title'].str.contains('NEAT|activity', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('NEAT|activity', case=False, na=False))
-                        ]
-                        if len(neat_sources) > 0:
-                            modules["Activity & NEAT"] = {"sources": neat_sources}
-                        
-                        # Government resources
-                        gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                        if len(gov_sources) > 0:
-                            modules["Metabolic Guidelines"] = {"sources": gov_sources}
-                    
-                    elif path_name == "💤 Recovery & Performance":
-                        # Sleep sources
-                        sleep_sources = path_data[
-                            (path_data['Title'].str.contains('sleep|recovery|athletic performance', case=False, na=False)) |
-                            (path_data['Notes'].str.contains('sleep|recovery|athletic performance', case=False, na=False))
-                        ]
-                        if len(sleep_sources) > 0:
-                            modules["Sleep & Recovery Science"] = {"sources": sleep_sources}
-                        
-                        # Performance sources
-                        performance_sources = path_data[
-                            (path_data['Type'] == 'Podcast') & 
-                            (path_data['Title'].str.contains('Dr. Peter Attia|performance|longevity', case=False, na=False))
-                        ]
-                        if len(performance_sources) > 0:
-                            modules["Performance Optimization"] = {"sources": performance_sources}
-                        
-                        # Government resources
-                        gov_sources = path_data[path_data['Type'] == 'Government Resource']
-                        if len(gov_sources) > 0:
-                            modules["Health Guidelines"] = {"sources": gov_sources}
-                    
-                    # Count lessons for this path
-                    path_lessons = sum(len(module_info['sources']) for module_info in modules.values())
-                    total_lessons_all_paths += path_lessons
-                
-                # Count completed lessons: build lesson ids per path (must match main content keys)
-                # Use same module keys as main content for consistency
-                def _build_path_modules(pname, pdata):
-                    m = {}
-                    if pname == "🏋️‍♂️ Strength Training Fundamentals":
-                        t = pdata[(pdata['Title'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False)) | (pdata['Notes'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False))]
-                        if len(t) > 0: m["💪 Module 1: Training Principles & Progression"] = {"sources": t}
-                        e = pdata[(pdata['Type'] == 'Podcast') & (pdata['Title'].str.contains('Jeff Cavaliere|training|exercise|workout', case=False, na=False))]
-                        if len(e) > 0: m["🏋️‍♂️ Module 2: Expert Training Insights"] = {"sources": e}
-                        g = pdata[pdata['Type'] == 'Government Resource']
-                        if len(g) > 0: m["📚 Module 3: Beginner Program Design"] = {"sources": g}
-                    elif pname == "🥗 Sports Nutrition Mastery":
-                        pr = pdata[(pdata['Title'].str.contains('protein|nutrition', case=False, na=False)) | (pdata['Notes'].str.contains('protein|nutrition', case=False, na=False))]
-                        if len(pr) > 0: m["🥩 Module 1: Protein Science & Requirements"] = {"sources": pr}
-                        s = pdata[(pdata['Title'].str.contains('supplement|micronutrient|vitamin', case=False, na=False)) | (pdata['Notes'].str.contains('supplement|micronutrient|vitamin', case=False, na=False))]
-                        if len(s) > 0: m["💊 Module 2: Supplement Evidence & Micronutrients"] = {"sources": s}
-                        g = pdata[pdata['Type'] == 'Government Resource']
-                        if len(g) > 0: m["🍽️ Module 3: Practical Nutrition Tools"] = {"sources": g}
-                    elif pname == "🔥 Metabolic Science":
-                        b = pdata[(pdata['Title'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False)) | (pdata['Notes'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False))]
-                        if len(b) > 0: m["⚡ Module 1: Energy Systems & BMR"] = {"sources": b}
-                        n = pdata[(pdata['Title'].str.contains('NEAT|activity', case=False, na=False)) | (pdata['Notes'].str.contains('NEAT|activity', case=False, na=False))]
-                        if len(n) > 0: m["🏃‍♂️ Module 2: NEAT & Activity Optimization"] = {"sources": n}
-                        g = pdata[pdata['Type'] == 'Government Resource']
-                        if len(g) > 0: m["📊 Module 3: Metabolic Calculations & Tools"] = {"sources": g}
-                    elif pname == "💤 Recovery & Performance":
-                        sl = pdata[(pdata['Title'].str.contains('sleep|recovery|athletic performance', case=False, na=False)) | (pdata['Notes'].str.contains('sleep|recovery|athletic performance', case=False, na=False))]
-                        if len(sl) > 0: m["😴 Module 1: Sleep Science & Recovery"] = {"sources": sl}
-                        pe = pdata[(pdata['Type'] == 'Podcast') & (pdata['Title'].str.contains('Dr. Peter Attia|performance|longevity', case=False, na=False))]
-                        if len(pe) > 0: m["🧠 Module 2: Performance Optimization Insights"] = {"sources": pe}
-                        g = pdata[pdata['Type'] == 'Government Resource']
-                        if len(g) > 0: m["🏥 Module 3: Health & Recovery Guidelines"] = {"sources": g}
-                    return m
-                all_lesson_ids = set()
-                for pname, pinfo in learning_paths.items():
-                    pt = pinfo.get('topics', [])
-                    pd = st.session_state.corpus_data[(st.session_state.corpus_data['Title'].str.contains('|'.join(pt), case=False, na=False)) | (st.session_state.corpus_data['Notes'].str.contains('|'.join(pt), case=False, na=False))] if pt else st.session_state.corpus_data
-                    pm = _build_path_modules(pname, pd)
-                    pm = {k: v for k, v in pm.items() if len(v['sources']) > 0}
-                    for mid, minfo in pm.items():
-                        for i in range(1, len(minfo['sources']) + 1):
-                            all_lesson_ids.add(f"{mid}_lesson_{i}")
-                completed_lessons_all_paths = len([l for l in st.session_state.completed_modules if l in all_lesson_ids])
-                
-                if total_lessons_all_paths > 0:
-                    return (completed_lessons_all_paths / total_lessons_all_paths) * 100
-                else:
-                    return 0.0
-            
-            # Calculate overall progress and store in session state
-            overall_progress = calculate_overall_progress()
-            st.session_state.overall_progress = overall_progress
-            
             # Learning path selection - switch to Courses tab when path changes
             def _on_path_change():
                 st.session_state.active_tab = "courses"
@@ -563,7 +304,7 @@ def main():
             if selected_path:
                 path_info = learning_paths[selected_path]
                 st.markdown(f"**{path_info['description']}**")
-                st.markdown(f"📚 {path_info['modules']} modules")
+                st.markdown(f"📚 {learning_index.module_count(selected_path)} modules")
                 st.markdown(f"⏱️ {path_info['estimated_time']}")
                 st.markdown(f"📈 {path_info['difficulty']}")
             
@@ -572,14 +313,19 @@ def main():
         # LLM Settings - no user input needed; host configures .env
         st.subheader("🔑 LLM Settings")
         rag = st.session_state.rag_system
-        has_llm = rag and rag.llm in ("groq", "openai")
+        has_llm = rag and rag.llm is not None
         if has_llm:
-            st.success("🦙 Groq Llama ready — AI answers enabled")
+            primary = rag.backends[0]
+            st.success(f"{primary.icon} {primary.label} ready — AI answers enabled")
         elif st.session_state.groq_api_key:
             st.warning("Key set but LLM not ready. Run: pip install langchain-groq, then restart")
         else:
             st.warning("Host: Add GROQ_API_KEY to .env, then restart app")
         st.session_state.use_groq = True
+        flight_stats = FitScienceRAG.coalescing_stats()
+        if flight_stats["requests"]:
+            st.caption(f"🔗 Shared answers: {flight_stats['coalesced']}/{flight_stats['requests']} "
+                       f"requests ({flight_stats['coalescing_ratio']:.0%} coalesced)")
         
         if st.session_state.corpus_data is not None:
             # Corpus statistics
@@ -628,123 +374,12 @@ def main():
             # Main Learning Interface (Khan Academy/Coursera style)
             if selected_path:
                 path_info = learning_paths[selected_path]
-                path_topics = path_info['topics']
                 
-                # Filter sources for this learning path
-                path_data = st.session_state.corpus_data[
-                    st.session_state.corpus_data['Title'].str.contains('|'.join(path_topics), case=False, na=False) |
-                    st.session_state.corpus_data['Notes'].str.contains('|'.join(path_topics), case=False, na=False)
-                ]
-                
-                # Group sources into structured learning modules based on learning path
-                modules = {}
-                
-                if selected_path == "🏋️‍♂️ Strength Training Fundamentals":
-                    modules = {
-                        "💪 Module 1: Training Principles & Progression": {
-                            "description": "Master fundamental training concepts and progressive overload",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('progressive overload|resistance training|periodization|training volume', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Understand progressive overload principles", "Design training progression", "Apply periodization concepts"]
-                        },
-                        "🏋️‍♂️ Module 2: Expert Training Insights": {
-                            "description": "Learn from strength training experts and practitioners",
-                            "sources": path_data[
-                                (path_data['Type'] == 'Podcast') & 
-                                (path_data['Title'].str.contains('Jeff Cavaliere|training|exercise|workout', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Gain expert training insights", "Learn practical programming", "Understand exercise selection"]
-                        },
-                        "📚 Module 3: Beginner Program Design": {
-                            "description": "Apply structured training programs for beginners",
-                            "sources": path_data[path_data['Type'] == 'Government Resource'],
-                            "learning_objectives": ["Design beginner programs", "Implement safe progression", "Apply structured training"]
-                        }
-                    }
-                
-                elif selected_path == "🥗 Sports Nutrition Mastery":
-                    modules = {
-                        "🥩 Module 1: Protein Science & Requirements": {
-                            "description": "Master protein needs for athletic performance",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('protein|nutrition', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('protein|nutrition', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Calculate protein requirements", "Understand protein timing", "Apply protein strategies"]
-                        },
-                        "💊 Module 2: Supplement Evidence & Micronutrients": {
-                            "description": "Navigate supplements and micronutrient needs",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('supplement|micronutrient|vitamin', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('supplement|micronutrient|vitamin', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Evaluate supplement evidence", "Understand micronutrient needs", "Apply supplementation strategies"]
-                        },
-                        "🍽️ Module 3: Practical Nutrition Tools": {
-                            "description": "Use official tools for meal planning and calorie targets",
-                            "sources": path_data[path_data['Type'] == 'Government Resource'],
-                            "learning_objectives": ["Plan balanced meals", "Calculate calorie needs", "Apply dietary guidelines"]
-                        }
-                    }
-                
-                elif selected_path == "🔥 Metabolic Science":
-                    modules = {
-                        "⚡ Module 1: Energy Systems & BMR": {
-                            "description": "Understand metabolic rate and energy expenditure",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('BMR|metabolic|energy|calorie', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Calculate BMR accurately", "Understand energy systems", "Apply metabolic principles"]
-                        },
-                        "🏃‍♂️ Module 2: NEAT & Activity Optimization": {
-                            "description": "Optimize daily activity and energy expenditure",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('NEAT|activity', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('NEAT|activity', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Understand NEAT principles", "Optimize daily activity", "Track energy expenditure"]
-                        },
-                        "📊 Module 3: Metabolic Calculations & Tools": {
-                            "description": "Apply practical metabolic calculations and tools",
-                            "sources": path_data[path_data['Type'] == 'Government Resource'],
-                            "learning_objectives": ["Use metabolic calculators", "Apply energy balance", "Implement tracking methods"]
-                        }
-                    }
-                
-                elif selected_path == "💤 Recovery & Performance":
-                    modules = {
-                        "😴 Module 1: Sleep Science & Recovery": {
-                            "description": "Understand sleep's role in athletic performance",
-                            "sources": path_data[
-                                (path_data['Title'].str.contains('sleep|recovery|athletic performance', case=False, na=False)) |
-                                (path_data['Notes'].str.contains('sleep|recovery|athletic performance', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Understand sleep physiology", "Optimize recovery protocols", "Apply sleep strategies"]
-                        },
-                        "🧠 Module 2: Performance Optimization Insights": {
-                            "description": "Learn from performance and longevity experts",
-                            "sources": path_data[
-                                (path_data['Type'] == 'Podcast') & 
-                                (path_data['Title'].str.contains('Dr. Peter Attia|performance|longevity', case=False, na=False))
-                            ],
-                            "learning_objectives": ["Understand performance optimization", "Learn longevity protocols", "Apply recovery strategies"]
-                        },
-                        "🏥 Module 3: Health & Recovery Guidelines": {
-                            "description": "Apply evidence-based health and recovery guidelines",
-                            "sources": path_data[path_data['Type'] == 'Government Resource'],
-                            "learning_objectives": ["Follow health guidelines", "Implement recovery protocols", "Apply wellness practices"]
-                        }
-                    }
-                
-                # Filter out empty modules and update module count in learning path info
-                modules = {k: v for k, v in modules.items() if len(v['sources']) > 0}
-                
-                # Update the module count in learning_paths to reflect actual modules
-                if selected_path in learning_paths:
-                    learning_paths[selected_path]["modules"] = len(modules)
+                # Structured learning modules of this path (non-empty only), with their source rows
+                modules = {
+                    module_id: dict(module, sources=learning_index.sources(selected_path, module_id))
+                    for module_id, module in learning_index.modules(selected_path).items()
+                }
                 
                 # Learning Path Header (Coursera style) - NOW WITH ACCURATE MODULE COUNT
                 actual_module_count = len(modules)
@@ -764,22 +399,15 @@ def main():
                 st.markdown("### 📊 Learning Analytics")
                 col1, col2, col3, col4 = st.columns(4)
                 
-                # Build set of lesson ids for current path (for accurate counting)
-                current_lesson_ids = set()
-                for mid, minfo in modules.items():
-                    for idx in range(1, len(minfo['sources']) + 1):
-                        current_lesson_ids.add(f"{mid}_lesson_{idx}")
+                # Lesson ids of the current path (for accurate counting)
+                current_lesson_ids = learning_index.lesson_ids(selected_path)
                 
                 # Completed lessons: only count those in current path
-                completed_lessons = len([l for l in st.session_state.completed_modules if l in current_lesson_ids])
+                completed_lessons = len(current_lesson_ids.intersection(st.session_state.completed_modules))
                 total_lessons = len(current_lesson_ids)
                 
                 # Completed modules: a module is done when ALL its lessons are completed
-                completed_modules_count = 0
-                for mid, minfo in modules.items():
-                    lesson_ids = [f"{mid}_lesson_{i}" for i in range(1, len(minfo['sources']) + 1)]
-                    if all(lid in st.session_state.completed_modules for lid in lesson_ids):
-                        completed_modules_count += 1
+                completed_modules_count = len(learning_index.completed_modules(selected_path, st.session_state.completed_modules))
                 total_modules_count = len(modules)
                 
                 with col1:
@@ -832,14 +460,14 @@ def main():
                             
                             # Individual lessons (sources)
                             for idx, (_, source) in enumerate(module_info['sources'].iterrows(), 1):
-                                lesson_id = f"{module_id}_lesson_{idx}"
+                                lesson_id = module_info['lesson_ids'][idx - 1]
                                 # Auto-complete when Study + Quiz both done (no manual Complete button)
                                 study_done = f"study_result_{lesson_id}" in st.session_state
                                 quiz_done = st.session_state.get(f"quiz_passed_{lesson_id}", False)
                                 if study_done and quiz_done and lesson_id not in st.session_state.completed_modules:
                                     st.session_state.completed_modules.add(lesson_id)
                                     # Mark module complete when all its lessons are done
-                                    lesson_ids_in_module = [f"{module_id}_lesson_{i}" for i in range(1, len(module_info['sources']) + 1)]
+                                    lesson_ids_in_module = module_info['lesson_ids']
                                     if all(lid in st.session_state.completed_modules for lid in lesson_ids_in_module):
                                         st.session_state.completed_modules.add(module_id)
                                     st.rerun()
@@ -866,13 +494,21 @@ def main():
                                 with col2:
                                     if st.button("💡 Study", key=f"study_{lesson_id}"):
                                         # Store study result in session state
-                                        study_question = f"""Create a comprehensive study guide for: {source['Title']}
-Do NOT add inline citations (e.g. "Source: [1]..." or "(Source: Morton et al.)") after each learning point—the user is already studying this specific paper. Present learning points and key takeaways cleanly. You may list sources at the end only."""
+                                        study_question = study_prompt(source['Title'])
                                         with st.spinner("Generating study content..."):
                                             try:
-                                                study_result = st.session_state.rag_system.query(study_question)
-                                                if "error" not in study_result:
+                                                study_result = st.session_state.rag_system.query(
+                                                    study_question,
+                                                    session_id=st.session_state.session_id,
+                                                    priority=PRIORITY_BACKGROUND
+                                                )
+                                                if "retry_after" in study_result:
+                                                    # Not a study guide: keep the lesson unstudied and show the wait
+                                                    st.session_state[f"study_error_{lesson_id}"] = f"⏳ The coach is at its free-tier limit. Please try again in ~{study_result['retry_after']:.0f}s."
+                                                    st.rerun()
+                                                elif "error" not in study_result:
                                                     st.session_state[f"study_result_{lesson_id}"] = study_result['answer']
+                                                    st.session_state.pop(f"study_error_{lesson_id}", None)
                                                     st.rerun()
                                                 else:
                                                     st.session_state[f"study_result_{lesson_id}"] = f"❌ Error generating study guide: {study_result['error']}"
@@ -883,20 +519,18 @@ Do NOT add inline citations (e.g. "Source: [1]..." or "(Source: Morton et al.)")
                                 
                                 with col3:
                                     if st.button("🧠 Quiz", key=f"quiz_{lesson_id}"):
-                                        quiz_prompts = [
-                                            f"""Create 3 multiple choice quiz questions about: {source['Title']}. Use ONLY the knowledge base. Return ONLY this exact JSON format, no other text:
-[{{"question": "First question?", "options": ["Choice A", "Choice B", "Choice C"], "correct_index": 0}}, {{"question": "Second?", "options": ["A", "B", "C"], "correct_index": 1}}, {{"question": "Third?", "options": ["X", "Y", "Z"], "correct_index": 2}}]
-correct_index is 0 for first option, 1 for second, etc.""",
-                                            f"""Write 3 quiz questions about {source['Title']} in this exact format:
-1. Question one? a) Option A b) Option B c) Option C. Answer: a
-2. Question two? a) X b) Y c) Z. Answer: b
-3. Question three? a) P b) Q c) R. Answer: c"""
-                                        ]
+                                        quiz_prompt_list = quiz_prompts(source['Title'])
                                         with st.spinner("Generating quiz..."):
                                             try:
                                                 parsed = None
-                                                for prompt in quiz_prompts:
-                                                    quiz_result = st.session_state.rag_system.query(prompt)
+                                                for prompt in quiz_prompt_list:
+                                                    quiz_result = st.session_state.rag_system.query(
+                                                        prompt,
+                                                        session_id=st.session_state.session_id,
+                                                        priority=PRIORITY_BACKGROUND
+                                                    )
+                                                    if "retry_after" in quiz_result:
+                                                        break
                                                     if "error" not in quiz_result:
                                                         parsed = _parse_quiz_json(quiz_result['answer'])
                                                         if parsed:
@@ -911,6 +545,9 @@ correct_index is 0 for first option, 1 for second, etc.""",
                                                         del st.session_state[f"quiz_error_{lesson_id}"]
                                                     st.session_state[f"study_toggle_{lesson_id}"] = False  # hide study guide during quiz
                                                     st.rerun()
+                                                elif "retry_after" in quiz_result:
+                                                    st.session_state[f"quiz_error_{lesson_id}"] = f"⏳ The coach is at its free-tier limit. Please try again in ~{quiz_result['retry_after']:.0f}s."
+                                                    st.rerun()
                                                 else:
                                                     st.session_state[f"quiz_error_{lesson_id}"] = "Could not parse quiz format. Please try again."
                                                     st.rerun()
@@ -1030,6 +667,8 @@ correct_index is 0 for first option, 1 for second, etc.""",
                                                 qs["submitted"] = True
                                                 st.rerun()
                                 
+                                if f"study_error_{lesson_id}" in st.session_state:
+                                    st.warning(st.session_state[f"study_error_{lesson_id}"])
                                 if f"quiz_error_{lesson_id}" in st.session_state:
                                     st.error(st.session_state[f"quiz_error_{lesson_id}"])
                                 
@@ -1118,6 +757,8 @@ correct_index is 0 for first option, 1 for second, etc.""",
             with col2:
                 ask_button = st.form_submit_button("🤖 Ask Coach", type="primary", use_container_width=True)
         
+        show_timings = st.toggle("⏱️ Show timing breakdown", value=False, key="show_timings")
+        
         # Process the question if button was clicked or Enter was pressed
         if ask_button and question.strip():
             # Clear the selected question after form submission
@@ -1125,7 +766,14 @@ correct_index is 0 for first option, 1 for second, etc.""",
                 del st.session_state.selected_quick_question
             
             with st.spinner("🔍 Searching knowledge base..."):
-                result = st.session_state.rag_system.query(question.strip())
+                result = st.session_state.rag_system.query(
+                    question.strip(),
+                    session_id=st.session_state.session_id,
+                    priority=PRIORITY_INTERACTIVE
+                )
+            
+            if "retry_after" in result:
+                st.warning(f"⏳ The coach is at its free-tier limit. Estimated wait: ~{result['retry_after']:.0f}s")
             
             if "error" not in result:
                 # Display answer with green styling
@@ -1151,6 +799,15 @@ correct_index is 0 for first option, 1 for second, etc.""",
                         else:
                             st.markdown(f"{i}. **{source['title']}**")
                 
+                # Per-stage latency, provider and token usage for this answer
+                if show_timings and result.get('timings'):
+                    timings = result['timings']
+                    stages = " · ".join(f"{stage} {ms:.0f} ms" for stage, ms in timings.items() if stage != 'total')
+                    usage = result.get('usage') or {}
+                    tokens = f" · ~{usage['prompt_tokens']} prompt / ~{usage['completion_tokens']} completion tokens" if usage else ""
+                    shared = " · shared with an identical in-flight question" if result.get('coalesced') else ""
+                    st.caption(f"⏱️ {timings['total']:.0f} ms total ({stages}) · provider: {result.get('provider') or 'n/a'}{tokens}{shared}")
+                
                 # Save to history
                 st.session_state.query_history.append({
                     'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -1164,14 +821,7 @@ correct_index is 0 for first option, 1 for second, etc.""",
         
         # Quick question buttons
         st.markdown("**💡 Quick Questions:**")
-        quick_questions = [
-            "How much protein should I eat daily?",
-            "What is progressive overload in training?",
-            "What supplements are evidence-based?",
-            "How much sleep do I need for recovery?",
-            "What's the best workout split for beginners?",
-            "How do I calculate my daily calorie needs?"
-        ]
+        quick_questions = QUICK_QUESTIONS
         
         col1, col2, col3 = st.columns(3)
         for i, q in enumerate(quick_questions):
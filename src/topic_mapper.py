@@ -0,0 +1,152 @@
+"""
+FitScience Coach - Topic Mapper
+Declarative keyword → content-template rules for create_synthetic_content, matched in one pass
+
+Every rule has an explicit priority (lower wins); a title gets the template of the best-priority
+rule with a keyword in it (case-insensitive substring), else DEFAULT_TEMPLATE. All keywords are
+compiled into one Aho-Corasick automaton, so a title is scanned once however many rules there are
+and a whole corpus classifies in time linear in its text:
+
+    TOPIC_MAPPER.template_for("ISSN Position Stand: Protein and Exercise")   # "protein_requirements"
+    keys, hits = TOPIC_MAPPER.classify_all(titles)                             # bulk, with rule hit counts
+    TOPIC_MAPPER.unreachable()                                                 # keywords that can never win
+
+    python src/topic_mapper.py data/learning_corpus.csv
+
+A keyword is unreachable when a keyword of a higher-priority rule is a substring of it: every
+title containing it is already claimed (e.g. the second "metabolic", or "best workout" after
+"workout").
+"""
+
+import sys
+import argparse
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+DEFAULT_TEMPLATE = "training_progression"  # safer generic content for unmatched sources
+
+# Priorities follow the original if/elif chain in create_synthetic_content
+TOPIC_RULES: List[Dict[str, Any]] = [
+    {"priority": 1, "template": "protein_requirements", "keywords": ["protein"]},
+    {"priority": 2, "template": "bmr_calculation", "keywords": ["bmr", "metabolic"]},
+    {"priority": 3, "template": "training_progression", "keywords": ["training", "workout", "progressive", "resistance"]},
+    {"priority": 4, "template": "workout_splits", "keywords": ["split", "best workout"]},
+    {"priority": 5, "template": "micronutrients", "keywords": ["micronutrient", "vitamin", "supplement"]},
+    {"priority": 6, "template": "omega3_supplements", "keywords": ["omega", "fish oil"]},
+    {"priority": 7, "template": "neat_activity", "keywords": ["neat", "activity"]},
+    {"priority": 8, "template": "sleep_recovery", "keywords": ["sleep"]},
+    {"priority": 9, "template": "bmr_calculation", "keywords": ["energy", "calorie", "balance"]},
+    {"priority": 10, "template": "training_progression", "keywords": ["periodization"]},
+    {"priority": 11, "template": "protein_requirements", "keywords": ["nutrition", "performance"]},
+    {"priority": 12, "template": "workout_splits", "keywords": ["cavaliere", "athlean"]},
+    {"priority": 13, "template": "bmr_calculation", "keywords": ["jamnadas", "visceral", "fat"]},
+    {"priority": 14, "template": "training_progression", "keywords": ["attia", "longevity"]},
+    {"priority": 15, "template": "micronutrients", "keywords": ["probiotic", "metabolic"]},
+    {"priority": 16, "template": "micronutrients", "keywords": ["myplate", "nhs", "nih"]},
+]
+
+
+class TopicMapper:
+    """Aho-Corasick matcher over all rule keywords; the best-priority matching rule wins"""
+
+    def __init__(self, rules: List[Dict[str, Any]] = None, default: str = DEFAULT_TEMPLATE):
+        self.rules = sorted(rules or TOPIC_RULES, key=lambda rule: rule["priority"])
+        self.default = default
+        # Trie: per state its goto dict and the best (lowest) rule index of a keyword ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[int] = [len(self.rules)]
+        for index, rule in enumerate(self.rules):
+            for keyword in rule["keywords"]:
+                state = 0
+                for ch in keyword.lower():
+                    if ch not in self._goto[state]:
+                        self._goto.append({})
+                        self._best.append(len(self.rules))
+                        self._goto[state][ch] = len(self._goto) - 1
+                    state = self._goto[state][ch]
+                self._best[state] = min(self._best[state], index)
+        # Compile failure links into a full transition table (a DFA): scanning is then one dict
+        # lookup per character, with no failure-link walks at match time
+        fail = [0] * len(self._goto)
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:  # breadth-first, so a state's failure target is complete before its children
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[fail[state]], **self._goto[state]}
+            for ch, child in self._goto[state].items():
+                fail[child] = self._delta[fail[state]].get(ch, 0)
+                # A state also reports every keyword that ends on its failure chain
+                self._best[child] = min(self._best[child], self._best[fail[child]])
+                queue.append(child)
+
+    def rule_for(self, text: str) -> int:
+        """Index into self.rules of the winning rule, or -1 when none matches"""
+        state, best = 0, len(self.rules)
+        delta, best_at = self._delta, self._best
+        for ch in text.lower():
+            state = delta[state].get(ch, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break  # nothing outranks the first rule
+        return best if best < len(self.rules) else -1
+
+    def template_for(self, text: str) -> str:
+        index = self.rule_for(text)
+        return self.rules[index]["template"] if index >= 0 else self.default
+
+    def classify_all(self, texts: Iterable[str]) -> Tuple[List[str], Counter]:
+        """Template per text, and how often each rule won ("priority N: template", or "default")"""
+        keys, hits = [], Counter()
+        for text in texts:
+            index = self.rule_for(text or "")
+            if index >= 0:
+                keys.append(self.rules[index]["template"])
+                hits[f"priority {self.rules[index]['priority']}: {self.rules[index]['template']}"] += 1
+            else:
+                keys.append(self.default)
+                hits["default"] += 1
+        return keys, hits
+
+    def unreachable(self) -> List[Dict[str, Any]]:
+        """Keywords that never decide a match because a higher-priority keyword is inside them"""
+        dead, earlier = [], []
+        for rule in self.rules:
+            for keyword in rule["keywords"]:
+                shadow = next((k for p, k in earlier if p < rule["priority"] and k in keyword.lower()), None)
+                if shadow is not None:
+                    dead.append({"priority": rule["priority"], "template": rule["template"],
+                                 "keyword": keyword, "shadowed_by": shadow})
+            earlier.extend((rule["priority"], k.lower()) for k in rule["keywords"])
+        return dead
+
+
+TOPIC_MAPPER = TopicMapper()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify corpus titles into content templates")
+    parser.add_argument("corpus", nargs="?", default="data/learning_corpus.csv", help="CSV with a Title column")
+    args = parser.parse_args()
+
+    import pandas as pd
+    titles = pd.read_csv(args.corpus)["Title"].fillna("").tolist()
+    keys, hits = TOPIC_MAPPER.classify_all(titles)
+    print(f"🗂️ {len(titles)} titles → {len(set(keys))} templates")
+    for rule in TOPIC_MAPPER.rules:
+        label = f"priority {rule['priority']}: {rule['template']}"
+        print(f"{hits.get(label, 0):>6}  {label:40} {', '.join(rule['keywords'])}")
+    print(f"{hits.get('default', 0):>6}  default: {TOPIC_MAPPER.default}")
+    dead = TOPIC_MAPPER.unreachable()
+    for row in dead:
+        print(f"⚠️ Unreachable: '{row['keyword']}' (priority {row['priority']}) is shadowed by '{row['shadowed_by']}'")
+    dead_keywords = {(row["priority"], row["keyword"]) for row in dead}
+    for rule in TOPIC_MAPPER.rules:
+        if any((rule["priority"], k) not in dead_keywords for k in rule["keywords"]):
+            continue
+        print(f"❌ Rule priority {rule['priority']} ({rule['template']}) can never match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+FitScience Coach - Background Warm-Up
+Loads the embedding model, runs one dummy encode and builds the FAISS index on a background
+thread when the server process starts, and exposes readiness
+
+Every FitScienceRAG in the process adopts the warmed corpus, embeddings and index in
+initialize_system() instead of building its own, so sessions that arrive during warm-up wait
+on the one shared build and later sessions are ready immediately.
+
+    from warmup import start_warmup, readiness
+    start_warmup()          # idempotent; call at process start
+    readiness()             # {"state": "warming", "stages": {...}, ...}
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+from metrics import REGISTRY, StageTimer
+from pipeline_logging import get_logger
+
+log = get_logger("warmup")
+
+PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+WARMUP_SECONDS = REGISTRY.gauge("fitscience_warmup_seconds", "Duration of each background warm-up stage")
+
+
+class WarmUp:
+    """One background build of the resources every session shares (read-only after READY)"""
+
+    def __init__(self, csv_path: str = "data/learning_corpus.csv"):
+        self.csv_path = csv_path
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.corpus_metadata: List[Dict[str, Any]] = []
+        self.embeddings = None
+        self.vectorstore = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "WarmUp":
+        if self._thread is None:
+            self.state = WARMING
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="fitscience-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        from rag_pipeline import FitScienceRAG  # imported here: rag_pipeline itself imports this module
+        timer = StageTimer()
+        try:
+            log.info("🔥 Warming up embedding model and index in the background...")
+            builder = FitScienceRAG(use_groq=False)
+            with timer.stage("load_corpus"):
+                if builder.load_corpus_from_csv(self.csv_path) is None:
+                    raise RuntimeError(f"could not load corpus {self.csv_path}")
+            with timer.stage("embedding_model"):
+                embeddings = builder.embeddings
+            with timer.stage("dummy_encode"):
+                embeddings.embed_query("How much protein should I eat?")
+            with timer.stage("chunk"):
+                documents = builder.create_synthetic_content()
+            with timer.stage("vectorstore"):
+                if not builder.build_vectorstore(documents):
+                    raise RuntimeError("vector store build failed")
+            self.corpus_metadata = builder.corpus_metadata
+            self.embeddings = embeddings
+            self.vectorstore = builder.vectorstore
+            self.state = READY
+            log.info("✅ Warm-up complete", seconds=round(timer.total(), 2))
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            log.error("❌ Warm-up failed; sessions will build their own index", error=self.error)
+        finally:
+            self.stages = dict(timer.stages)
+            for stage, seconds in self.stages.items():
+                WARMUP_SECONDS.set(seconds, stage=stage)
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until warm-up finishes (or timeout); True only if the shared resources are usable"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "elapsed_s": round(elapsed if not self._done.is_set() else sum(self.stages.values()), 2),
+            "stages": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+            "error": self.error,
+        }
+
+
+_warmup: Optional[WarmUp] = None
+_warmup_lock = threading.Lock()
+
+
+def start_warmup(csv_path: str = "data/learning_corpus.csv") -> WarmUp:
+    """Start the process-wide warm-up once; later calls return the same instance"""
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = WarmUp(csv_path).start()
+        return _warmup
+
+
+def current_warmup() -> Optional[WarmUp]:
+    return _warmup
+
+
+def readiness() -> Dict[str, Any]:
+    """Readiness of this process: warm-up status, or 'pending' when no warm-up was started"""
+    return _warmup.status() if _warmup is not None else {"state": PENDING, "ready": False}
+
+
+REGISTRY.gauge("fitscience_ready", "1 once the background warm-up has finished successfully",
+               fn=lambda: 1.0 if _warmup is not None and _warmup.ready else 0.0)
@@ -0,0 +1,209 @@
+import threading
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, FairRequestQueue, RateLimitExceeded, TokenBucket,
+    retry_after_from_error,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+
+class GateLimiter:
+    """Admits exactly `grants` requests, then makes everybody wait until the test opens it again"""
+
+    def __init__(self):
+        self.grants = 0
+
+    def time_until(self, tokens, now=None):
+        return 0.0 if self.grants else 0.01
+
+    def consume(self, tokens, now=None):
+        self.grants -= 1
+
+    def estimate_wait(self, requests_ahead, tokens_ahead):
+        return 0.01
+
+
+def grant_order(queue, limiter, requests, timeout=5.0):
+    """Queue (session, priority) requests in list order, then admit them one at a time; returns sessions served"""
+    served, threads = [], []
+
+    def worker(session, priority):
+        queue.acquire(10, session_id=session, priority=priority)
+        served.append(session)
+
+    for session, priority in requests:
+        thread = threading.Thread(target=worker, args=(session, priority), daemon=True)
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + timeout
+        while len(queue._waiting) < len(threads):
+            assert time.monotonic() < deadline, "request never queued"
+            time.sleep(0.001)
+    for expected in range(1, len(requests) + 1):
+        with queue._cond:
+            limiter.grants = 1
+            queue._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        while len(served) < expected:
+            assert time.monotonic() < deadline, "request never admitted"
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(timeout)
+    return served
+
+
+# ---------------------------------------------------------------------
+# TokenBucket
+# ---------------------------------------------------------------------
+def test_bucket_starts_full_and_refills_linearly(clock):
+    bucket = TokenBucket(60, period=60.0)  # one token per second
+    assert bucket.time_until(60, clock.now) == 0.0
+    bucket.consume(60, clock.now)
+    assert bucket.time_until(1, clock.now) == pytest.approx(1.0)
+    assert bucket.time_until(10, clock.now) == pytest.approx(10.0)
+    assert bucket.time_until(10, clock.now + 4) == pytest.approx(6.0)
+    assert bucket.time_until(10, clock.now + 10) == 0.0
+
+
+def test_bucket_caps_refill_at_capacity(clock):
+    bucket = TokenBucket(5, period=5.0)
+    bucket.consume(5, clock.now)
+    bucket.time_until(1, clock.now + 1000)
+    assert bucket.tokens == pytest.approx(5.0)
+
+
+def test_oversized_request_is_admitted_once_the_bucket_is_full(clock):
+    bucket = TokenBucket(100, period=60.0)
+    assert bucket.time_until(500, clock.now) == 0.0
+    bucket.consume(500, clock.now)
+    assert bucket.tokens == pytest.approx(0.0)
+
+
+def test_drain_delays_the_next_token_by_the_retry_after(clock):
+    bucket = TokenBucket(60, period=60.0)
+    bucket.drain(10, clock.now)
+    assert bucket.time_until(1, clock.now) == pytest.approx(11.0)
+    assert bucket.time_until(1, clock.now + 11) == 0.0
+
+
+def test_limiter_waits_for_the_scarcer_budget(clock):
+    limiter = rate_limiter.GroqRateLimiter(rpm=60, tpm=600)
+    limiter.consume(600, clock.now)
+    assert limiter.time_until(300, clock.now) == pytest.approx(30.0)
+    limiter.penalize(20)
+    assert limiter.time_until(1, clock.now) >= 20.0
+
+
+# ---------------------------------------------------------------------
+# FairRequestQueue
+# ---------------------------------------------------------------------
+def test_least_served_session_goes_first(clock):
+    limiter = GateLimiter()
+    queue = FairRequestQueue(limiter)
+    limiter.grants = 2
+    queue.acquire(10, session_id="heavy")
+    queue.acquire(10, session_id="heavy")
+    assert grant_order(queue, limiter, [("heavy", PRIORITY_BACKGROUND), ("light", PRIORITY_BACKGROUND)]) == \
+        ["light", "heavy"]
+
+
+def test_interactive_requests_go_before_background(clock):
+    limiter = GateLimiter()
+    queue = FairRequestQueue(limiter)
+    order = grant_order(queue, limiter, [("a", PRIORITY_BACKGROUND), ("b", PRIORITY_BACKGROUND),
+                                         ("c", PRIORITY_INTERACTIVE)])
+    assert order == ["c", "a", "b"]
+
+
+def test_grants_older_than_the_window_stop_counting(clock):
+    limiter = GateLimiter()
+    queue = FairRequestQueue(limiter)
+    limiter.grants = 3
+    for session in ("heavy", "heavy", "light"):
+        queue.acquire(10, session_id=session)
+    assert queue._served == {"heavy": 2, "light": 1}
+
+    clock.now += queue.FAIRNESS_WINDOW + 1
+    queue.estimate_wait(10)
+    assert queue._served == {} and not queue._grants
+    # With the history forgotten, arrival order decides again
+    assert grant_order(queue, limiter, [("heavy", PRIORITY_BACKGROUND), ("light", PRIORITY_BACKGROUND)]) == \
+        ["heavy", "light"]
+
+
+def test_window_keeps_recent_grants(clock):
+    limiter = GateLimiter()
+    queue = FairRequestQueue(limiter)
+    limiter.grants = 2
+    queue.acquire(10, session_id="old")
+    clock.now += queue.FAIRNESS_WINDOW / 2
+    queue.acquire(10, session_id="recent")
+    clock.now += queue.FAIRNESS_WINDOW / 2 + 1
+    queue.estimate_wait(10)
+    assert queue._served == {"recent": 1}
+
+
+def test_acquire_raises_with_estimate_when_the_wait_exceeds_max_wait(clock):
+    queue = FairRequestQueue(rate_limiter.GroqRateLimiter(rpm=1, tpm=100000))
+    queue.acquire(10, session_id="a")
+    with pytest.raises(RateLimitExceeded) as raised:
+        queue.acquire(10, session_id="b", max_wait=5.0)
+    assert raised.value.retry_after == pytest.approx(60.0)
+    assert not queue._waiting
+
+
+# ---------------------------------------------------------------------
+# retry_after_from_error
+# ---------------------------------------------------------------------
+class _Response:
+    def __init__(self, status_code=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_status_code_429_is_a_rate_limit():
+    error = Exception("Too many requests")
+    error.status_code = 429
+    error.response = _Response(429, {"retry-after": "7"})
+    assert retry_after_from_error(error) == 7.0
+
+
+def test_provider_rate_limit_error_type_is_a_rate_limit():
+    assert retry_after_from_error(RateLimitError("slow down")) == 10.0
+
+
+def test_rate_limit_phrase_is_a_fallback():
+    assert retry_after_from_error(Exception("Rate limit reached for model")) == 10.0
+
+
+def test_429_in_unrelated_text_is_not_a_rate_limit():
+    assert retry_after_from_error(Exception("context length 4290 tokens exceeds the maximum")) is None
+    assert retry_after_from_error(Exception("request req_429abc failed: 500")) is None
+
+
+def test_other_status_codes_are_not_rate_limits():
+    error = Exception("server error")
+    error.response = _Response(500)
+    assert retry_after_from_error(error) is None
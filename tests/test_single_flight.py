@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, normalize_question
+
+
+def run_group(flight, key, fn, followers, timeout=5.0):
+    """Leader runs fn (which blocks on the returned release event); followers join while it is in flight
+
+    Returns (release, threads, outcomes); outcomes[i] is ("ok", result, shared) or ("error", exception).
+    """
+    release = threading.Event()
+    outcomes = [None] * (followers + 1)
+
+    def call(slot):
+        try:
+            result, shared = flight.do(key, lambda: fn(release))
+            outcomes[slot] = ("ok", result, shared)
+        except BaseException as e:  # the tests check what each caller sees, interrupts included
+            outcomes[slot] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(0,), daemon=True)]
+    threads[0].start()
+    deadline = time.monotonic() + timeout
+    while flight.in_flight() == 0:
+        assert time.monotonic() < deadline, "leader never started"
+        time.sleep(0.001)
+    for slot in range(1, followers + 1):
+        threads.append(threading.Thread(target=call, args=(slot,), daemon=True))
+        threads[-1].start()
+    while flight.stats()["coalesced"] < followers:
+        assert time.monotonic() < deadline, "followers never joined"
+        time.sleep(0.001)
+    return release, threads, outcomes
+
+
+def finish(release, threads, timeout=5.0):
+    release.set()
+    for thread in threads:
+        thread.join(timeout)
+        assert not thread.is_alive()
+
+
+def test_concurrent_callers_share_one_execution():
+    flight, calls = SingleFlight(), []
+
+    def fn(release):
+        calls.append(1)
+        release.wait(5)
+        return {"answer": "42", "sources": [{"title": "a"}]}
+
+    release, threads, outcomes = run_group(flight, "q", fn, followers=3)
+    finish(release, threads)
+
+    assert len(calls) == 1
+    assert [o[0] for o in outcomes] == ["ok"] * 4
+    assert [o[2] for o in outcomes] == [False, True, True, True]
+    results = [o[1] for o in outcomes]
+    assert all(r == {"answer": "42", "sources": [{"title": "a"}]} for r in results)
+    assert len({id(r) for r in results}) == 4
+    assert len({id(r["sources"]) for r in results}) == 4
+    assert flight.stats() == {"requests": 4, "executions": 1, "coalesced": 3, "in_flight": 0,
+                              "coalescing_ratio": 0.75}
+
+
+def test_leader_mutations_do_not_reach_followers():
+    flight = SingleFlight()
+    shared = {"answer": "original"}
+
+    def fn(release):
+        release.wait(5)
+        return shared
+
+    release, threads, outcomes = run_group(flight, "q", fn, followers=2)
+    finish(release, threads)
+    outcomes[0][1]["answer"] = "mutated by leader"
+    assert [o[1]["answer"] for o in outcomes[1:]] == ["original", "original"]
+
+
+def test_nothing_is_cached_after_completion():
+    flight, calls = SingleFlight(), []
+    for _ in range(2):
+        flight.do("q", lambda: calls.append(1) or len(calls))
+    assert len(calls) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_each_follower_gets_a_fresh_copy_of_the_exception():
+    class ProviderError(Exception):
+        def __init__(self, retry_after, message=None):  # __init__ signature differs from args
+            self.retry_after = retry_after
+            super().__init__(message or f"wait {retry_after}")
+
+    flight = SingleFlight()
+
+    def fn(release):
+        release.wait(5)
+        raise ProviderError(3.5)
+
+    release, threads, outcomes = run_group(flight, "q", fn, followers=3)
+    finish(release, threads)
+
+    errors = [o[1] for o in outcomes]
+    assert all(o[0] == "error" and isinstance(o[1], ProviderError) for o in outcomes)
+    assert len({id(e) for e in errors}) == 4
+    leader_error = errors[0]
+    for error in errors[1:]:
+        assert error.retry_after == 3.5
+        assert str(error) == "wait 3.5"
+        assert error.__cause__ is leader_error
+
+
+def test_interrupted_leader_fails_followers_with_runtime_error():
+    flight = SingleFlight()
+
+    def fn(release):
+        release.wait(5)
+        raise SystemExit(3)
+
+    release, threads, outcomes = run_group(flight, "q", fn, followers=2)
+    finish(release, threads)
+
+    assert outcomes[0][0] == "error" and isinstance(outcomes[0][1], SystemExit)
+    for kind, error in outcomes[1:]:
+        assert kind == "error" and isinstance(error, RuntimeError)
+        assert isinstance(error.__cause__, SystemExit)
+    assert flight.in_flight() == 0
+
+
+def test_uncopyable_result_fails_only_the_followers():
+    flight = SingleFlight()
+    lock = threading.Lock()  # cannot be deep-copied
+
+    def fn(release):
+        release.wait(5)
+        return {"lock": lock}
+
+    release, threads, outcomes = run_group(flight, "q", fn, followers=1)
+    finish(release, threads)
+
+    assert outcomes[0] == ("ok", {"lock": lock}, False)
+    assert outcomes[1][0] == "error" and isinstance(outcomes[1][1], RuntimeError)
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("How much PROTEIN  should I eat?", "how much protein should i eat"),
+    ("  what is NEAT ?! ", "what is neat"),
+    (None, ""),
+])
+def test_normalize_question(question, expected):
+    assert normalize_question(question) == expected
@@ -0,0 +1,117 @@
+import csv
+import random
+from pathlib import Path
+
+import pytest
+
+from topic_mapper import DEFAULT_TEMPLATE, TOPIC_MAPPER, TOPIC_RULES, TopicMapper
+
+CORPUS = Path(__file__).resolve().parent.parent / "data" / "learning_corpus.csv"
+
+
+def if_elif_chain(title: str) -> str:
+    """The hand-written chain create_synthetic_content used before TOPIC_RULES (the oracle)"""
+    t = title.lower()
+    if 'protein' in t:
+        return 'protein_requirements'
+    elif 'bmr' in t or 'metabolic' in t:
+        return 'bmr_calculation'
+    elif 'training' in t or 'workout' in t or 'progressive' in t or 'resistance' in t:
+        return 'training_progression'
+    elif 'split' in t or 'best workout' in t:
+        return 'workout_splits'
+    elif 'micronutrient' in t or 'vitamin' in t or 'supplement' in t:
+        return 'micronutrients'
+    elif 'omega' in t or 'fish oil' in t:
+        return 'omega3_supplements'
+    elif 'neat' in t or 'activity' in t:
+        return 'neat_activity'
+    elif 'sleep' in t:
+        return 'sleep_recovery'
+    elif 'energy' in t or 'calorie' in t or 'balance' in t:
+        return 'bmr_calculation'
+    elif 'periodization' in t:
+        return 'training_progression'
+    elif 'nutrition' in t or 'performance' in t:
+        return 'protein_requirements'
+    elif 'cavaliere' in t or 'athlean' in t:
+        return 'workout_splits'
+    elif 'jamnadas' in t or 'visceral' in t or 'fat' in t:
+        return 'bmr_calculation'
+    elif 'attia' in t or 'longevity' in t:
+        return 'training_progression'
+    elif 'probiotic' in t or 'metabolic' in t:
+        return 'micronutrients'
+    elif 'myplate' in t or 'nhs' in t or 'nih' in t:
+        return 'micronutrients'
+    return 'training_progression'
+
+
+def fuzzed_titles(count: int, seed: int = 0):
+    """Titles built from rule keywords (and keyword fragments / overlaps) mixed with random characters"""
+    keywords = [k for rule in TOPIC_RULES for k in rule["keywords"]]
+    pieces = keywords + [k.upper() for k in keywords] + ["ene", "fa", "spl", "traini", "nea", "omeg", "athle", " "]
+    alphabet = "abcdefghijklmnopqrstuvwxyz ,:-"
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(pieces) if rng.random() < 0.5 else rng.choice(alphabet)
+                      for _ in range(rng.randint(0, 10)))
+
+
+def test_corpus_titles_match_the_if_elif_chain():
+    with open(CORPUS, newline="", encoding="utf-8") as f:
+        titles = [row["Title"] or "" for row in csv.DictReader(f)]
+    assert titles
+    assert [TOPIC_MAPPER.template_for(t) for t in titles] == [if_elif_chain(t) for t in titles]
+
+
+def test_fuzzed_titles_match_the_if_elif_chain():
+    mismatches = [t for t in fuzzed_titles(200_000) if TOPIC_MAPPER.template_for(t) != if_elif_chain(t)]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("title, template", [
+    ("ISSN Position Stand: Protein and Exercise", "protein_requirements"),
+    ("Protein needs for resistance training", "protein_requirements"),    # priority 1 beats priority 3
+    ("Best Workout Split for Hypertrophy", "training_progression"),        # "workout" (3) shadows "best workout" (4)
+    ("Metabolic health and probiotics", "bmr_calculation"),                # the first "metabolic" rule wins
+    ("Fish oil and sleep quality", "omega3_supplements"),
+    ("Sleep: the NEATest recovery trick", "neat_activity"),                # substring match, like `in`
+    ("MyPlate Guide", "micronutrients"),
+    ("", DEFAULT_TEMPLATE),
+    ("Mobility drills", DEFAULT_TEMPLATE),
+])
+def test_best_priority_rule_wins(title, template):
+    assert TOPIC_MAPPER.template_for(title) == template
+
+
+def test_overlapping_keywords_found_through_failure_links():
+    mapper = TopicMapper([
+        {"priority": 2, "template": "long", "keywords": ["abcd"]},
+        {"priority": 1, "template": "inner", "keywords": ["bc"]},
+    ], default="none")
+    assert mapper.template_for("xabcdx") == "inner"
+    assert mapper.template_for("xabx") == "none"
+    assert mapper.template_for("abd abcd") == "inner"
+
+
+def test_rules_are_applied_in_priority_order_not_list_order():
+    mapper = TopicMapper([
+        {"priority": 5, "template": "late", "keywords": ["a"]},
+        {"priority": 1, "template": "early", "keywords": ["b"]},
+    ])
+    assert mapper.template_for("ab") == "early"
+    assert [rule["template"] for rule in mapper.rules] == ["early", "late"]
+
+
+def test_classify_all_counts_rule_hits():
+    keys, hits = TOPIC_MAPPER.classify_all(["Protein", "Sleep hygiene", "Mobility", None])
+    assert keys == ["protein_requirements", "sleep_recovery", DEFAULT_TEMPLATE, DEFAULT_TEMPLATE]
+    assert hits == {"priority 1: protein_requirements": 1, "priority 8: sleep_recovery": 1, "default": 2}
+
+
+def test_unreachable_reports_shadowed_keywords():
+    dead = {(row["priority"], row["keyword"], row["shadowed_by"]) for row in TOPIC_MAPPER.unreachable()}
+    assert (4, "best workout", "workout") in dead
+    assert (15, "metabolic", "metabolic") in dead
+    assert not any(keyword == "protein" for _, keyword, _ in dead)